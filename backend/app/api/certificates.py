@@ -0,0 +1,180 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from pydantic import BaseModel
+from typing import Optional, List
+from slugify import slugify
+
+from app.core.dependencies import get_db, require_role
+from app.core.roles import COMPLIANCE_MANAGER_ROLES
+from app.models.content import Course, CourseEnrollment
+from app.models.factory import Factory
+from app.models.user import User
+from app.services.certificates import CERTIFICATE_TEMPLATES, certificate_code, parse_certificate_code, render_certificate
+from app.services.jobs import job_registry
+from app.services.process_pool import imap_bounded
+from app.services.zip_stream import stream_zip
+
+router = APIRouter(prefix="/certificates", tags=["Certificates"])
+
+# Schemas
+class CertificateBatchCreate(BaseModel):
+    factory_id: Optional[int] = None  # Platform admins only; others use their own factory
+    course_id: Optional[int] = None
+    user_ids: Optional[List[int]] = None
+    template: str = "default"
+
+
+def completed_enrollments_query(db: Session):
+    """Enrollments that count as completed, with worker, course and factory names"""
+    return db.query(
+        CourseEnrollment.id,
+        CourseEnrollment.completed_at,
+        CourseEnrollment.last_accessed,
+        User.name,
+        Course.title,
+        Factory.name
+    ).join(
+        User, User.id == CourseEnrollment.user_id
+    ).join(
+        Course, Course.id == CourseEnrollment.course_id
+    ).outerjoin(
+        Factory, Factory.id == User.factory_id
+    ).filter(
+        or_(CourseEnrollment.completed_at.isnot(None), CourseEnrollment.progress >= 100)
+    )
+
+
+def _certificate_data(row, template: str = "default") -> dict:
+    enrollment_id, completed_at, last_accessed, worker_name, course_title, factory_name = row
+    completed = completed_at or last_accessed
+    return {
+        "code": certificate_code(enrollment_id),
+        "worker_name": worker_name,
+        "course_title": course_title,
+        "factory_name": factory_name,
+        "completed_at": completed.date().isoformat() if completed else "",
+        "template": template
+    }
+
+
+def _get_batch_job(job_id: str, current_user: User):
+    job = job_registry.get(job_id, kind="certificates")
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Certificate batch not found")
+    if job.owner_id != current_user.id and current_user.role != "platform_admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return job
+
+
+@router.post("/batches")
+def create_certificate_batch(
+    request: CertificateBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(COMPLIANCE_MANAGER_ROLES))
+):
+    """
+    Prepare a batch of completion certificates for a factory's workers
+    Returns a job; download the ZIP from /certificates/batches/{job_id}/download
+    and poll /certificates/batches/{job_id} for progress.
+    """
+    if request.template not in CERTIFICATE_TEMPLATES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown template. Must be one of: {list(CERTIFICATE_TEMPLATES)}"
+        )
+    
+    factory_id = current_user.factory_id
+    if current_user.role == "platform_admin":
+        factory_id = request.factory_id or factory_id
+    if not factory_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="factory_id is required")
+    
+    query = completed_enrollments_query(db).filter(User.factory_id == factory_id)
+    if request.course_id:
+        query = query.filter(CourseEnrollment.course_id == request.course_id)
+    if request.user_ids:
+        query = query.filter(CourseEnrollment.user_id.in_(request.user_ids))
+    
+    rows = query.order_by(User.name, CourseEnrollment.id).all()
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No completed enrollments found")
+    
+    certificates = [_certificate_data(row, request.template) for row in rows]
+    job = job_registry.create("certificates", total=len(certificates), owner_id=current_user.id, payload=certificates)
+    
+    return job.to_dict()
+
+
+@router.get("/batches/{job_id}")
+def get_certificate_batch(
+    job_id: str,
+    current_user: User = Depends(require_role(COMPLIANCE_MANAGER_ROLES))
+):
+    """Progress of a certificate batch"""
+    return _get_batch_job(job_id, current_user).to_dict()
+
+
+@router.get("/batches/{job_id}/download")
+def download_certificate_batch(
+    job_id: str,
+    current_user: User = Depends(require_role(COMPLIANCE_MANAGER_ROLES))
+):
+    """
+    Stream the batch as a ZIP of PDFs while it renders
+    Certificates are rendered in the process pool and written to the
+    response one by one, so the archive is never held in memory.
+    """
+    job = _get_batch_job(job_id, current_user)
+    # Atomic, so two concurrent downloads can't both stream the batch
+    if not job.claim():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Batch is already {job.status}")
+    
+    certificates = job.payload
+    
+    def files():
+        try:
+            for certificate, pdf in zip(certificates, imap_bounded(render_certificate, certificates)):
+                job.advance()
+                yield f"{slugify(certificate['worker_name'])}_{certificate['code']}.pdf", pdf
+            job.finish()
+        except GeneratorExit:
+            job.finish("cancelled")
+            raise
+        except Exception as e:
+            job.add_error({"error": str(e)})
+            job.finish("failed")
+            raise
+    
+    return StreamingResponse(
+        stream_zip(files()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="certificates_{job.id}.zip"'}
+    )
+
+
+# PUBLIC ENDPOINTS (No authentication required)
+public_router = APIRouter(prefix="/public/certificates", tags=["Public Certificates"])
+
+@public_router.get("/{code}")
+def verify_certificate(code: str, db: Session = Depends(get_db)):
+    """
+    Verify a certificate by the code printed on it (and encoded in its QR)
+    """
+    enrollment_id = parse_certificate_code(code)
+    row = None
+    if enrollment_id is not None:
+        row = completed_enrollments_query(db).filter(CourseEnrollment.id == enrollment_id).first()
+    
+    if not row:
+        return {"valid": False, "message": "Invalid certificate"}
+    
+    certificate = _certificate_data(row)
+    return {
+        "valid": True,
+        "worker_name": certificate["worker_name"],
+        "course_title": certificate["course_title"],
+        "factory_name": certificate["factory_name"],
+        "completed_at": certificate["completed_at"]
+    }
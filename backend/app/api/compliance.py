@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from app.core.dependencies import get_db, get_current_user, require_role
+from app.models.certificate_expiry import ComplianceNotification
 from app.models.complience_event import ComplianceEvent
 from app.models.user import User
 from app.services.file_upload import FileUploadService
+from app.services.certificate_expiry import EXPIRED_LOOKBACK_DAYS, CertificateExpiryService, expiry_scheduler, today_utc
+from app.services.compliance_analytics import ComplianceAnalyticsService
+from app.services.compliance_summary import ComplianceSummaryService
 from typing import Optional, List
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 router = APIRouter(prefix="/compliance", tags=["Compliance Management"])
 
+COMPLIANCE_STATUSES = ("PASS", "FAIL", "PENDING", "ATTENTION_REQUIRED")
+
 # Schemas
 class ComplianceEventCreate(BaseModel):
     event_type: str  # FIRE_SAFETY_CHECK, PPE_INSPECTION, BUILDING_AUDIT, CHEMICAL_TEST, WORKER_TRAINING
@@ -20,6 +26,10 @@ class ComplianceEventCreate(BaseModel):
     notes: Optional[str] = None
     batch_id: Optional[int] = None
 
+class ComplianceStatusUpdate(BaseModel):
+    status: str  # PASS, FAIL, PENDING, ATTENTION_REQUIRED
+    notes: Optional[str] = None
+
 class ComplianceEventResponse(BaseModel):
     id: int
     factory_id: int
@@ -68,6 +78,7 @@ async def create_compliance_event(
     )
     
     db.add(compliance_event)
+    ComplianceSummaryService.record_created(db, compliance_event)
     db.commit()
     db.refresh(compliance_event)
     
@@ -193,10 +204,48 @@ def approve_compliance_event(
     event.approved_by = current_user.id
     event.approved_at = datetime.now()
     
+    ComplianceSummaryService.record_approved(db, event)
     db.commit()
     
     return {"success": True, "message": "Event approved", "event_id": event_id}
 
+@router.put("/events/{event_id}/status", response_model=ComplianceEventResponse)
+def update_compliance_event_status(
+    event_id: int,
+    update: ComplianceStatusUpdate,
+    current_user: User = Depends(require_role(["manager", "factory_admin", "platform_admin"])),
+    db: Session = Depends(get_db)
+):
+    """
+    Change the status of a compliance event (e.g. PENDING -> PASS after re-inspection)
+    Only managers, factory admins, and platform admins can change status
+    """
+    if update.status not in COMPLIANCE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Status must be one of: {', '.join(COMPLIANCE_STATUSES)}"
+        )
+    
+    event = db.query(ComplianceEvent).filter(ComplianceEvent.id == event_id).first()
+    
+    if not event:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+    
+    # Check permission
+    if event.factory_id != current_user.factory_id and current_user.role != "platform_admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    old_status = event.status
+    event.status = update.status
+    if update.notes is not None:
+        event.notes = update.notes
+    
+    ComplianceSummaryService.record_status_change(db, event, old_status)
+    db.commit()
+    db.refresh(event)
+    
+    return event
+
 @router.get("/stats")
 def get_compliance_stats(
     current_user: User = Depends(get_current_user),
@@ -204,6 +253,7 @@ def get_compliance_stats(
 ):
     """
     Get compliance statistics for factory dashboard
+    Read from the compliance rollups in one grouped query
     """
     factory_id = current_user.factory_id
     
@@ -213,14 +263,13 @@ def get_compliance_stats(
             detail="User not associated with a factory"
         )
     
-    query = db.query(ComplianceEvent)
-    if factory_id:
-        query = query.filter(ComplianceEvent.factory_id == factory_id)
+    ComplianceSummaryService.ensure_rollups(db, factory_id)
+    counts = ComplianceAnalyticsService.status_counts(db, factory_id)
     
-    total_events = query.count()
-    passed_events = query.filter(ComplianceEvent.status == "PASS").count()
-    failed_events = query.filter(ComplianceEvent.status == "FAIL").count()
-    pending_events = query.filter(ComplianceEvent.status == "PENDING").count()
+    total_events = sum(counts.values())
+    passed_events = counts.get("PASS", 0)
+    failed_events = counts.get("FAIL", 0)
+    pending_events = counts.get("PENDING", 0)
     
     compliance_score = int((passed_events / total_events * 100)) if total_events > 0 else 0
     
@@ -231,3 +280,123 @@ def get_compliance_stats(
         "pending": pending_events,
         "compliance_score": compliance_score
     }
+
+def scoped_factory_id(current_user: User, factory_id: Optional[int]) -> Optional[int]:
+    """The user's own factory; platform admins may pick one (or None for all)"""
+    if current_user.role == "platform_admin":
+        return factory_id
+    if not current_user.factory_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User not associated with a factory")
+    if factory_id is not None and factory_id != current_user.factory_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return current_user.factory_id
+
+@router.get("/analytics")
+def get_compliance_analytics(
+    period: str = Query("day", description="Trend buckets: day, week or month"),
+    start: Optional[date] = Query(None, description="First day of the window (default: the last 30 days / 12 weeks / 12 months)"),
+    end: Optional[date] = Query(None, description="Last day of the window (default: today)"),
+    factory_id: Optional[int] = Query(None, description="Platform admins only; all factories if omitted"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Compliance dashboard analytics for a window of days, weeks or months
+    Status totals, breakdowns per event type and per area, and a zero-filled
+    trend, all from the pre-aggregated rollups. The window is widened to
+    whole buckets; end in the response is exclusive.
+    """
+    factory_id = scoped_factory_id(current_user, factory_id)
+    
+    try:
+        ComplianceAnalyticsService.window(period, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    ComplianceSummaryService.ensure_rollups(db, factory_id)
+    return ComplianceAnalyticsService.analytics(db, factory_id, period, start, end)
+
+@router.get("/expiring")
+def get_expiring_certificates(
+    days: int = Query(30, ge=0, le=365, description="Expiring within this many days"),
+    expired_days: int = Query(EXPIRED_LOOKBACK_DAYS, ge=0, le=3650, description="Include certificates expired this many days ago"),
+    factory_id: Optional[int] = Query(None, description="Platform admins only; all factories if omitted"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Certificates (events with an expiry date) that expire soon or recently expired
+    Renewed certificates - a later one of the same type and area exists -
+    are left out. A range scan on the expiry index, soonest first.
+    """
+    factory_id = scoped_factory_id(current_user, factory_id)
+    today = today_utc()
+    events = CertificateExpiryService.expiring(
+        db, today - timedelta(days=expired_days), today + timedelta(days=days), factory_id
+    )
+    certificates = [
+        {"factory_id": event.factory_id, **CertificateExpiryService.item(event, today)} for event in events
+    ]
+    expired = sum(1 for certificate in certificates if certificate["expired"])
+    return {
+        "as_of": today.isoformat(),
+        "expired": expired,
+        "expiring": len(certificates) - expired,
+        "certificates": certificates
+    }
+
+@router.get("/notifications")
+def list_compliance_notifications(
+    unread_only: bool = False,
+    limit: int = Query(50, ge=1, le=500),
+    factory_id: Optional[int] = Query(None, description="Platform admins only; all factories if omitted"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Notifications for the factory (e.g. certificate expiry batches), newest first"""
+    factory_id = scoped_factory_id(current_user, factory_id)
+    query = db.query(ComplianceNotification)
+    if factory_id is not None:
+        query = query.filter(ComplianceNotification.factory_id == factory_id)
+    if unread_only:
+        query = query.filter(ComplianceNotification.read_at.is_(None))
+    
+    return [
+        {
+            "id": notification.id,
+            "factory_id": notification.factory_id,
+            "kind": notification.kind,
+            "title": notification.title,
+            "items": notification.items,
+            "created_at": notification.created_at,
+            "read_at": notification.read_at
+        }
+        for notification in query.order_by(ComplianceNotification.created_at.desc(), ComplianceNotification.id.desc()).limit(limit)
+    ]
+
+@router.put("/notifications/{notification_id}/read")
+def mark_compliance_notification_read(
+    notification_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    notification = db.query(ComplianceNotification).filter(ComplianceNotification.id == notification_id).first()
+    
+    if not notification:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found")
+    
+    if notification.factory_id != current_user.factory_id and current_user.role != "platform_admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    if notification.read_at is None:
+        notification.read_at = datetime.now()
+        db.commit()
+    
+    return {"success": True, "notification_id": notification_id}
+
+@router.get("/expiry-checks")
+def get_expiry_check_stats(
+    current_user: User = Depends(require_role(["platform_admin"]))
+):
+    """State of this process's certificate expiry scheduler"""
+    return expiry_scheduler.stats()
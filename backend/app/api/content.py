@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List
 from slugify import slugify
 
 from app.core.dependencies import get_db, get_current_user, require_role
-from app.models.content import Article, Course, Category, CourseModule, Lesson, CourseEnrollment
+from app.models.content import Article, ArticleDraft, Course, Category, CourseModule, Lesson, CourseEnrollment
 from app.models.user import User
 from app.services.file_upload import FileUploadService
+from app.services.image_variants import generate_image_variants
+from app.services.json_patch import apply_patch, JSONPatchError
 
 router = APIRouter(prefix="/content", tags=["Content Management"])
 
@@ -50,6 +53,38 @@ class ArticleUpdate(BaseModel):
     tags: Optional[List[str]] = None
     is_featured: Optional[bool] = None
     status: Optional[str] = None
+    version: Optional[int] = None  # Expected article version; stale writes are rejected
+
+class ArticleDraftPatch(BaseModel):
+    version: int  # Draft version the operations were computed against (0 = no draft yet)
+    operations: List[dict]  # JSON Patch operations, plus "splice" for text edits
+
+class ArticleDraftDocument(BaseModel):
+    """Draft fields after a patch; checked before the draft is stored"""
+    title: str = Field(min_length=1)
+    excerpt: Optional[str]
+    content: str
+    category_id: Optional[int]
+    tags: Optional[List[str]]
+
+class ArticleDraftPublish(BaseModel):
+    version: int  # Draft version being published
+
+class ArticleDraftAck(BaseModel):
+    article_id: int
+    base_version: int
+    version: int
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class ArticleDraftResponse(ArticleDraftAck):
+    title: str
+    excerpt: Optional[str]
+    content: str
+    category_id: Optional[int]
+    tags: Optional[List[str]]
 
 class ArticleResponse(BaseModel):
     id: int
@@ -58,6 +93,7 @@ class ArticleResponse(BaseModel):
     excerpt: Optional[str]
     content: str
     featured_image: Optional[str]
+    featured_image_variants: Optional[dict] = None
     author_id: int
     author_name: str
     category_id: int
@@ -68,6 +104,7 @@ class ArticleResponse(BaseModel):
     reading_time: Optional[int]
     views: int
     language: str
+    version: int
     published_at: Optional[datetime]
     created_at: datetime
     
@@ -106,6 +143,7 @@ class CourseResponse(BaseModel):
     slug: str
     description: str
     featured_image: Optional[str]
+    featured_image_variants: Optional[dict] = None
     instructor_id: int
     instructor_name: str
     category_id: int
@@ -164,6 +202,82 @@ def list_categories(db: Session = Depends(get_db)):
 
 # ============= ARTICLE ENDPOINTS =============
 
+# Article fields an editor can autosave into a draft
+DRAFT_FIELDS = ("title", "excerpt", "content", "category_id", "tags")
+
+
+def _reading_time(content: str) -> int:
+    """Reading time in minutes (avg 200 words per minute)"""
+    return max(1, round(len(content.split()) / 200))
+
+
+def _article_slug(db: Session, title: str, article_id: Optional[int] = None) -> str:
+    """Slug for a title, made unique against other articles"""
+    slug = slugify(title)
+    
+    query = db.query(Article.id).filter(Article.slug == slug)
+    if article_id is not None:
+        query = query.filter(Article.id != article_id)
+    if query.first():
+        slug = f"{slug}-{datetime.utcnow().timestamp()}"
+    
+    return slug
+
+
+def _check_article_access(article: Optional[Article], current_user: User):
+    if not article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    
+    if current_user.role != "platform_admin" and article.author_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+
+def _apply_article_update(db: Session, article: Article, update_data: dict, expected_version: Optional[int] = None):
+    """
+    Write changed fields to the article row and bump its version.
+    The write only succeeds if the row is still at the expected version.
+    """
+    if expected_version is None:
+        expected_version = article.version
+    
+    # Slug and reading time are derived, only recompute them when their source changed
+    if "title" in update_data and update_data["title"] != article.title:
+        update_data["slug"] = _article_slug(db, update_data["title"], article.id)
+    if "content" in update_data and update_data["content"] != article.content:
+        update_data["reading_time"] = _reading_time(update_data["content"])
+    
+    # Set published_at if status changed to published
+    if update_data.get("status") == "published" and article.status != "published":
+        update_data["published_at"] = datetime.utcnow()
+    
+    update_data["version"] = Article.version + 1
+    
+    updated = db.query(Article).filter(
+        Article.id == article.id,
+        Article.version == expected_version
+    ).update(update_data, synchronize_session=False)
+    
+    if not updated:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Article was modified concurrently (expected version {expected_version})"
+        )
+    
+    db.commit()
+    db.refresh(article)
+
+
+def _article_response(db: Session, article: Article) -> dict:
+    author = db.query(User).filter(User.id == article.author_id).first()
+    category = db.query(Category).filter(Category.id == article.category_id).first()
+    
+    return {
+        **article.__dict__,
+        "author_name": author.name if author else "Unknown",
+        "category_name": category.name if category else ""
+    }
+
 @router.post("/articles", response_model=ArticleResponse)
 async def create_article(
     article: ArticleCreate,
@@ -171,26 +285,15 @@ async def create_article(
     current_user: User = Depends(require_role(["platform_admin", "factory_admin", "manager"]))
 ):
     """Create a new article/blog post"""
-    slug = slugify(article.title)
-    
-    # Make slug unique
-    existing = db.query(Article).filter(Article.slug == slug).first()
-    if existing:
-        slug = f"{slug}-{datetime.utcnow().timestamp()}"
-    
-    # Calculate reading time (avg 200 words per minute)
-    word_count = len(article.content.split())
-    reading_time = max(1, round(word_count / 200))
-    
     new_article = Article(
         title=article.title,
-        slug=slug,
+        slug=_article_slug(db, article.title),
         excerpt=article.excerpt,
         content=article.content,
         author_id=current_user.id,
         category_id=article.category_id,
         tags=article.tags or [],
-        reading_time=reading_time,
+        reading_time=_reading_time(article.content),
         language=article.language,
         is_featured=article.is_featured,
         status=article.status,
@@ -293,48 +396,178 @@ async def update_article(
 ):
     """Update an article"""
     article = db.query(Article).filter(Article.id == article_id).first()
-    
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
-    
-    # Check ownership
-    if current_user.role != "platform_admin" and article.author_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    _check_article_access(article, current_user)
     
     update_data = article_update.dict(exclude_unset=True)
+    expected_version = update_data.pop("version", None)
     
-    # Update slug if title changed
-    if "title" in update_data:
-        update_data["slug"] = slugify(update_data["title"])
+    _apply_article_update(db, article, update_data, expected_version)
     
-    # Set published_at if status changed to published
-    if update_data.get("status") == "published" and article.status != "published":
-        update_data["published_at"] = datetime.utcnow()
+    return _article_response(db, article)
+
+
+@router.get("/articles/{article_id}/draft", response_model=ArticleDraftResponse)
+def get_article_draft(
+    article_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["platform_admin", "factory_admin", "manager"]))
+):
+    """
+    Get the editor draft for an article.
+    Without a saved draft, returns the article itself at draft version 0.
+    """
+    article = db.query(Article).filter(Article.id == article_id).first()
+    _check_article_access(article, current_user)
     
-    for field, value in update_data.items():
-        setattr(article, field, value)
+    if article.draft:
+        return article.draft
     
-    db.commit()
-    db.refresh(article)
+    return {
+        "article_id": article.id,
+        "base_version": article.version,
+        "version": 0,
+        "updated_at": article.updated_at,
+        **{field: getattr(article, field) for field in DRAFT_FIELDS}
+    }
+
+
+@router.patch("/articles/{article_id}/draft", response_model=ArticleDraftAck)
+def patch_article_draft(
+    article_id: int,
+    patch: ArticleDraftPatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["platform_admin", "factory_admin", "manager"]))
+):
+    """
+    Autosave: apply JSON Patch operations to the article draft.
+    The published article row is not touched until the draft is published.
+    Rejects the patch with 409 if the draft moved past the given version.
+    """
+    article = db.query(Article).filter(Article.id == article_id).first()
+    _check_article_access(article, current_user)
+    
+    draft = article.draft
+    current_version = draft.version if draft else 0
+    if patch.version != current_version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Draft version conflict: expected {patch.version}, current is {current_version}"
+        )
     
-    author = db.query(User).filter(User.id == article.author_id).first()
-    category = db.query(Category).filter(Category.id == article.category_id).first()
+    source = draft or article
+    document = {field: getattr(source, field) for field in DRAFT_FIELDS}
+    
+    try:
+        patched = apply_patch(document, patch.operations)
+    except JSONPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    if set(patched) != set(DRAFT_FIELDS):
+        raise HTTPException(status_code=422, detail=f"Draft fields are fixed: {list(DRAFT_FIELDS)}")
+    try:
+        patched = ArticleDraftDocument(**patched).model_dump()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail="; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+        ))
+    
+    if draft is None:
+        draft = ArticleDraft(
+            article_id=article.id,
+            base_version=article.version,
+            version=1,
+            updated_by=current_user.id,
+            **patched
+        )
+        db.add(draft)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Draft version conflict: draft was created concurrently")
+    else:
+        # Only write the columns the patch actually changed
+        changes = {field: patched[field] for field in DRAFT_FIELDS if patched[field] != document[field]}
+        updated = db.query(ArticleDraft).filter(
+            ArticleDraft.id == draft.id,
+            ArticleDraft.version == patch.version
+        ).update({
+            **changes,
+            "version": ArticleDraft.version + 1,
+            "updated_by": current_user.id
+        }, synchronize_session=False)
+        
+        if not updated:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Draft version conflict: draft was saved concurrently")
+        db.commit()
     
-    return {
-        **article.__dict__,
-        "author_name": author.name if author else "Unknown",
-        "category_name": category.name if category else ""
+    db.refresh(draft)
+    return draft
+
+
+@router.post("/articles/{article_id}/draft/publish", response_model=ArticleResponse)
+def publish_article_draft(
+    article_id: int,
+    publish: ArticleDraftPublish,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["platform_admin", "factory_admin", "manager"]))
+):
+    """
+    Copy the draft into the article and discard the draft.
+    Fails with 409 if the article was edited after the draft was started.
+    """
+    article = db.query(Article).filter(Article.id == article_id).first()
+    _check_article_access(article, current_user)
+    
+    draft = article.draft
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    if draft.version != publish.version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Draft version conflict: expected {publish.version}, current is {draft.version}"
+        )
+    
+    update_data = {
+        field: getattr(draft, field)
+        for field in DRAFT_FIELDS
+        if getattr(draft, field) != getattr(article, field)
     }
+    
+    base_version = draft.base_version
+    db.delete(draft)
+    _apply_article_update(db, article, update_data, base_version)
+    
+    return _article_response(db, article)
+
+
+@router.delete("/articles/{article_id}/draft")
+def discard_article_draft(
+    article_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["platform_admin", "factory_admin", "manager"]))
+):
+    """Discard the editor draft for an article"""
+    article = db.query(Article).filter(Article.id == article_id).first()
+    _check_article_access(article, current_user)
+    
+    if article.draft:
+        db.delete(article.draft)
+        db.commit()
+    
+    return {"message": "Draft discarded"}
 
 
 @router.post("/articles/{article_id}/upload-image")
 async def upload_article_image(
     article_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role(["platform_admin", "factory_admin", "manager"]))
 ):
-    """Upload featured image for article"""
+    """Upload featured image for article; responsive variants are rendered in the background"""
     article = db.query(Article).filter(Article.id == article_id).first()
     
     if not article:
@@ -347,8 +580,12 @@ async def upload_article_image(
     result = await file_service.save_file(file, "articles")
     
     article.featured_image = result["url"]
+    article.featured_image_variants = None
     db.commit()
     
+    if FileUploadService.validate_file(file.filename, "image"):
+        background_tasks.add_task(generate_image_variants, Article, article.id, result["url"], result["file_path"])
+    
     return {"url": result["url"]}
 
 
@@ -543,11 +780,12 @@ def add_course_module(
 @router.post("/courses/{course_id}/upload-image")
 async def upload_course_image(
     course_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role(["platform_admin", "factory_admin", "manager"]))
 ):
-    """Upload featured image for course"""
+    """Upload featured image for course; responsive variants are rendered in the background"""
     course = db.query(Course).filter(Course.id == course_id).first()
     
     if not course:
@@ -560,6 +798,10 @@ async def upload_course_image(
     result = await file_service.save_file(file, "courses")
     
     course.featured_image = result["url"]
+    course.featured_image_variants = None
     db.commit()
     
+    if FileUploadService.validate_file(file.filename, "image"):
+        background_tasks.add_task(generate_image_variants, Course, course.id, result["url"], result["file_path"])
+    
     return {"url": result["url"]}
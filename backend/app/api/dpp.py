@@ -1,43 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
 from typing import Optional, List
-import uuid
-import os
+import json
 
+from app.core.config import DPP_CACHE_CONTROL
 from app.core.dependencies import get_db, get_current_user, require_role
+from app.db.session import SessionLocal
 from app.models.batch import Batch
 from app.models.product import Product
 from app.models.factory import Factory
 from app.models.complience_event import ComplianceEvent
+from app.models.scan import DppScanDaily, FactoryScanDaily
 from app.models.user import User
-from app.services.qrcode_service import QRCodeService
+from app.schemas.product import MaterialComposition, ProductCreate
 from app.services.file_upload import FileUploadService
+from app.services.jobs import job_registry
+from app.services.product_import import (
+    MAX_IMPORT_ROWS, parse_import_file, product_values, run_product_import
+)
+from app.services.dpp_export import EXPORT_FORMATS, export_conditions, stream_dpp_export
+from app.services.dpp_cache import public_dpp_cache, public_dpp_page_cache, invalidate_on_commit
+from app.services.dpp_index import dpp_index, index_on_commit, verify_many
+from app.services.dpp_signing import key_ring, signature_cache, verify_token
+from app.services.dpp_ids import canonical_dpp_id
+from app.services.footprint import FootprintService
+from app.services.image_variants import generate_image_variants
+from app.services.product_search import ProductSearch, sync_product_attributes
+from app.services.product_versions import ProductVersionService, product_document
+from app.services.unit_serials import UnitSerialService, parse_serial
+from app.services.scan_events import scan_recorder
+from app.services.passport import build_public_dpp, find_product, product_qr_url
+from app.services.passport_page import render_passport_page, unit_notice, NOT_FOUND_PAGE
 
 router = APIRouter(prefix="/dpp", tags=["Digital Product Passport"])
 
 # Schemas
-class MaterialComposition(BaseModel):
-    material: str
-    percentage: float
-    origin: Optional[str] = None
-    certification: Optional[str] = None
-
-class ProductCreate(BaseModel):
-    sku: str
-    name: str
+class ProductUpdate(BaseModel):
+    name: Optional[str] = None
     description: Optional[str] = None
-    category: str
-    materials: List[MaterialComposition]
-    origin_country: str
+    category: Optional[str] = None
+    materials: Optional[List[MaterialComposition]] = None
+    origin_country: Optional[str] = None
     raw_material_source: Optional[str] = None
     carbon_footprint_kg: Optional[float] = None
     water_usage_liters: Optional[float] = None
     recycled_content_percentage: Optional[float] = None
+    weight_kg: Optional[float] = None
     certifications: Optional[List[str]] = None
     manufactured_date: Optional[str] = None
+    compliance_verified: Optional[bool] = None
+
+class BulkVerifyRequest(BaseModel):
+    dpp_ids: List[str]
+
+class ExportRequest(BaseModel):
+    dpp_ids: List[str]
+    since: Optional[datetime] = None
 
 class ProductResponse(BaseModel):
     id: int
@@ -66,7 +89,7 @@ class DPPPublicResponse(BaseModel):
 
 
 @router.post("/products", response_model=ProductResponse)
-async def create_product(
+def create_product(
     product: ProductCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role(["factory_admin", "manager", "platform_admin"]))
@@ -81,63 +104,84 @@ async def create_product(
         if existing:
             raise HTTPException(status_code=400, detail="SKU already exists")
         
-        # Generate unique DPP ID
-        dpp_id = str(uuid.uuid4())
-        
         # Get factory info
         factory = db.query(Factory).filter(Factory.id == current_user.factory_id).first()
         if not factory:
             raise HTTPException(status_code=404, detail="Factory not found")
         
-        # Convert materials to JSON format
-        materials_json = [m.dict() for m in product.materials]
+        # Generate unique DPP ID; the QR code is rendered on first request
+        values = product_values(product, current_user.factory_id)
+        values["qr_code_url"] = product_qr_url(values["dpp_id"])
         
-        # Create product
-        new_product = Product(
-            factory_id=current_user.factory_id,
-            sku=product.sku,
-            name=product.name,
-            description=product.description,
-            category=product.category,
-            dpp_id=dpp_id,
-            materials=materials_json,
-            origin_country=product.origin_country,
-            raw_material_source=product.raw_material_source,
-            carbon_footprint_kg=product.carbon_footprint_kg,
-            water_usage_liters=product.water_usage_liters,
-            recycled_content_percentage=product.recycled_content_percentage,
-            certifications=product.certifications or [],
-            manufactured_date=datetime.fromisoformat(product.manufactured_date) if product.manufactured_date else None,
-            compliance_verified=False
-        )
+        new_product = Product(**values)
         
+        FootprintService.estimate_product(db, new_product)
         db.add(new_product)
+        sync_product_attributes(db, new_product)
+        ProductVersionService.record(db, new_product, None, current_user.id)
+        index_on_commit(db, product=new_product)
         db.commit()
         db.refresh(new_product)
         
-        # Generate QR code
-        dpp_url = f"{os.getenv('FRONTEND_URL', 'http://localhost:3001')}/dpp/{dpp_id}"
-        qr_service = QRCodeService()
-        qr_filepath = qr_service.save_qr_code(
-            data=dpp_url,
-            filename=f"dpp_{dpp_id}.png",
-            directory="uploads/qrcodes"
-        )
-        
-        # Extract just the filename from the full path
-        qr_filename = os.path.basename(qr_filepath)
-        
-        # Update product with QR code URL
-        new_product.qr_code_url = f"/files/qrcodes/{qr_filename}"
-        db.commit()
-        
         return new_product
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/products/import")
+async def import_products(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: User = Depends(require_role(["factory_admin", "manager"]))
+):
+    """
+    Bulk import products from CSV, XLSX or NDJSON
+    Rows are validated, inserted in batches and their QR codes rendered in
+    the background; poll /dpp/products/import/{job_id} for progress and
+    per-row errors.
+    """
+    if not current_user.factory_id:
+        raise HTTPException(status_code=400, detail="User must be associated with a factory")
+    
+    content = await file.read()
+    try:
+        # Up to MAX_IMPORT_ROWS rows of CSV/XLSX; kept off the event loop
+        rows = await run_in_threadpool(parse_import_file, file.filename, content)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not rows:
+        raise HTTPException(status_code=400, detail="No rows found in file")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(status_code=400, detail=f"Too many rows (max {MAX_IMPORT_ROWS})")
+    
+    job = job_registry.create("product_import", total=len(rows), owner_id=current_user.id, payload=rows)
+    background_tasks.add_task(run_product_import, job, current_user.factory_id)
+    
+    return job.to_dict()
+
+
+@router.get("/products/import/{job_id}")
+def get_product_import(
+    job_id: str,
+    current_user: User = Depends(require_role(["factory_admin", "manager"]))
+):
+    """
+    Progress and per-row errors of a bulk product import
+    """
+    job = job_registry.get(job_id, kind="product_import")
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    if job.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return job.to_dict()
+
+
 @router.get("/products")
 def list_products(
     skip: int = 0,
@@ -158,6 +202,64 @@ def list_products(
     return products
 
 
+@router.get("/products/search")
+def search_products(
+    q: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    origin_country: Optional[List[str]] = Query(None),
+    certification: Optional[List[str]] = Query(None, description="Products must have all of these"),
+    material: Optional[str] = None,
+    min_percentage: Optional[float] = Query(None, ge=0, le=100),
+    max_percentage: Optional[float] = Query(None, ge=0, le=100),
+    compliance_verified: Optional[bool] = None,
+    factory_id: Optional[int] = None,
+    facets: bool = True,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Search products by category, material share, certification and origin
+    e.g. ?certification=GOTS&material=organic cotton&min_percentage=90
+    Facet counts (category, origin_country, certification, material) cover
+    all matching products, not just the returned page.
+    """
+    if current_user.role != "platform_admin":
+        factory_id = current_user.factory_id
+        if factory_id is None:
+            # Users without a factory (e.g. buyers) own no products, as in list_products
+            empty_facets = {"category": [], "origin_country": [], "certification": [], "material": []}
+            return {"total": 0, "items": [], "facets": empty_facets if facets else None}
+    
+    search = ProductSearch(
+        factory_id=factory_id, q=q, categories=category, origin_countries=origin_country,
+        certifications=certification, material=material, min_percentage=min_percentage,
+        max_percentage=max_percentage, compliance_verified=compliance_verified
+    )
+    total, products = search.results(db, skip, limit)
+    
+    return {
+        "total": total,
+        "items": [
+            {
+                "id": product.id,
+                "sku": product.sku,
+                "name": product.name,
+                "category": product.category,
+                "dpp_id": product.dpp_id,
+                "origin_country": product.origin_country,
+                "materials": product.materials or [],
+                "certifications": product.certifications or [],
+                "compliance_verified": product.compliance_verified,
+                "qr_code_url": product.qr_code_url
+            }
+            for product in products
+        ],
+        "facets": search.facets(db) if facets else None
+    }
+
+
 @router.get("/products/{product_id}")
 def get_product(
     product_id: int,
@@ -170,156 +272,505 @@ def get_product(
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-        
-        # Check access
-        if current_user.role != "platform_admin" and product.factory_id != current_user.factory_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        factory = db.query(Factory).filter(Factory.id == product.factory_id).first()
-        
-        # Get compliance events for this product
-        events = db.query(ComplianceEvent).filter(
-            ComplianceEvent.factory_id == product.factory_id
-        ).order_by(ComplianceEvent.created_at.desc()).limit(10).all()
-        
-        return {
-            "product": product,
-            "factory": factory,
-            "recent_compliance_events": [
-                {
-                    "event_type": e.event_type,
-                    "status": e.status,
-                    "area": e.area,
-                    "created_at": e.created_at
-                }
-                for e in events
-            ]
-        }
+    
+    # Check access
+    if current_user.role != "platform_admin" and product.factory_id != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    factory = db.query(Factory).filter(Factory.id == product.factory_id).first()
+    
+    # Get compliance events for this product
+    events = db.query(ComplianceEvent).filter(
+        ComplianceEvent.factory_id == product.factory_id
+    ).order_by(ComplianceEvent.created_at.desc()).limit(10).all()
+    
+    return {
+        "product": product,
+        "factory": factory,
+        "recent_compliance_events": [
+            {
+                "event_type": e.event_type,
+                "status": e.status,
+                "area": e.area,
+                "created_at": e.created_at
+            }
+            for e in events
+        ]
+    }
+
+
+def version_dict(row) -> dict:
+    return {
+        "version": row.version,
+        "kind": row.kind,
+        "changed_fields": row.changed_fields,
+        "changed_by": row.changed_by,
+        "created_at": row.created_at.isoformat()
+    }
+
+
+@router.get("/products/{product_id}/versions")
+def list_product_versions(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Change history of a product's passport, newest first
+    """
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if current_user.role != "platform_admin" and product.factory_id != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return [version_dict(row) for row in ProductVersionService.history(db, product.id)]
+
+
+@router.get("/products/{product_id}/versions/{version}")
+def get_product_version(
+    product_id: int,
+    version: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    A product's passport fields as they were at a version
+    """
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if current_user.role != "platform_admin" and product.factory_id != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    found = ProductVersionService.document(db, product.id, version=version)
+    if not found:
+        raise HTTPException(status_code=404, detail="Version not found")
+    row, document = found
+    return {**version_dict(row), "document": document}
+
+
+@router.put("/products/{product_id}", response_model=ProductResponse)
+def update_product(
+    product_id: int,
+    product_update: ProductUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["factory_admin", "manager", "platform_admin"]))
+):
+    """
+    Update a product's passport data
+    """
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    if current_user.role != "platform_admin" and product.factory_id != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    update_data = product_update.dict(exclude_unset=True)
+    
+    if "materials" in update_data:
+        update_data["materials"] = [m.dict() for m in product_update.materials or []]
+    if "manufactured_date" in update_data:
+        manufactured_date = update_data["manufactured_date"]
+        update_data["manufactured_date"] = datetime.fromisoformat(manufactured_date) if manufactured_date else None
+    
+    before = product_document(product)
+    for field, value in update_data.items():
+        setattr(product, field, value)
+    
+    if "materials" in update_data or "certifications" in update_data:
+        sync_product_attributes(db, product)
+    if {"materials", "weight_kg", "category"} & update_data.keys():
+        FootprintService.estimate_product(db, product)
+    ProductVersionService.record(db, product, before, current_user.id)
+    invalidate_on_commit(db, dpp_id=product.dpp_id)
+    index_on_commit(db, product=product)
+    db.commit()
+    db.refresh(product)
+    
+    return product
 
 
 @router.post("/products/{product_id}/images")
 async def upload_product_image(
     product_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role(["factory_admin", "manager"]))
 ):
     """
     Upload product images for DPP
+    Thumbnail/medium/large WebP and JPEG derivatives are rendered in the
+    background and appear in product_image_variants (and the public passport).
     """
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-        
-        if product.factory_id != current_user.factory_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Upload image
-        file_service = FileUploadService()
-        result = await file_service.save_file(file, "products")
-        
-        # Add to product images
-        images = product.product_images or []
-        images.append(result["url"])
-        product.product_images = images
-        
-        db.commit()
-        
-        return {"message": "Image uploaded", "url": result["url"]}
+    
+    if product.factory_id != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    if not FileUploadService.validate_file(file.filename, "image"):
+        raise HTTPException(status_code=400, detail="Only image files are allowed")
+    
+    # Upload image
+    file_service = FileUploadService()
+    result = await file_service.save_file(file, "products")
+    
+    # Add to product images
+    before = product_document(product)
+    images = list(product.product_images or [])
+    images.append(result["url"])
+    product.product_images = images
+    ProductVersionService.record(db, product, before, current_user.id)
+    
+    invalidate_on_commit(db, dpp_id=product.dpp_id)
+    db.commit()
+    
+    background_tasks.add_task(generate_image_variants, Product, product.id, result["url"], result["file_path"])
+    
+    return {"message": "Image uploaded", "url": result["url"]}
+
+
+@router.get("/cache/stats")
+def get_dpp_cache_stats(
+    current_user: User = Depends(require_role(["platform_admin"]))
+):
+    """
+    Public DPP response cache metrics (size, hit rate, evictions)
+    """
+    return {
+        "public_dpp": public_dpp_cache.stats(),
+        "dpp_index": dpp_index.stats(),
+        "dpp_signatures": signature_cache.stats(),
+        "scan_buffer": scan_recorder.stats()
+    }
+
+
+@router.get("/analytics/scans")
+def get_scan_analytics(
+    factory_id: Optional[int] = None,
+    dpp_id: Optional[str] = None,
+    days: int = Query(30, ge=1, le=366),
+    top: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["factory_admin", "manager", "platform_admin"]))
+):
+    """
+    Passport scans per day for a factory (and its most scanned products), or for one product
+    Read from the daily rollups; scans show up within a few seconds.
+    """
+    if current_user.role != "platform_admin":
+        factory_id = current_user.factory_id
+    elif factory_id is None and dpp_id is None:
+        raise HTTPException(status_code=400, detail="factory_id is required")
+    
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    
+    if dpp_id is not None:
+        product = find_product(db, dpp_id, Product.dpp_id, Product.factory_id)
+        if not product or (factory_id is not None and product.factory_id != factory_id):
+            raise HTTPException(status_code=404, detail="Product not found")
+        rows = db.query(DppScanDaily.day, DppScanDaily.scans).filter(
+            DppScanDaily.dpp_id == product.dpp_id, DppScanDaily.day >= since
+        ).order_by(DppScanDaily.day).all()
+        return {
+            "dpp_id": product.dpp_id,
+            "total_scans": sum(scans for _, scans in rows),
+            "daily": [{"day": day.isoformat(), "scans": scans} for day, scans in rows]
+        }
+    
+    rows = db.query(FactoryScanDaily.day, FactoryScanDaily.scans, FactoryScanDaily.mobile_scans).filter(
+        FactoryScanDaily.factory_id == factory_id, FactoryScanDaily.day >= since
+    ).order_by(FactoryScanDaily.day).all()
+    
+    top_products = db.query(
+        DppScanDaily.dpp_id, func.sum(DppScanDaily.scans).label("scans"), Product.name, Product.sku
+    ).outerjoin(Product, Product.dpp_id == DppScanDaily.dpp_id).filter(
+        DppScanDaily.factory_id == factory_id, DppScanDaily.day >= since
+    ).group_by(DppScanDaily.dpp_id, Product.name, Product.sku).order_by(func.sum(DppScanDaily.scans).desc()).limit(top).all()
+    
+    return {
+        "factory_id": factory_id,
+        "since": since.isoformat(),
+        "total_scans": sum(row.scans for row in rows),
+        "mobile_scans": sum(row.mobile_scans for row in rows),
+        "daily": [{"day": row.day.isoformat(), "scans": row.scans, "mobile_scans": row.mobile_scans} for row in rows],
+        "top_products": [
+            {"dpp_id": row.dpp_id, "name": row.name, "sku": row.sku, "scans": int(row.scans)} for row in top_products
+        ]
+    }
+
+
+MAX_EXPORT_IDS = 10000
+
+def export_response(conditions: list, scope: str, format: str, gzip: bool) -> StreamingResponse:
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    started = datetime.utcnow().isoformat(timespec="seconds")
+    filename = f"dpp_export_{scope}_{started.replace(':', '')}.{extension}" + (".gz" if gzip else "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        # Pass back as since= for the next incremental export
+        "X-Export-Cursor": started
+    }
+    return StreamingResponse(
+        stream_dpp_export(conditions, format, gzip),
+        media_type="application/gzip" if gzip else media_type,
+        headers=headers
+    )
+
+
+@router.get("/export")
+def export_passports(
+    factory_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    format: str = "ndjson",
+    gzip: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bulk export of public passports for a factory (NDJSON or JSON-LD, gzip by default)
+    Defaults to the user's own factory; platform admins may omit factory_id
+    to export every factory. since= limits it to passports changed since
+    then - use the X-Export-Cursor header of the previous export.
+    """
+    if factory_id is None and current_user.role != "platform_admin":
+        factory_id = current_user.factory_id
+        if factory_id is None:
+            raise HTTPException(status_code=400, detail="factory_id is required")
+    
+    scope = f"factory{factory_id}" if factory_id is not None else "all"
+    return export_response(export_conditions(factory_id=factory_id, since=since), scope, format, gzip)
+
+
+@router.post("/export")
+def export_selected_passports(
+    request: ExportRequest,
+    format: str = "ndjson",
+    gzip: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bulk export of the public passports for a list of DPP IDs, e.g. a buyer's purchase orders
+    """
+    if len(request.dpp_ids) > MAX_EXPORT_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_EXPORT_IDS} IDs per request")
+    
+    dpp_ids = list({canonical_dpp_id(dpp_id) for dpp_id in request.dpp_ids})
+    return export_response(export_conditions(dpp_ids=dpp_ids, since=request.since), "selection", format, gzip)
 
 
 # PUBLIC ENDPOINTS (No authentication required)
 public_router = APIRouter(prefix="/public/dpp", tags=["Public DPP"])
 
 @public_router.get("/{dpp_id}")
-def get_public_dpp(dpp_id: str, db: Session = Depends(get_db)):
+def get_public_dpp(
+    dpp_id: str,
+    request: Request,
+    as_of: Optional[datetime] = Query(None, description="Passport as it was at this time (ISO 8601)"),
+    db: Session = Depends(get_db)
+):
     """
     Public endpoint - Anyone can view DPP by scanning QR code
     Returns complete product passport information
+    Served from the pre-serialized response cache, with ETag/Cache-Control
+    so browsers and CDNs can revalidate cheaply.
+    Accepts the UUID or the compact ID printed in QR codes.
+    With as_of the product's fields are rebuilt from its version history
+    (manufacturer and compliance status stay current).
     """
-    # Find product by DPP ID
-    product = db.query(Product).filter(Product.dpp_id == dpp_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Digital Product Passport not found")
-        
-        # Get factory info
-        factory = db.query(Factory).filter(Factory.id == product.factory_id).first()
-        
-        # Get compliance events
-        compliance_events = db.query(ComplianceEvent).filter(
-            ComplianceEvent.factory_id == product.factory_id
-        ).order_by(ComplianceEvent.created_at.desc()).all()
-        
-        # Calculate compliance score
-        total_events = len(compliance_events)
-        passed_events = sum(1 for e in compliance_events if e.status == "PASS")
-        compliance_rate = round((passed_events / total_events * 100), 1) if total_events > 0 else 0
+    dpp_id = canonical_dpp_id(dpp_id)
+    if as_of is not None:
+        return historical_dpp(db, dpp_id, as_of)
+    cached = public_dpp_cache.get(dpp_id)
+    
+    if cached is None:
+        epoch = public_dpp_cache.epoch()
         
-        # Get latest compliance checks by type
-        compliance_by_type = {}
-        for event in compliance_events:
-            if event.event_type not in compliance_by_type:
-                compliance_by_type[event.event_type] = {
-                    "status": event.status,
-                    "date": event.created_at.isoformat() if event.created_at else None,
-                    "area": event.area
-                }
+        # Find product by DPP ID
+        product = find_product(db, dpp_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Digital Product Passport not found")
         
-        return {
-            "dpp_id": product.dpp_id,
-            "product_name": product.name,
-            "category": product.category,
-            "sku": product.sku,
-            "description": product.description,
-            "manufacturer": {
-                "name": factory.name,
-                "location": factory.location,
-                "id": factory.id
-            },
-            "materials": product.materials or [],
-            "environmental_impact": {
-                "carbon_footprint_kg": product.carbon_footprint_kg,
-                "water_usage_liters": product.water_usage_liters,
-                "recycled_content_percentage": product.recycled_content_percentage
-            },
-            "certifications": product.certifications or [],
-            "origin": {
-                "country": product.origin_country,
-                "raw_material_source": product.raw_material_source
-            },
-            "compliance_status": {
-                "verified": product.compliance_verified,
-                "score": compliance_rate,
-                "total_checks": total_events,
-                "passed_checks": passed_events,
-                "by_type": compliance_by_type
-            },
-            "supply_chain": {
-                "manufactured_date": product.manufactured_date.isoformat() if product.manufactured_date else None,
-                "batch_tracking": product.batch_id is not None
-            },
-            "images": product.product_images or [],
-            "qr_code_url": product.qr_code_url,
-            "last_updated": product.updated_at.isoformat() if product.updated_at else product.created_at.isoformat()
-        }
+        body = json.dumps(build_public_dpp(db, product), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        cached = public_dpp_cache.put(dpp_id, body, product.factory_id, epoch)
+    
+    scan_recorder.record(
+        dpp_id, cached.factory_id, "api", request.headers.get("user-agent"), request.headers.get("accept-language")
+    )
+    
+    headers = {"ETag": cached.etag, "Cache-Control": DPP_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == cached.etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def historical_dpp(db: Session, dpp_id: str, as_of: datetime) -> dict:
+    product = find_product(db, dpp_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Digital Product Passport not found")
+    
+    moment = as_of.astimezone(timezone.utc).replace(tzinfo=None) if as_of.tzinfo else as_of
+    if product.created_at and moment < product.created_at.replace(tzinfo=None):
+        raise HTTPException(status_code=404, detail="The passport did not exist at that time")
+    
+    # Before the first recorded version (products older than the history) the baseline is the best record
+    found = ProductVersionService.document(db, product.id, as_of=moment) or ProductVersionService.document(
+        db, product.id, version=1
+    )
+    if not found:
+        return {**build_public_dpp(db, product), "version": {"version": None, "as_of": as_of.isoformat()}}
+    
+    row, document = found
+    passport = build_public_dpp(db, ProductVersionService.as_product(product, document))
+    passport["last_updated"] = row.created_at.isoformat()
+    passport["version"] = {"version": row.version, "as_of": as_of.isoformat()}
+    return passport
 
 
 @public_router.get("/verify/{dpp_id}")
-def verify_dpp(dpp_id: str, db: Session = Depends(get_db)):
+def verify_dpp(dpp_id: str, s: Optional[str] = None):
     """
     Quick verification endpoint - Check if DPP is valid
+    Answered from the in-memory DPP index, without a database round trip
+    Pass the s= token from a signed QR code to have its signature checked too.
     """
-    product = db.query(Product).filter(Product.dpp_id == dpp_id).first()
+    record = dpp_index.lookup(dpp_id)
     
-    if not product:
+    if not record:
         return {"valid": False, "message": "Invalid DPP ID"}
     
-    return {
+    result = {
         "valid": True,
-        "product_name": product.name,
-        "manufacturer": db.query(Factory).filter(Factory.id == product.factory_id).first().name,
-        "compliance_verified": product.compliance_verified
+        "product_name": record["product_name"],
+        "manufacturer": record["manufacturer"],
+        "compliance_verified": record["compliance_verified"]
+    }
+    if s is not None:
+        claim = verify_token(s)
+        if claim is None or claim["dpp_id"] != canonical_dpp_id(dpp_id) or claim["factory_id"] != record["factory_id"]:
+            result["signature"] = {"valid": False}
+        else:
+            result["signature"] = {"valid": True, "kid": claim["kid"], "sku": claim["sku"], "issued": claim["issued"]}
+    return result
+
+
+MAX_BULK_VERIFY = 5000
+MAX_BULK_VERIFY_STREAM = 200000
+BULK_VERIFY_CHUNK = 1000
+
+@public_router.post("/verify")
+def verify_dpps(
+    request: BulkVerifyRequest,
+    format: str = "json",
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk verification, e.g. a pallet scanned at warehouse receiving
+    Results come back in input order. With ?format=ndjson results are
+    streamed one JSON object per line, resolved in chunks of 1000.
+    """
+    dpp_ids = request.dpp_ids
+    
+    if format == "ndjson":
+        if len(dpp_ids) > MAX_BULK_VERIFY_STREAM:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_VERIFY_STREAM} IDs per request")
+        
+        def lines():
+            # Own session: the request's one may be closed while the response streams
+            stream_db = SessionLocal()
+            try:
+                for start in range(0, len(dpp_ids), BULK_VERIFY_CHUNK):
+                    results = verify_many(stream_db, dpp_ids[start:start + BULK_VERIFY_CHUNK])
+                    yield "".join(json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n" for result in results).encode("utf-8")
+            finally:
+                stream_db.close()
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    if format != "json":
+        raise HTTPException(status_code=400, detail="Format must be json or ndjson")
+    if len(dpp_ids) > MAX_BULK_VERIFY:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_VERIFY} IDs per request; use format=ndjson for more")
+    
+    results = verify_many(db, dpp_ids)
+    return {
+        "count": len(results),
+        "valid": sum(1 for result in results if result["valid"]),
+        "results": results
     }
 
 
 router.include_router(public_router)
+
+
+# Public keys for verifying signed DPP claims offline
+well_known_router = APIRouter(prefix="/.well-known", tags=["Public DPP"])
+
+@well_known_router.get("/dpp-keys.json")
+def get_dpp_keys():
+    """
+    Ed25519 public keys (JWKS) for the signed claims in DPP QR codes
+    Includes retired keys, so labels printed before a key rotation still verify.
+    """
+    return JSONResponse(key_ring.jwks(), headers={"Cache-Control": "public, max-age=3600"})
+
+
+# Lightweight server-rendered passport page, served at the root so QR URLs stay short
+page_router = APIRouter(prefix="/p", tags=["Public DPP"])
+
+@page_router.get("/{dpp_id}", response_class=HTMLResponse)
+def get_public_dpp_page(dpp_id: str, request: Request, unit: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Public passport as a single small HTML page (no JavaScript needed)
+    Rendered once per dpp_id and cached with a precompressed gzip copy.
+    Unit labels add ?unit=<serial>; a recalled, returned, ... unit gets an
+    uncached page with a warning, every other unit the cached page.
+    """
+    dpp_id = canonical_dpp_id(dpp_id)
+    serial = parse_serial(unit) if unit else None
+    unit_details = UnitSerialService.resolve(db, serial) if serial is not None else None
+    if unit_details and unit_details["dpp_id"] == dpp_id and unit_details["status"] != "active":
+        product = find_product(db, dpp_id)
+        scan_recorder.record(
+            dpp_id, product.factory_id, "page", request.headers.get("user-agent"), request.headers.get("accept-language")
+        )
+        return HTMLResponse(
+            render_passport_page(build_public_dpp(db, product), unit_notice(unit_details)),
+            headers={"Cache-Control": "no-store"}
+        )
+    
+    cached = public_dpp_page_cache.get(dpp_id)
+    
+    if cached is None:
+        epoch = public_dpp_page_cache.epoch()
+        
+        product = find_product(db, dpp_id)
+        if not product:
+            return HTMLResponse(NOT_FOUND_PAGE, status_code=404)
+        
+        html = render_passport_page(build_public_dpp(db, product)).encode("utf-8")
+        cached = public_dpp_page_cache.put(dpp_id, html, product.factory_id, epoch, compress=True)
+    
+    scan_recorder.record(
+        dpp_id, cached.factory_id, "page", request.headers.get("user-agent"), request.headers.get("accept-language")
+    )
+    
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    etag = cached.etag[:-1] + '-gz"' if use_gzip else cached.etag
+    headers = {"ETag": etag, "Cache-Control": DPP_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached.gzip_body, media_type="text/html; charset=utf-8", headers=headers)
+    
+    return Response(content=cached.body, media_type="text/html; charset=utf-8", headers=headers)
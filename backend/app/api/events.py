@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.models.complience_event import ComplianceEvent
 from app.schemas.complience_event import ComplianceEventCreate, ComplianceEventResponse
+from app.services.compliance_analytics import ComplianceAnalyticsService
+from app.services.compliance_summary import ComplianceSummaryService
 
 router = APIRouter(prefix="/events", tags=["Compliance Events"])
 
@@ -24,6 +26,7 @@ def create_event(
 ):
     new_event = ComplianceEvent(**event.dict())
     db.add(new_event)
+    ComplianceSummaryService.record_created(db, new_event)
     db.commit()
     db.refresh(new_event)
     return new_event
@@ -55,15 +58,10 @@ def compliance_summary(
     factory_id: int,
     db: Session = Depends(get_db)
 ):
-    total = db.query(ComplianceEvent)\
-        .filter(ComplianceEvent.factory_id == factory_id)\
-        .count()
-
-    compliant = db.query(ComplianceEvent)\
-        .filter(
-            ComplianceEvent.factory_id == factory_id,
-            ComplianceEvent.status == "COMPLIANT"
-        ).count()
+    ComplianceSummaryService.ensure_rollups(db, factory_id)
+    counts = ComplianceAnalyticsService.status_counts(db, factory_id)
+    total = sum(counts.values())
+    compliant = counts.get("COMPLIANT", 0)
 
     return {
         "factory_id": factory_id,
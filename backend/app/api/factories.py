@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import Optional, List
+
+from app.core.dependencies import get_db, get_current_user, require_role
+from app.core.roles import COMPLIANCE_MANAGER_ROLES
+from app.models.content import Course
+from app.models.factory import Factory
+from app.models.training import FactoryRequiredCourse
+from app.models.user import User
+from app.services.dpp_cache import invalidate_on_commit
+from app.services.dpp_index import index_on_commit
+from app.services.training_matrix import TrainingMatrix
+
+router = APIRouter(prefix="/factories", tags=["Factories"])
+
+# Schemas
+class FactoryUpdate(BaseModel):
+    name: Optional[str] = None
+    location: Optional[str] = None
+
+class RequiredCoursesUpdate(BaseModel):
+    course_ids: List[int]
+
+
+def get_factory_for_user(db: Session, factory_id: int, current_user: User) -> Factory:
+    """Load a factory, allowing only its own staff or a platform admin"""
+    if current_user.role != "platform_admin" and current_user.factory_id != factory_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    factory = db.query(Factory).filter(Factory.id == factory_id).first()
+    if not factory:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Factory not found")
+    
+    return factory
+
+
+@router.get("/{factory_id}")
+def get_factory(
+    factory_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get factory details
+    """
+    factory = get_factory_for_user(db, factory_id, current_user)
+    return {"id": factory.id, "name": factory.name, "location": factory.location}
+
+
+@router.put("/{factory_id}")
+def update_factory(
+    factory_id: int,
+    update: FactoryUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["factory_admin", "platform_admin"]))
+):
+    """
+    Update factory details shown on its products' passports
+    """
+    factory = get_factory_for_user(db, factory_id, current_user)
+    
+    for field, value in update.dict(exclude_unset=True).items():
+        setattr(factory, field, value)
+    
+    invalidate_on_commit(db, factory_id=factory.id)
+    index_on_commit(db, factory=factory)
+    db.commit()
+    
+    return {"id": factory.id, "name": factory.name, "location": factory.location}
+
+
+@router.get("/{factory_id}/required-courses")
+def list_required_courses(
+    factory_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(COMPLIANCE_MANAGER_ROLES))
+):
+    """
+    List the courses a factory requires its workers to complete
+    """
+    get_factory_for_user(db, factory_id, current_user)
+    
+    courses = db.query(Course.id, Course.title).join(
+        FactoryRequiredCourse, FactoryRequiredCourse.course_id == Course.id
+    ).filter(FactoryRequiredCourse.factory_id == factory_id).order_by(Course.id).all()
+    
+    return [{"id": course.id, "title": course.title} for course in courses]
+
+
+@router.put("/{factory_id}/required-courses")
+def set_required_courses(
+    factory_id: int,
+    update: RequiredCoursesUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(COMPLIANCE_MANAGER_ROLES))
+):
+    """
+    Replace the set of mandatory courses for a factory
+    """
+    get_factory_for_user(db, factory_id, current_user)
+    
+    course_ids = set(update.course_ids)
+    found = {row[0] for row in db.query(Course.id).filter(Course.id.in_(course_ids)).all()}
+    if found != course_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown course ids: {sorted(course_ids - found)}"
+        )
+    
+    db.query(FactoryRequiredCourse).filter(FactoryRequiredCourse.factory_id == factory_id).delete()
+    db.add_all([FactoryRequiredCourse(factory_id=factory_id, course_id=course_id) for course_id in sorted(course_ids)])
+    db.commit()
+    
+    return {"factory_id": factory_id, "course_ids": sorted(course_ids)}
+
+
+@router.get("/{factory_id}/training-matrix")
+def get_training_matrix(
+    factory_id: int,
+    course_ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(COMPLIANCE_MANAGER_ROLES))
+):
+    """
+    Workers x required courses completion matrix with coverage and gaps
+    - Defaults to the factory's required courses; pass course_ids to override
+    - The matrix itself is bit-packed (see TrainingMatrix.iter_json)
+    """
+    get_factory_for_user(db, factory_id, current_user)
+    
+    if course_ids is None:
+        course_ids = [
+            row[0] for row in db.query(FactoryRequiredCourse.course_id)
+            .filter(FactoryRequiredCourse.factory_id == factory_id).all()
+        ]
+    
+    matrix = TrainingMatrix.build(db, factory_id, course_ids)
+    
+    return StreamingResponse(matrix.iter_json(), media_type="application/json")
@@ -0,0 +1,188 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.core.dependencies import get_db, require_role
+from app.core.roles import PRODUCT_MANAGER_ROLES
+from app.db.session import SessionLocal
+from app.models.footprint import FootprintRollup, MaterialFootprintFactor
+from app.models.user import User
+from app.services.footprint import ROLLUP_DIMENSIONS, FootprintService
+from app.services.jobs import Job, job_registry
+from app.services.product_search import normalize
+
+router = APIRouter(prefix="/footprint", tags=["Environmental Footprint"])
+
+# Schemas
+class FootprintFactor(BaseModel):
+    material: str
+    co2e_kg_per_kg: float
+    water_liters_per_kg: float
+    source: Optional[str] = None
+
+
+class FactorUpdate(BaseModel):
+    factors: List[FootprintFactor]
+    recalculate: bool = True  # Re-estimate all products once the table is saved
+
+
+def run_footprint_recalculation(job: Job, factory_id: Optional[int]):
+    """Background task: re-estimate products and rebuild rollups"""
+    job.status = "running"
+    db = SessionLocal()
+    try:
+        job.result = FootprintService.recalculate(db, factory_id)
+        job.advance(job.total)
+        job.finish()
+    except Exception as e:
+        db.rollback()
+        job.add_error({"errors": [str(e)]})
+        job.finish("failed")
+    finally:
+        db.close()
+
+
+def scope_factory_id(current_user: User, factory_id: Optional[int]) -> Optional[int]:
+    """Factory staff are limited to their own factory; platform admins may pick one or all (None)"""
+    if current_user.role == "platform_admin":
+        return factory_id
+    if not current_user.factory_id:
+        raise HTTPException(status_code=400, detail="User must be associated with a factory")
+    if factory_id is not None and factory_id != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return current_user.factory_id
+
+
+# Routes
+@router.get("/factors")
+def list_factors(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """Emission and water factors per kg of material"""
+    FootprintService.seed_factors(db)
+    db.commit()
+    factors = db.query(MaterialFootprintFactor).order_by(MaterialFootprintFactor.material).all()
+    return [
+        {
+            "material": factor.material,
+            "name": factor.name,
+            "co2e_kg_per_kg": factor.co2e_kg_per_kg,
+            "water_liters_per_kg": factor.water_liters_per_kg,
+            "source": factor.source,
+            "updated_at": factor.updated_at
+        }
+        for factor in factors
+    ]
+
+
+@router.put("/factors")
+def update_factors(
+    factor_update: FactorUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["platform_admin"]))
+):
+    """
+    Add or change material factors
+    Existing materials not in the request are kept. By default every product
+    is re-estimated in the background; poll /footprint/recalculate/{job_id}.
+    """
+    FootprintService.seed_factors(db)
+    for factor in factor_update.factors:
+        key = normalize(factor.material)
+        if not key:
+            raise HTTPException(status_code=400, detail="Material name is required")
+        if factor.co2e_kg_per_kg < 0 or factor.water_liters_per_kg < 0:
+            raise HTTPException(status_code=400, detail=f"Factors for {factor.material} must not be negative")
+        row = db.query(MaterialFootprintFactor).filter(MaterialFootprintFactor.material == key).first()
+        if row is None:
+            row = MaterialFootprintFactor(material=key)
+            db.add(row)
+        row.name = factor.material.strip()
+        row.co2e_kg_per_kg = factor.co2e_kg_per_kg
+        row.water_liters_per_kg = factor.water_liters_per_kg
+        row.source = factor.source
+    db.commit()
+
+    result = {"updated": len(factor_update.factors), "job": None}
+    if factor_update.recalculate:
+        job = job_registry.create("footprint_recalculation", total=1, owner_id=current_user.id)
+        background_tasks.add_task(run_footprint_recalculation, job, None)
+        result["job"] = job.to_dict()
+    return result
+
+
+@router.post("/recalculate")
+def recalculate_footprints(
+    background_tasks: BackgroundTasks,
+    factory_id: Optional[int] = None,
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Re-estimate footprints and rebuild rollups for a factory
+    Platform admins may omit factory_id to recalculate the whole platform.
+    """
+    factory_id = scope_factory_id(current_user, factory_id)
+    job = job_registry.create("footprint_recalculation", total=1, owner_id=current_user.id)
+    background_tasks.add_task(run_footprint_recalculation, job, factory_id)
+    return job.to_dict()
+
+
+@router.get("/recalculate/{job_id}")
+def get_footprint_recalculation(
+    job_id: str,
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """Status, counts and timings of a recalculation"""
+    job = job_registry.get(job_id, kind="footprint_recalculation")
+    if not job:
+        raise HTTPException(status_code=404, detail="Recalculation not found")
+    if job.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return job.to_dict()
+
+
+@router.get("/rollups")
+def get_rollups(
+    factory_id: Optional[int] = None,
+    dimension: Optional[str] = Query(None, description="factory, category or origin_country"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Precomputed footprint totals and averages
+    Effective figures use a product's reported footprint where it has one and
+    the estimate otherwise; refreshed by each recalculation.
+    """
+    factory_id = scope_factory_id(current_user, factory_id)
+    if dimension is not None and dimension not in ROLLUP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimension must be one of {', '.join(ROLLUP_DIMENSIONS)}")
+
+    query = db.query(FootprintRollup)
+    if factory_id is not None:
+        query = query.filter(FootprintRollup.factory_id == factory_id)
+    if dimension is not None:
+        query = query.filter(FootprintRollup.dimension == dimension)
+    rollups = query.order_by(
+        FootprintRollup.factory_id, FootprintRollup.dimension, FootprintRollup.carbon_total_kg.desc()
+    ).all()
+
+    return [
+        {
+            "factory_id": rollup.factory_id,
+            "dimension": rollup.dimension,
+            "value": rollup.value or None,
+            "products": rollup.products,
+            "products_reported": rollup.products_reported,
+            "products_estimated": rollup.products_estimated,
+            "carbon_total_kg": rollup.carbon_total_kg,
+            "carbon_avg_kg": rollup.carbon_avg_kg,
+            "water_total_liters": rollup.water_total_liters,
+            "water_avg_liters": rollup.water_avg_liters,
+            "computed_at": rollup.computed_at
+        }
+        for rollup in rollups
+    ]
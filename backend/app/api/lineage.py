@@ -0,0 +1,165 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.dependencies import get_db, require_role
+from app.core.roles import PRODUCT_MANAGER_ROLES
+from app.models.batch import Batch
+from app.models.factory import Factory
+from app.models.lineage import BatchInput
+from app.models.product import Product
+from app.models.user import User
+from app.services.lineage import LineageService
+from app.services.passport import find_product
+
+router = APIRouter(prefix="/lineage", tags=["Supply Chain Lineage"])
+
+# Schemas
+class BatchInputCreate(BaseModel):
+    input_batch_id: Optional[int] = None  # A batch tracked on the platform (e.g. a fabric lot)
+    supplier_factory_id: Optional[int] = None  # Or just the supplier, for untracked inputs
+    material: Optional[str] = None
+    quantity: Optional[float] = None
+    unit: Optional[str] = None
+
+
+def get_batch_for_user(db: Session, batch_id: int, current_user: User) -> Batch:
+    """Load a batch, allowing only staff of the factory that produces it or a platform admin"""
+    row = db.query(Batch, Product.factory_id).join(Product, Product.id == Batch.product_id).filter(
+        Batch.id == batch_id
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch, factory_id = row
+    if current_user.role != "platform_admin" and current_user.factory_id != factory_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return batch
+
+
+def batch_input_dict(batch_input: BatchInput) -> dict:
+    return {
+        "id": batch_input.id,
+        "batch_id": batch_input.batch_id,
+        "input_batch_id": batch_input.input_batch_id,
+        "supplier_factory_id": batch_input.supplier_factory_id,
+        "material": batch_input.material,
+        "quantity": batch_input.quantity,
+        "unit": batch_input.unit
+    }
+
+
+@router.get("/batches/{batch_id}/inputs")
+def list_batch_inputs(
+    batch_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Direct inputs of a batch
+    """
+    get_batch_for_user(db, batch_id, current_user)
+    inputs = db.query(BatchInput).filter(BatchInput.batch_id == batch_id).order_by(BatchInput.id).all()
+    return [batch_input_dict(batch_input) for batch_input in inputs]
+
+
+@router.post("/batches/{batch_id}/inputs")
+def add_batch_input(
+    batch_id: int,
+    request: BatchInputCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Record an input batch (or an untracked supplier input) of a batch
+    Input batches may belong to other factories: suppliers share their batch IDs.
+    """
+    get_batch_for_user(db, batch_id, current_user)
+
+    if request.input_batch_id is None and request.supplier_factory_id is None:
+        raise HTTPException(status_code=400, detail="Give input_batch_id or supplier_factory_id")
+    if request.input_batch_id is not None and not db.query(Batch.id).filter(Batch.id == request.input_batch_id).first():
+        raise HTTPException(status_code=404, detail="Input batch not found")
+    if request.supplier_factory_id is not None and not db.query(Factory.id).filter(
+        Factory.id == request.supplier_factory_id
+    ).first():
+        raise HTTPException(status_code=404, detail="Supplier factory not found")
+
+    try:
+        batch_input = LineageService.add_input(db, batch_id, **request.dict())
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="That batch is already an input of this batch")
+
+    return batch_input_dict(batch_input)
+
+
+@router.delete("/batches/{batch_id}/inputs/{input_id}")
+def remove_batch_input(
+    batch_id: int,
+    input_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Remove an input of a batch (the lineage below it is recomputed)
+    """
+    get_batch_for_user(db, batch_id, current_user)
+    batch_input = db.query(BatchInput).filter(BatchInput.id == input_id, BatchInput.batch_id == batch_id).first()
+    if not batch_input:
+        raise HTTPException(status_code=404, detail="Batch input not found")
+
+    LineageService.remove_input(db, batch_input)
+    db.commit()
+    return {"message": "Batch input removed"}
+
+
+@router.post("/rebuild")
+def rebuild_lineage(
+    check: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["platform_admin"]))
+):
+    """
+    Recompute the lineage closure table from batch inputs (platform admin only)
+    With check=true only reports rows that differ.
+    """
+    if check:
+        mismatches = LineageService.check_consistency(db)
+        return {"consistent": not mismatches, "mismatches": mismatches[:100]}
+
+    rows = LineageService.rebuild(db)
+    db.commit()
+    return {"rows": rows}
+
+
+# PUBLIC ENDPOINTS (No authentication required)
+public_router = APIRouter(prefix="/dpp/public/dpp", tags=["Public DPP"])
+
+@public_router.get("/{dpp_id}/lineage")
+def get_dpp_lineage(
+    dpp_id: str,
+    direction: str = Query("upstream", description="upstream (inputs and suppliers) or downstream (products made from it)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Public - supply-chain lineage of a product
+    Upstream lists every input batch, supplier factory and compliance event
+    behind the product, by tier; downstream lists the products made from it.
+    """
+    if direction not in ("upstream", "downstream"):
+        raise HTTPException(status_code=400, detail="Direction must be upstream or downstream")
+
+    product = find_product(db, dpp_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Digital Product Passport not found")
+
+    if direction == "downstream":
+        return LineageService.downstream(db, product)
+    return LineageService.upstream(db, product)
@@ -1,11 +1,247 @@
-from fastapi import APIRouter
-from app.services.qr import generate_qr
+from types import SimpleNamespace
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from slugify import slugify
+
+from app.core.config import PUBLIC_API_URL, QR_LOGO_PATH
+from app.core.dependencies import get_db, require_role
+from app.core.roles import PRODUCT_MANAGER_ROLES
+from app.models.batch import Batch
+from app.models.product import Product
+from app.models.user import User
+from app.services.label_sheets import PAGE_SIZES, LabelLayout, stream_label_pdf, stream_label_zip
+from app.services.dpp_ids import canonical_dpp_id
+from app.services.dpp_signing import key_ring, signature_cache, signed_dpp_url
+from app.services.passport import dpp_public_url, find_product
+from app.services.unit_serials import UnitSerialService, format_serial
+from app.services.qr_engine import ERROR_CORRECTION_LEVELS, QRSizeError
+from app.services.qr_cache import DEFAULT_QR_SIZE, QR_CACHE_CONTROL, QR_FORMATS, QR_SIZES, qr_cache, qr_key
 
 router = APIRouter(prefix="/qr", tags=["QR"])
 
+MAX_LABELS = 100000
+
+
+class QROptions:
+    """Query parameters shared by the QR endpoints"""
+
+    def __init__(
+        self,
+        format: str = Query("png", description="png or svg"),
+        size: int = Query(DEFAULT_QR_SIZE, description=f"One of {', '.join(map(str, QR_SIZES))}"),
+        ec: Optional[str] = Query(None, description="Error correction L/M/Q/H (default M, H with a logo)"),
+        logo: bool = False
+    ):
+        if format not in QR_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(QR_FORMATS)}")
+        if size not in QR_SIZES:
+            raise HTTPException(status_code=400, detail=f"Unsupported size. Use one of: {', '.join(map(str, QR_SIZES))}")
+        if ec is not None and ec.upper() not in ERROR_CORRECTION_LEVELS:
+            raise HTTPException(status_code=400, detail="Error correction must be one of L, M, Q, H")
+
+        self.format = format
+        self.size = size
+        self.logo_path = QR_LOGO_PATH if logo else None
+        self.error_correction = ec.upper() if ec else ("H" if self.logo_path else "M")
+
+
+def qr_response(request: Request, payload: str, options: QROptions, exists) -> Response:
+    """
+    Serve a QR image from the cache, rendering it on first request
+    exists() is only called on a cache miss, so hits never touch the database.
+    """
+    key = qr_key(payload, options.size, options.format, options.error_correction, options.logo_path)
+    headers = {"ETag": f'"{key}"', "Cache-Control": QR_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    body = qr_cache.lookup(key, options.format)
+    if body is None:
+        if not exists():
+            raise HTTPException(status_code=404, detail="Not found")
+        try:
+            _, body = qr_cache.get(payload, options.size, options.format, options.error_correction, options.logo_path)
+        except QRSizeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return Response(content=body, media_type=QR_FORMATS[options.format], headers=headers)
+
+
+def require_signing_key():
+    if not key_ring.can_sign:
+        raise HTTPException(status_code=503, detail="Signed QR codes are not available: no DPP signing key is configured")
+
+
+@router.get("/dpp/{dpp_id}")
+def get_dpp_qr(
+    dpp_id: str,
+    request: Request,
+    signed: bool = Query(False, description="Embed a signed claim that scanners can verify offline"),
+    options: QROptions = Depends(),
+    db: Session = Depends(get_db)
+):
+    """
+    Public - QR code pointing at a product's Digital Product Passport
+    """
+    if not signed:
+        return qr_response(
+            request, dpp_public_url(dpp_id), options,
+            lambda: find_product(db, dpp_id, Product.id) is not None
+        )
+
+    require_signing_key()
+    dpp_id = canonical_dpp_id(dpp_id)
+    token = signature_cache.get(dpp_id)
+    if token is not None:
+        payload = f"{dpp_public_url(dpp_id)}?s={token}"
+    else:
+        product = find_product(db, dpp_id, Product.dpp_id, Product.sku, Product.factory_id, Product.created_at)
+        if not product:
+            raise HTTPException(status_code=404, detail="Not found")
+        payload = signed_dpp_url(product.dpp_id, product.sku, product.factory_id, product.created_at)
+    return qr_response(request, payload, options, lambda: True)
+
+
 @router.get("/batch/{batch_id}")
-def get_batch_qr(batch_id: int):
-    dpp_url = f"https://api.yourdomain.com/public/dpp/batch/{batch_id}"
-    img = generate_qr(dpp_url)
-    return StreamingResponse(img, media_type="image/png")
+def get_batch_qr(
+    batch_id: int,
+    request: Request,
+    options: QROptions = Depends(),
+    db: Session = Depends(get_db)
+):
+    """
+    Public - QR code pointing at a batch's public passport
+    """
+    return qr_response(
+        request, f"{PUBLIC_API_URL}/public/dpp/batch/{batch_id}", options,
+        lambda: db.query(Batch.id).filter(Batch.id == batch_id).first() is not None
+    )
+
+
+def product_payload(product, signed: bool) -> str:
+    if signed:
+        return signed_dpp_url(product.dpp_id, product.sku, product.factory_id, product.created_at)
+    return dpp_public_url(product.dpp_id)
+
+
+def batch_labels(batch: Batch, products, scope: str, signed: bool = False, ranges=()):
+    """Labels for a batch, generated lazily: one per unit (from its serial ranges), or one per product"""
+    if scope == "units":
+        product = products[0]
+        url = product_payload(product, signed)
+        separator = "&" if "?" in url else "?"
+        for number, unit_number in UnitSerialService.serials(ranges, limit=batch.quantity):
+            serial = format_serial(number)
+            yield {
+                "payload": f"{url}{separator}unit={serial}",
+                # The check symbol can be * or $, which not every file system accepts
+                "name": f"{unit_number:0{max(5, len(str(batch.quantity)))}d}_{serial.split('-')[0]}",
+                "caption": [product.name, f"{serial}  #{unit_number}"]
+            }
+    else:
+        for product in products:
+            yield {
+                "payload": product_payload(product, signed),
+                "name": slugify(product.sku) or product.dpp_id,
+                "caption": [product.name, product.sku]
+            }
+
+
+@router.get("/batch/{batch_id}/labels")
+def get_batch_labels(
+    batch_id: int,
+    format: str = Query("pdf", description="pdf (label sheets) or zip (one PNG per label)"),
+    scope: str = Query("units", description="units (one label per unit of the batch) or products"),
+    page_size: str = "A4",
+    columns: int = Query(3, ge=1, le=12),
+    rows: int = Query(8, ge=1, le=20),
+    margin_mm: float = Query(8, ge=0, le=50),
+    gap_mm: float = Query(3, ge=0, le=30),
+    captions: bool = True,
+    signed: bool = Query(False, description="Embed each product's signed claim"),
+    size: int = Query(512, description="PNG size in pixels (zip only)"),
+    ec: str = Query("M", description="Error correction L/M/Q/H"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Print-ready QR labels for a production batch
+    Rendered in the process pool and streamed page by page (PDF) or file by
+    file (ZIP), so large batches are never held in memory.
+    """
+    if format not in ("pdf", "zip"):
+        raise HTTPException(status_code=400, detail="Format must be pdf or zip")
+    if signed:
+        require_signing_key()
+    if scope not in ("units", "products"):
+        raise HTTPException(status_code=400, detail="Scope must be units or products")
+    if page_size not in PAGE_SIZES:
+        raise HTTPException(status_code=400, detail=f"Page size must be one of: {', '.join(PAGE_SIZES)}")
+    if size not in QR_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unsupported size. Use one of: {', '.join(map(str, QR_SIZES))}")
+    if ec.upper() not in ERROR_CORRECTION_LEVELS:
+        raise HTTPException(status_code=400, detail="Error correction must be one of L, M, Q, H")
+    layout = None
+    if format == "pdf":
+        try:
+            layout = LabelLayout(page_size, columns, rows, margin_mm, gap_mm, captions)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    batch = db.query(Batch).filter(Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    # Everything the labels need is loaded now; the stream doesn't touch the session
+    products = db.query(
+        Product.id, Product.factory_id, Product.name, Product.sku, Product.dpp_id, Product.created_at
+    ).filter(
+        or_(Product.id == batch.product_id, Product.batch_id == batch.id)
+    ).order_by(Product.id != batch.product_id, Product.id).all()
+    if not products:
+        raise HTTPException(status_code=404, detail="Batch has no products")
+    if current_user.role != "platform_admin" and products[0].factory_id != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    count = batch.quantity if scope == "units" else len(products)
+    if count > MAX_LABELS:
+        raise HTTPException(status_code=400, detail=f"Too many labels ({count}); the limit is {MAX_LABELS}")
+
+    ranges = []
+    if scope == "units":
+        # Serials are allocated on first print and reused for reprints
+        try:
+            ranges = UnitSerialService.ensure_allocated(db, batch)
+        except (ValueError, RuntimeError) as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+        db.commit()
+        ranges = [SimpleNamespace(start=r.start, count=r.count, first_unit=r.first_unit) for r in ranges]
+
+    labels = batch_labels(batch, products, scope, signed, ranges)
+    filename = f"labels_{slugify(batch.batch_code) or batch.id}_{scope}"
+
+    if format == "zip":
+        return StreamingResponse(
+            stream_label_zip(labels, size, ec.upper()),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.zip"'}
+        )
+
+    return StreamingResponse(
+        stream_label_pdf(labels, layout, ec.upper()),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.pdf"'}
+    )
+
+
+@router.get("/cache/stats")
+def get_qr_cache_stats(current_user=Depends(require_role(["platform_admin"]))):
+    """
+    QR cache hit/render counters (platform admin only)
+    """
+    return qr_cache.stats()
@@ -0,0 +1,168 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.core.dependencies import get_db, require_role
+from app.core.roles import PRODUCT_MANAGER_ROLES
+from app.models.batch import Batch
+from app.models.product import Product
+from app.models.user import User
+from app.services.dpp_ids import compact_dpp_id
+from app.services.passport import dpp_public_url
+from app.services.unit_serials import UNIT_STATUSES, UnitSerialService, format_serial, parse_serial
+
+router = APIRouter(prefix="/units", tags=["Unit Serials"])
+
+MAX_STATUS_SERIALS = 10000
+
+# Schemas
+class UnitStatusUpdate(BaseModel):
+    serials: List[str]
+    status: str  # active / recalled / returned / destroyed / lost
+    note: Optional[str] = None
+
+
+def get_batch_for_user(db: Session, batch_id: int, current_user: User) -> Batch:
+    """Load a batch, allowing only staff of the factory that produces it or a platform admin"""
+    row = db.query(Batch, Product.factory_id).join(Product, Product.id == Batch.product_id).filter(
+        Batch.id == batch_id
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch, factory_id = row
+    if current_user.role != "platform_admin" and current_user.factory_id != factory_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return batch
+
+
+def batch_units(db: Session, batch: Batch, ranges) -> dict:
+    return {
+        "batch_id": batch.id,
+        "batch_code": batch.batch_code,
+        "quantity": batch.quantity,
+        "allocated": sum(unit_range.count for unit_range in ranges),
+        "ranges": [
+            {
+                "first_unit": unit_range.first_unit,
+                "count": unit_range.count,
+                "first_serial": format_serial(unit_range.start),
+                "last_serial": format_serial(unit_range.start + unit_range.count - 1)
+            }
+            for unit_range in ranges
+        ],
+        "exceptions": UnitSerialService.exception_counts(db, [unit_range.id for unit_range in ranges])
+    }
+
+
+@router.get("/batches/{batch_id}")
+def get_batch_units(
+    batch_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """Serial ranges of a batch and how many of its units are recalled, returned, ..."""
+    batch = get_batch_for_user(db, batch_id, current_user)
+    return batch_units(db, batch, UnitSerialService.batch_ranges(db, batch.id))
+
+
+@router.post("/batches/{batch_id}/allocate")
+def allocate_batch_units(
+    batch_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Allocate serials for every unit of the batch
+    Idempotent: only units without a serial (e.g. after the quantity was
+    raised) get a new range. Unit labels allocate automatically.
+    """
+    batch = get_batch_for_user(db, batch_id, current_user)
+    try:
+        ranges = UnitSerialService.ensure_allocated(db, batch)
+    except (ValueError, RuntimeError) as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    db.commit()
+    return batch_units(db, batch, ranges)
+
+
+@router.put("/status")
+def update_unit_status(
+    status_update: UnitStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """
+    Mark units as recalled, returned, destroyed or lost (or active again)
+    All serials must be valid and belong to the user's factory; nothing is
+    changed otherwise.
+    """
+    if status_update.status not in UNIT_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Status must be one of: {', '.join(UNIT_STATUSES)}")
+    if not status_update.serials:
+        raise HTTPException(status_code=400, detail="No serials given")
+    if len(status_update.serials) > MAX_STATUS_SERIALS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATUS_SERIALS} serials per request")
+
+    parsed = {value: parse_serial(value) for value in status_update.serials}
+    invalid = [value for value, serial in parsed.items() if serial is None]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid serials: {', '.join(invalid[:20])}")
+
+    ranges = UnitSerialService.ranges_for(db, list(set(parsed.values())))
+    unknown = [value for value, serial in parsed.items() if serial not in ranges]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown serials: {', '.join(unknown[:20])}")
+    if current_user.role != "platform_admin" and any(
+        factory_id != current_user.factory_id for _, _, _, factory_id in ranges.values()
+    ):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    UnitSerialService.set_status(db, ranges, status_update.status, status_update.note, current_user.id)
+    db.commit()
+    return {"updated": len(ranges), "status": status_update.status}
+
+
+@router.get("/{serial}")
+def get_unit(
+    serial: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(PRODUCT_MANAGER_ROLES))
+):
+    """Batch, product and status of a unit"""
+    number = parse_serial(serial)
+    unit = UnitSerialService.resolve(db, number) if number is not None else None
+    if not unit:
+        raise HTTPException(status_code=404, detail="Unit not found")
+    if current_user.role != "platform_admin" and unit["factory_id"] != current_user.factory_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return unit
+
+
+# PUBLIC ENDPOINTS (No authentication required)
+public_router = APIRouter(prefix="/dpp/public/units", tags=["Public DPP"])
+
+@public_router.get("/{serial}")
+def get_public_unit(serial: str, db: Session = Depends(get_db)):
+    """
+    Public lookup of a unit serial printed on a garment label
+    Returns the unit's status and the passport it belongs to.
+    """
+    number = parse_serial(serial)
+    unit = UnitSerialService.resolve(db, number) if number is not None else None
+    if not unit:
+        raise HTTPException(status_code=404, detail="Unit not found")
+    return {
+        "serial": unit["serial"],
+        "unit_number": unit["unit_number"],
+        "batch_code": unit["batch_code"],
+        "batch_quantity": unit["batch_quantity"],
+        "status": unit["status"],
+        "status_updated_at": unit["status_updated_at"],
+        "dpp_id": unit["dpp_id"],
+        "compact_id": compact_dpp_id(unit["dpp_id"]),
+        "product_name": unit["product_name"],
+        "passport_url": dpp_public_url(unit["dpp_id"])
+    }
@@ -7,3 +7,54 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 43200))  # 30 days
+
+# Public URLs
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3001")
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "http://localhost:8000")
+# Where DPP QR codes point. Set to f"{PUBLIC_API_URL}/p" to serve the lightweight server-rendered page
+DPP_PAGE_BASE_URL = os.getenv("DPP_PAGE_BASE_URL", f"{FRONTEND_URL}/dpp")
+
+# Background work
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 2))
+
+# Public DPP response cache
+DPP_CACHE_MAX_BYTES = int(os.getenv("DPP_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+DPP_CACHE_TTL_SECONDS = int(os.getenv("DPP_CACHE_TTL_SECONDS", 300))  # Bounds staleness across API worker processes
+DPP_CACHE_CONTROL = os.getenv("DPP_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300")
+
+# In-memory DPP ID index for the verify endpoints
+DPP_INDEX_SYNC_SECONDS = float(os.getenv("DPP_INDEX_SYNC_SECONDS", 5))  # Bounds staleness for writes by other API workers
+DPP_INDEX_FALSE_POSITIVE_RATE = float(os.getenv("DPP_INDEX_FALSE_POSITIVE_RATE", 0.01))
+
+# QR code cache (rendered on demand, content-addressed)
+QR_CACHE_DIR = os.getenv("QR_CACHE_DIR", "uploads/qrcache")
+QR_CACHE_MAX_BYTES = int(os.getenv("QR_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+QR_LOGO_PATH = os.getenv("QR_LOGO_PATH")  # Optional logo embedded when ?logo=true
+
+# Signed DPP claims in QR codes (Ed25519)
+# "kid:<base64url 32-byte private key>,..." - the first key signs, the rest still verify.
+# Generate one with: python -m app.services.dpp_signing generate <kid>
+DPP_SIGNING_KEYS = os.getenv("DPP_SIGNING_KEYS", "")
+# Public keys of retired signing keys, "kid:<base64url public key>,...", so labels already printed keep verifying
+DPP_RETIRED_PUBLIC_KEYS = os.getenv("DPP_RETIRED_PUBLIC_KEYS", "")
+# Development only: without DPP_SIGNING_KEYS, sign with a key derived from SECRET_KEY (kid "dev") instead of refusing
+DPP_SIGNING_DEV_KEY = os.getenv("DPP_SIGNING_DEV_KEY", "false").lower() in ("1", "true", "yes")
+DPP_SIGNATURE_CACHE_SIZE = int(os.getenv("DPP_SIGNATURE_CACHE_SIZE", 100000))
+
+# Public DPP scan analytics (buffered in process, flushed in batches)
+SCAN_BUFFER_SIZE = int(os.getenv("SCAN_BUFFER_SIZE", 100000))  # Oldest records are dropped beyond this
+SCAN_FLUSH_SECONDS = float(os.getenv("SCAN_FLUSH_SECONDS", 2))
+SCAN_FLUSH_BATCH = int(os.getenv("SCAN_FLUSH_BATCH", 5000))
+
+# Product history: a full snapshot at least every N versions, so reconstructing any version replays < N deltas
+PRODUCT_SNAPSHOT_INTERVAL = int(os.getenv("PRODUCT_SNAPSHOT_INTERVAL", 20))
+
+# Read-only edge replicas (uvicorn app.edge:app) serving public passports from exported files
+EDGE_DATA_DIR = os.getenv("EDGE_DATA_DIR", "edge")  # Written by app.services.edge_snapshot, synced to edge nodes
+EDGE_RELOAD_SECONDS = float(os.getenv("EDGE_RELOAD_SECONDS", 10))
+EDGE_PRIMARY_URL = os.getenv("EDGE_PRIMARY_URL", PUBLIC_API_URL)  # Requests an edge cannot answer are redirected here
+
+# Certificate expiry checks (in-process scheduler, one notification per factory per check)
+CERTIFICATE_EXPIRY_CHECK_SECONDS = float(os.getenv("CERTIFICATE_EXPIRY_CHECK_SECONDS", 3600))  # 0 disables the scheduler
+# Days before expiry at which a certificate is notified (again); expiry itself is always notified
+CERTIFICATE_EXPIRY_WINDOWS_DAYS = os.getenv("CERTIFICATE_EXPIRY_WINDOWS_DAYS", "30,7,1")
@@ -6,6 +6,17 @@ from app.models.user import User
 from app.models.complience_event import ComplianceEvent
 from app.models.product import Product
 from app.models.batch import Batch
+from app.models.training import FactoryRequiredCourse
+from app.models.compliance_summary import FactoryComplianceSummary
+from app.models.compliance_rollup import ComplianceRollup
+from app.models.certificate_expiry import ComplianceNotification, CertificateExpiryAlert
+from app.models.lineage import BatchInput, BatchLineage
+from app.models.scan import DppScan, DppScanDaily, FactoryScanDaily
+from app.models.product_attributes import ProductMaterial, ProductCertification
+from app.models.footprint import MaterialFootprintFactor, FootprintRollup
+from app.models.unit_serial import UnitSerialRange, UnitException
+from app.models.product_version import ProductVersion
+from app.models.content import Category, Article, ArticleDraft, Course, CourseModule, Lesson, CourseEnrollment
 
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,168 @@
+"""
+Read-only edge replica for public passport reads
+
+    EDGE_DATA_DIR=/srv/edge uvicorn app.edge:app --workers 4
+
+Serves the public passport routes of the main app from the files written by
+app.services.edge_snapshot (a memory-mapped snapshot plus deltas), with the
+same response bodies and ETags, and no database: nodes only need a copy of
+the export directory, refreshed by whatever syncs it (rsync, object storage).
+Passports lag the primary by the delta export interval plus
+EDGE_RELOAD_SECONDS.
+
+Requests that need live data (as_of history, unit labels with ?unit=,
+lineage, bulk verification) are redirected to EDGE_PRIMARY_URL. Scans
+served here are not recorded in the primary's analytics.
+"""
+
+from typing import Optional
+import hashlib
+import json
+
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+
+from app.core.config import DPP_CACHE_CONTROL, DPP_CACHE_MAX_BYTES, EDGE_DATA_DIR, EDGE_PRIMARY_URL, EDGE_RELOAD_SECONDS
+from app.services.dpp_cache import ResponseCache
+from app.services.dpp_ids import canonical_dpp_id
+from app.services.dpp_signing import key_ring, verify_token
+from app.services.edge_snapshot import EdgeStore
+from app.services.passport_page import NOT_FOUND_PAGE, render_passport_page
+
+app = FastAPI(title="SkillChain DPP Edge", description="Read-only replica of the public Digital Product Passport routes")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:3001", "http://127.0.0.1:3001"],
+    allow_methods=["GET"],
+    allow_headers=["*"],
+)
+
+# Rendered pages; passports only change on reload, so entries live until then
+page_cache = ResponseCache(DPP_CACHE_MAX_BYTES, 10 ** 9)
+
+
+def _passports_changed(dpp_ids):
+    if dpp_ids is None:
+        page_cache.clear()
+    else:
+        for dpp_id in dpp_ids:
+            page_cache.invalidate(dpp_id)
+
+
+store = EdgeStore(EDGE_DATA_DIR, EDGE_RELOAD_SECONDS, on_change=_passports_changed)
+
+
+@app.on_event("startup")
+def startup():
+    store.start()
+    if store.stats()["snapshot"] is None:
+        print(f"No passport snapshot in {EDGE_DATA_DIR} yet; serving 404s until one arrives")
+
+
+@app.on_event("shutdown")
+def shutdown():
+    store.stop()
+
+
+def find_passport(dpp_id: str) -> Optional[bytes]:
+    """Passport body for a compact or canonical DPP ID"""
+    body = store.get(canonical_dpp_id(dpp_id))
+    return body if body is not None or canonical_dpp_id(dpp_id) == dpp_id else store.get(dpp_id)
+
+
+def to_primary(request: Request) -> RedirectResponse:
+    query = f"?{request.url.query}" if request.url.query else ""
+    return RedirectResponse(f"{EDGE_PRIMARY_URL}{request.url.path}{query}", status_code=307)
+
+
+@app.get("/dpp/public/dpp/verify/{dpp_id}")
+def verify_dpp(dpp_id: str, s: Optional[str] = None):
+    """Quick verification endpoint - Check if DPP is valid"""
+    body = find_passport(dpp_id)
+    if body is None:
+        return {"valid": False, "message": "Invalid DPP ID"}
+
+    passport = json.loads(body)
+    result = {
+        "valid": True,
+        "product_name": passport["product_name"],
+        "manufacturer": passport["manufacturer"]["name"],
+        "compliance_verified": passport["compliance_status"]["verified"]
+    }
+    if s is not None:
+        claim = verify_token(s)
+        if claim is None or claim["dpp_id"] != passport["dpp_id"] or claim["factory_id"] != passport["manufacturer"]["id"]:
+            result["signature"] = {"valid": False}
+        else:
+            result["signature"] = {"valid": True, "kid": claim["kid"], "sku": claim["sku"], "issued": claim["issued"]}
+    return result
+
+
+@app.get("/dpp/public/dpp/{dpp_id}")
+def get_public_dpp(dpp_id: str, request: Request):
+    """Public passport, byte for byte what the primary serves, with the same ETag"""
+    if "as_of" in request.query_params:
+        return to_primary(request)
+    body = find_passport(dpp_id)
+    if body is None:
+        return JSONResponse({"detail": "Digital Product Passport not found"}, status_code=404)
+
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    headers = {"ETag": etag, "Cache-Control": DPP_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.api_route("/dpp/public/{path:path}", methods=["GET", "POST"])
+def primary_only(path: str, request: Request):
+    """Every other public route (lineage, units, bulk verification, ...) needs the database"""
+    return to_primary(request)
+
+
+@app.get("/p/{dpp_id}", response_class=HTMLResponse)
+def get_public_dpp_page(dpp_id: str, request: Request, unit: Optional[str] = None):
+    """Server-rendered passport page; unit labels go to the primary for the unit's live status"""
+    if unit:
+        return to_primary(request)
+    dpp_id = canonical_dpp_id(dpp_id)
+    cached = page_cache.get(dpp_id)
+
+    if cached is None:
+        epoch = page_cache.epoch()
+        body = find_passport(dpp_id)
+        if body is None:
+            return HTMLResponse(NOT_FOUND_PAGE, status_code=404)
+        passport = json.loads(body)
+        html = render_passport_page(passport).encode("utf-8")
+        cached = page_cache.put(dpp_id, html, passport["manufacturer"]["id"], epoch, compress=True)
+
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    etag = cached.etag[:-1] + '-gz"' if use_gzip else cached.etag
+    headers = {"ETag": etag, "Cache-Control": DPP_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached.gzip_body, media_type="text/html; charset=utf-8", headers=headers)
+
+    return Response(content=cached.body, media_type="text/html; charset=utf-8", headers=headers)
+
+
+@app.get("/.well-known/dpp-keys.json")
+def get_dpp_keys():
+    return JSONResponse(key_ring.jwks(), headers={"Cache-Control": "public, max-age=3600"})
+
+
+@app.get("/edge/stats")
+def get_edge_stats():
+    return {**store.stats(), "page_cache": page_cache.stats()}
+
+
+@app.get("/")
+def root():
+    return {"status": "SkillChain DPP edge running", "loaded": store.stats()["loaded"]}
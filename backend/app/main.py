@@ -1,8 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.api import auth, events, products, batches, dpp, upload, demo_requests, compliance, content
+from app.api import auth, events, products, batches, dpp, upload, demo_requests, compliance, content, factories, certificates, qr, lineage, footprint, units
 from app.db.init_db import init_db
+from app.services.certificate_expiry import expiry_scheduler
+from app.services.process_pool import shutdown_process_pool
+from app.services.scan_events import scan_recorder
 import os
 
 app = FastAPI(title="SkillChain Compliance API", description="EU DPP-compliant supply chain transparency platform")
@@ -24,16 +27,35 @@ app.mount("/files", StaticFiles(directory=uploads_dir), name="files")
 @app.on_event("startup")
 def startup():
     init_db()
+    scan_recorder.start()
+    expiry_scheduler.start()
+
+@app.on_event("shutdown")
+def shutdown():
+    shutdown_process_pool()
+    scan_recorder.stop()
+    expiry_scheduler.stop()
 
 app.include_router(auth.router)
 app.include_router(events.router)
 app.include_router(products.router)
 app.include_router(batches.router)
 app.include_router(dpp.router)
+app.include_router(dpp.page_router)
+app.include_router(dpp.well_known_router)
 app.include_router(upload.router)
 app.include_router(demo_requests.router)
 app.include_router(compliance.router)
 app.include_router(content.router)
+app.include_router(factories.router)
+app.include_router(certificates.router)
+app.include_router(certificates.public_router)
+app.include_router(qr.router)
+app.include_router(lineage.router)
+app.include_router(lineage.public_router)
+app.include_router(footprint.router)
+app.include_router(units.router)
+app.include_router(units.public_router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class ComplianceNotification(Base):
+    """
+    A batch of alerts for one factory, e.g. the certificates that entered an
+    expiry window since the last check
+    """
+    __tablename__ = "compliance_notifications"
+    __table_args__ = (
+        Index("ix_compliance_notifications_factory", "factory_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    factory_id = Column(Integer, ForeignKey("factories.id"), nullable=False)
+
+    kind = Column(String, nullable=False)  # certificate_expiry
+    title = Column(String, nullable=False)
+    items = Column(JSON, nullable=False, default=list)
+    # e.g. [{"event_id": 12, "event_type": "FIRE_SAFETY_CHECK", "area": "Floor 3", "expiry_date": "2025-03-01", "days_left": 7, "window_days": 7}]
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    read_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class CertificateExpiryAlert(Base):
+    """Which expiry window of which certificate has been notified, so each is notified once"""
+    __tablename__ = "certificate_expiry_alerts"
+    __table_args__ = (
+        Index("ix_certificate_expiry_alerts_key", "event_id", "window_days", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("compliance_events.id"), nullable=False)
+    window_days = Column(Integer, nullable=False)  # 0: expired
+    notification_id = Column(Integer, ForeignKey("compliance_notifications.id"), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
+from app.db.base import Base
+
+class ComplianceRollup(Base):
+    """
+    Compliance event counts per factory, period and status
+    One row per (period, period_start) bucket - day, ISO week (Monday) or
+    month - and per dimension: "all" (value ""), "event_type" or "area".
+    Maintained by ComplianceSummaryService alongside the summary, so
+    analytics read a few hundred rows instead of the events themselves.
+    """
+    __tablename__ = "compliance_rollups"
+    __table_args__ = (
+        Index(
+            "ix_compliance_rollups_key",
+            "factory_id", "period", "period_start", "dimension", "value", "status",
+            unique=True
+        ),
+        Index("ix_compliance_rollups_period", "period", "period_start"),  # Platform-wide queries
+    )
+
+    id = Column(Integer, primary_key=True)
+    factory_id = Column(Integer, ForeignKey("factories.id"), nullable=False)
+
+    period = Column(String, nullable=False)  # day / week / month
+    period_start = Column(Date, nullable=False)
+    dimension = Column(String, nullable=False)  # all / event_type / area
+    value = Column(String, nullable=False, default="")
+    status = Column(String, nullable=False)
+
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class FactoryComplianceSummary(Base):
+    """
+    Materialized compliance summary per factory
+    Maintained incrementally by ComplianceSummaryService whenever a
+    compliance event is created, approved or changes status, so the
+    public DPP reads one row instead of the factory's whole event history.
+    """
+    __tablename__ = "factory_compliance_summary"
+
+    factory_id = Column(Integer, ForeignKey("factories.id"), primary_key=True)
+
+    total_checks = Column(Integer, nullable=False, default=0)
+    passed_checks = Column(Integer, nullable=False, default=0)
+
+    # Latest event per event_type
+    by_type = Column(JSON, nullable=False, default=dict)
+    # e.g. {"FIRE_SAFETY_CHECK": {"event_id": 12, "status": "PASS", "date": "2025-01-01T10:00:00", "area": "Floor 3"}}
+
+    # Whether compliance_rollups hold this factory's events (false for summaries built before rollups existed)
+    rollups_built = Column(Boolean, nullable=False, default=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
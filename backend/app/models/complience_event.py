@@ -1,9 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Date
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Date, Index
+from sqlalchemy.sql import func, text
 from app.db.base import Base
 
 class ComplianceEvent(Base):
     __tablename__ = "compliance_events"
+    __table_args__ = (
+        # Expiry range scans (the scheduler, then per factory); most events have no expiry, so partial
+        Index(
+            "ix_compliance_events_expiry", "expiry_date",
+            sqlite_where=text("expiry_date IS NOT NULL"), postgresql_where=text("expiry_date IS NOT NULL")
+        ),
+        Index(
+            "ix_compliance_events_factory_expiry", "factory_id", "expiry_date",
+            sqlite_where=text("expiry_date IS NOT NULL"), postgresql_where=text("expiry_date IS NOT NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
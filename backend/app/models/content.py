@@ -41,6 +41,7 @@ class Article(Base):
     excerpt = Column(Text)
     content = Column(Text, nullable=False)
     featured_image = Column(String)
+    featured_image_variants = Column(JSON)  # Responsive derivatives of featured_image
     author_id = Column(Integer, ForeignKey("users.id"))
     category_id = Column(Integer, ForeignKey("categories.id"))
     
@@ -53,6 +54,9 @@ class Article(Base):
     
     language = Column(String, default="en")  # en or bn
     
+    # Optimistic concurrency: bumped on every write to the published row
+    version = Column(Integer, nullable=False, default=1)
+    
     published_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -60,6 +64,34 @@ class Article(Base):
     # Relationships
     author = relationship("User", back_populates="articles")
     category = relationship("Category", back_populates="articles")
+    draft = relationship("ArticleDraft", back_populates="article", uselist=False, cascade="all, delete-orphan")
+
+
+class ArticleDraft(Base):
+    """
+    Editor autosave state for an article.
+    Kept apart from the article row so autosaves never touch what readers see.
+    """
+    __tablename__ = "article_drafts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    article_id = Column(Integer, ForeignKey("articles.id"), unique=True, nullable=False, index=True)
+    
+    base_version = Column(Integer, nullable=False)  # Article.version the draft was started from
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every autosave
+    
+    title = Column(String, nullable=False)
+    excerpt = Column(Text)
+    content = Column(Text, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    tags = Column(JSON)
+    
+    updated_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    article = relationship("Article", back_populates="draft")
 
 
 class Course(Base):
@@ -70,6 +102,7 @@ class Course(Base):
     slug = Column(String, unique=True, nullable=False)
     description = Column(Text)
     featured_image = Column(String)
+    featured_image_variants = Column(JSON)  # Responsive derivatives of featured_image
     thumbnail = Column(String)
     
     instructor_id = Column(Integer, ForeignKey("users.id"))
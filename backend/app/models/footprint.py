@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class MaterialFootprintFactor(Base):
+    """
+    Emission and water factors per kg of a material (cradle to gate)
+    Keyed by the normalized material name used in product_materials.
+    """
+    __tablename__ = "material_footprint_factors"
+
+    material = Column(String, primary_key=True)  # Normalized key, e.g. "organic cotton"
+    name = Column(String, nullable=False)
+
+    co2e_kg_per_kg = Column(Float, nullable=False)
+    water_liters_per_kg = Column(Float, nullable=False)
+    source = Column(String, nullable=True)  # Where the figures come from (study, database, supplier LCA)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FootprintRollup(Base):
+    """
+    Precomputed footprint aggregates per factory, by category and by origin country
+    dimension is "factory" (value "") for the factory total, "category" or
+    "origin_country". Effective figures use the reported value where a
+    product has one and the estimate otherwise.
+    """
+    __tablename__ = "footprint_rollups"
+    __table_args__ = (
+        Index("ix_footprint_rollups_factory_dimension", "factory_id", "dimension", "value", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    factory_id = Column(Integer, nullable=False)
+    dimension = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+
+    products = Column(Integer, nullable=False)
+    products_reported = Column(Integer, nullable=False)  # With a hand-entered carbon footprint
+    products_estimated = Column(Integer, nullable=False)  # Without one, but with an estimate
+
+    carbon_total_kg = Column(Float, nullable=False)
+    carbon_avg_kg = Column(Float, nullable=True)
+    water_total_liters = Column(Float, nullable=False)
+    water_avg_liters = Column(Float, nullable=True)
+
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
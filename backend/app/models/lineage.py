@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class BatchInput(Base):
+    """
+    An input consumed by a production batch (fabric, yarn, dye, trims...)
+    Either another batch on the platform (input_batch_id), or an untracked
+    lot from a supplier factory (supplier_factory_id only).
+    """
+    __tablename__ = "batch_inputs"
+    __table_args__ = (
+        UniqueConstraint("batch_id", "input_batch_id", name="uq_batch_input"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(Integer, ForeignKey("batches.id"), nullable=False, index=True)
+    input_batch_id = Column(Integer, ForeignKey("batches.id"), nullable=True, index=True)
+    supplier_factory_id = Column(Integer, ForeignKey("factories.id"), nullable=True, index=True)
+
+    material = Column(String, nullable=True)  # e.g. "Organic cotton jersey", "Reactive dye"
+    quantity = Column(Float, nullable=True)
+    unit = Column(String, nullable=True)  # e.g. "kg", "m"
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class BatchLineage(Base):
+    """
+    Transitive closure of batch_inputs: ancestor_id is upstream of descendant_id
+    depth is the length of the shortest input path (1 = direct input).
+    Maintained by LineageService; a batch is not stored as its own ancestor.
+    """
+    __tablename__ = "batch_lineage"
+    __table_args__ = (
+        Index("ix_batch_lineage_descendant", "descendant_id", "ancestor_id", "depth"),
+    )
+
+    ancestor_id = Column(Integer, ForeignKey("batches.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("batches.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Text, JSON, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Text, JSON, Boolean, LargeBinary
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.db.base import Base
 
@@ -22,6 +23,8 @@ class Product(Base):
     
     # DPP Unique Identifier (used in QR code)
     dpp_id = Column(String, unique=True, index=True, nullable=False)  # UUID format
+    # The UUID's 16 bytes; resolves compact IDs. Deferred: only ever queried on, never read
+    dpp_key = deferred(Column(LargeBinary(16), unique=True, index=True, nullable=True))
     
     # Material Composition (EU requirement)
     materials = Column(JSON, nullable=True)  
@@ -35,6 +38,11 @@ class Product(Base):
     carbon_footprint_kg = Column(Float, nullable=True)  # CO2 equivalent
     water_usage_liters = Column(Float, nullable=True)
     recycled_content_percentage = Column(Float, nullable=True)
+    weight_kg = Column(Float, nullable=True)  # Used for footprint estimates
+    
+    # Estimates from the materials and the footprint factor table (see services/footprint.py)
+    estimated_carbon_kg = Column(Float, nullable=True)
+    estimated_water_liters = Column(Float, nullable=True)
     
     # Certifications (links to compliance documents)
     certifications = Column(JSON, nullable=True)
@@ -42,6 +50,7 @@ class Product(Base):
     
     # Images
     product_images = Column(JSON, nullable=True)  # Array of image URLs
+    product_image_variants = Column(JSON, nullable=True)  # Image URL -> responsive derivatives (services/image_variants.py)
     
     # QR Code
     qr_code_url = Column(String, nullable=True)  # Generated QR code image
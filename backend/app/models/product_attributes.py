@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, UniqueConstraint
+from app.db.base import Base
+
+class ProductMaterial(Base):
+    """
+    One material of a product's composition, normalized from Product.materials
+    Kept in sync on product writes so searches can filter and facet in SQL.
+    """
+    __tablename__ = "product_materials"
+    __table_args__ = (
+        Index("ix_product_materials_material_percentage", "material", "percentage", "product_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+
+    material = Column(String, nullable=False)  # Normalized key, e.g. "organic cotton"
+    name = Column(String, nullable=False)  # As entered, e.g. "Organic Cotton"
+    percentage = Column(Float, nullable=True)
+
+
+class ProductCertification(Base):
+    """A certification of a product (or of one of its materials), normalized from Product.certifications"""
+    __tablename__ = "product_certifications"
+    __table_args__ = (
+        UniqueConstraint("product_id", "certification", name="uq_product_certification"),
+        Index("ix_product_certifications_certification", "certification", "product_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+
+    certification = Column(String, nullable=False)  # Normalized key, e.g. "oeko-tex"
+    name = Column(String, nullable=False)  # As entered, e.g. "OEKO-TEX"
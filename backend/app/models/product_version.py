@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, UniqueConstraint, Index
+from app.db.base import Base
+
+class ProductVersion(Base):
+    """
+    One recorded state of a product's passport fields
+    kind "snapshot" stores the whole document, "delta" a JSON Patch against
+    the previous version (see services/product_versions.py).
+    """
+    __tablename__ = "product_versions"
+    __table_args__ = (
+        UniqueConstraint("product_id", "version", name="uq_product_version"),
+        Index("ix_product_versions_product_created", "product_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+
+    kind = Column(String, nullable=False)  # snapshot / delta
+    data = Column(JSON, nullable=False)  # Document (snapshot) or patch operations (delta)
+    changed_fields = Column(JSON, nullable=True)  # Top-level fields that changed
+
+    changed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, nullable=False)  # UTC
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Index
+from app.db.base import Base
+
+class DppScan(Base):
+    """
+    One public passport view (QR scan), append-only
+    Written in batches by the scan recorder, never on the request path.
+    """
+    __tablename__ = "dpp_scans"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    dpp_id = Column(String, nullable=False, index=True)
+    factory_id = Column(Integer, nullable=False, index=True)
+    scanned_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    source = Column(String, nullable=False)  # api (JSON passport) / page (server-rendered page)
+    device = Column(String, nullable=False)  # mobile / tablet / desktop / bot / other
+    language = Column(String, nullable=True)  # Primary Accept-Language tag, e.g. "de"
+
+
+class DppScanDaily(Base):
+    """Scans per product per day (UTC), excluding bots"""
+    __tablename__ = "dpp_scan_daily"
+    __table_args__ = (
+        Index("ix_dpp_scan_daily_factory_day", "factory_id", "day"),
+    )
+
+    dpp_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    factory_id = Column(Integer, nullable=False)
+    scans = Column(Integer, nullable=False, default=0)
+
+
+class FactoryScanDaily(Base):
+    """Scans of all of a factory's passports per day (UTC), excluding bots"""
+    __tablename__ = "factory_scan_daily"
+
+    factory_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    scans = Column(Integer, nullable=False, default=0)
+    mobile_scans = Column(Integer, nullable=False, default=0)
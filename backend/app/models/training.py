@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class FactoryRequiredCourse(Base):
+    """
+    Courses a factory requires its workers to complete
+    Drives the worker training coverage matrix
+    """
+    __tablename__ = "factory_required_courses"
+    __table_args__ = (
+        UniqueConstraint("factory_id", "course_id", name="uq_factory_required_course"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    factory_id = Column(Integer, ForeignKey("factories.id"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
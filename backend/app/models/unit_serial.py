@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class UnitSerialRange(Base):
+    """
+    A contiguous block of unit serials [start, start + count) allocated to a batch
+    Units are never stored one per row; a unit is a serial inside a range.
+    Serials are platform-wide, so a lookup is one index seek on start.
+    """
+    __tablename__ = "unit_serial_ranges"
+    __table_args__ = (
+        Index("ix_unit_serial_ranges_start", "start", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(Integer, ForeignKey("batches.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+
+    start = Column(BigInteger, nullable=False)
+    count = Column(Integer, nullable=False)
+    first_unit = Column(Integer, nullable=False)  # Number within the batch of the unit at start (1-based)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class UnitException(Base):
+    """Status of a single unit that is not simply in circulation (recalled, returned, ...); absent means active"""
+    __tablename__ = "unit_exceptions"
+
+    serial = Column(BigInteger, primary_key=True)
+    range_id = Column(Integer, ForeignKey("unit_serial_ranges.id"), nullable=False, index=True)
+
+    status = Column(String, nullable=False)
+    note = Column(String, nullable=True)
+
+    updated_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
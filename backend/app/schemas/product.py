@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+class MaterialComposition(BaseModel):
+    material: str
+    percentage: float
+    origin: Optional[str] = None
+    certification: Optional[str] = None
+
+class ProductCreate(BaseModel):
+    sku: str
+    name: str
+    description: Optional[str] = None
+    category: str
+    materials: List[MaterialComposition]
+    origin_country: str
+    raw_material_source: Optional[str] = None
+    carbon_footprint_kg: Optional[float] = None
+    water_usage_liters: Optional[float] = None
+    recycled_content_percentage: Optional[float] = None
+    weight_kg: Optional[float] = None
+    certifications: Optional[List[str]] = None
+    manufactured_date: Optional[str] = None
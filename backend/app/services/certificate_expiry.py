@@ -0,0 +1,215 @@
+"""
+Certificate expiry tracking
+
+Compliance events with an expiry_date are certificates. Every
+CERTIFICATE_EXPIRY_CHECK_SECONDS a scheduler thread in each API process
+finds the certificates expiring within the largest window (or expired in
+the last EXPIRED_LOOKBACK_DAYS) with a range scan on the partial
+expiry_date index, and assigns each to the most urgent window it is in
+(30, 7, 1 days by default; 0 = expired). Certificates that were renewed -
+the factory has a later event of the same type and area expiring after
+them - are left out.
+
+Each (certificate, window) is notified once: certificate_expiry_alerts
+records it, with a unique key so API processes checking at the same time
+cannot both notify. What is new in a check becomes one
+compliance_notifications row per factory.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import threading
+
+from sqlalchemy import and_, exists, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import CERTIFICATE_EXPIRY_CHECK_SECONDS, CERTIFICATE_EXPIRY_WINDOWS_DAYS
+from app.db.session import SessionLocal
+from app.models.certificate_expiry import CertificateExpiryAlert, ComplianceNotification
+from app.models.complience_event import ComplianceEvent
+
+EXPIRY_WINDOWS = tuple(sorted({int(days) for days in CERTIFICATE_EXPIRY_WINDOWS_DAYS.split(",") if days.strip()}))
+EXPIRED_LOOKBACK_DAYS = 30  # Older expiries are not notified, e.g. on the first check after deploying
+ALERT_LOOKUP_BATCH = 1000
+
+
+def window_for(days_left: int) -> Optional[int]:
+    """Most urgent window a certificate is in (0 once expired), None if not in any"""
+    if days_left < 0:
+        return 0
+    return next((days for days in EXPIRY_WINDOWS if days_left <= days), None)
+
+
+def today_utc() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class CertificateExpiryService:
+
+    @staticmethod
+    def expiring(db: Session, first: date, last: date, factory_id: Optional[int] = None) -> List[ComplianceEvent]:
+        """
+        Certificates with first <= expiry_date <= last that were not renewed, soonest first
+        A range scan on (factory_id, expiry_date), or on expiry_date across factories.
+        """
+        renewal = aliased(ComplianceEvent)
+        query = select(ComplianceEvent).where(
+            ComplianceEvent.expiry_date.isnot(None),
+            ComplianceEvent.expiry_date >= first,
+            ComplianceEvent.expiry_date <= last,
+            ~exists().where(and_(
+                renewal.factory_id == ComplianceEvent.factory_id,
+                renewal.expiry_date > ComplianceEvent.expiry_date,
+                renewal.event_type == ComplianceEvent.event_type,
+                renewal.area == ComplianceEvent.area
+            ))
+        )
+        if factory_id is not None:
+            query = query.where(ComplianceEvent.factory_id == factory_id)
+        return db.execute(query.order_by(ComplianceEvent.expiry_date, ComplianceEvent.id)).scalars().all()
+
+    @staticmethod
+    def item(event: ComplianceEvent, today: date) -> dict:
+        days_left = (event.expiry_date - today).days
+        return {
+            "event_id": event.id,
+            "event_type": event.event_type,
+            "area": event.area,
+            "evidence_type": event.evidence_type,
+            "status": event.status,
+            "expiry_date": event.expiry_date.isoformat(),
+            "days_left": days_left,
+            "expired": days_left < 0,
+            "window_days": window_for(days_left)
+        }
+
+    @staticmethod
+    def _notified(db: Session, event_ids: List[int]) -> set:
+        notified = set()
+        for start in range(0, len(event_ids), ALERT_LOOKUP_BATCH):
+            notified.update(db.execute(
+                select(CertificateExpiryAlert.event_id, CertificateExpiryAlert.window_days).where(
+                    CertificateExpiryAlert.event_id.in_(event_ids[start:start + ALERT_LOOKUP_BATCH])
+                )
+            ).all())
+        return notified
+
+    @staticmethod
+    def _title(items: List[dict]) -> str:
+        expired = sum(1 for item in items if item["expired"])
+        parts = []
+        if len(items) > expired:
+            count = len(items) - expired
+            parts.append(f"{count} certificate{'s' if count != 1 else ''} expiring soon")
+        if expired:
+            parts.append(f"{expired} certificate{'s' if expired != 1 else ''} expired")
+        return ", ".join(parts)
+
+    @staticmethod
+    def check(db: Session, today: Optional[date] = None) -> dict:
+        """Notify the (certificate, window) pairs not notified yet, one notification per factory; commits"""
+        today = today or today_utc()
+        if not EXPIRY_WINDOWS:
+            return {"notifications": 0, "certificates": 0, "skipped_factories": 0}
+        events = CertificateExpiryService.expiring(
+            db, today - timedelta(days=EXPIRED_LOOKBACK_DAYS), today + timedelta(days=EXPIRY_WINDOWS[-1])
+        )
+        notified = CertificateExpiryService._notified(db, [event.id for event in events])
+
+        by_factory: Dict[int, List[dict]] = defaultdict(list)
+        for event in events:
+            item = CertificateExpiryService.item(event, today)
+            if item["window_days"] is not None and (event.id, item["window_days"]) not in notified:
+                by_factory[event.factory_id].append(item)
+
+        result = {"notifications": 0, "certificates": 0, "skipped_factories": 0}
+        for factory_id, items in by_factory.items():
+            try:
+                with db.begin_nested():
+                    notification = ComplianceNotification(
+                        factory_id=factory_id,
+                        kind="certificate_expiry",
+                        title=CertificateExpiryService._title(items),
+                        items=items
+                    )
+                    db.add(notification)
+                    db.flush()
+                    db.execute(insert(CertificateExpiryAlert), [
+                        {"event_id": item["event_id"], "window_days": item["window_days"], "notification_id": notification.id}
+                        for item in items
+                    ])
+            except IntegrityError:
+                # Another process notified (some of) these first; the next check picks up anything left
+                result["skipped_factories"] += 1
+                continue
+            result["notifications"] += 1
+            result["certificates"] += len(items)
+        db.commit()
+        return result
+
+
+class ExpiryScheduler:
+    """Runs CertificateExpiryService.check in a daemon thread every interval_seconds"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.checks = 0
+        self.check_errors = 0
+        self.last_check: Optional[Tuple[str, dict]] = None
+
+    def run_once(self) -> dict:
+        db = SessionLocal()
+        try:
+            result = CertificateExpiryService.check(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.checks += 1
+        self.last_check = (datetime.now(timezone.utc).isoformat(), result)
+        return result
+
+    def _run(self):
+        # First check right away, so a restart doesn't postpone notifications by a whole interval
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.check_errors += 1
+                print(f"Certificate expiry check failed: {e}")
+            if self._stop.wait(self.interval_seconds):
+                return
+
+    def start(self):
+        if self.interval_seconds <= 0:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="certificate-expiry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "windows_days": list(EXPIRY_WINDOWS),
+            "running": self._thread is not None and self._thread.is_alive(),
+            "checks": self.checks,
+            "check_errors": self.check_errors,
+            "last_check_at": self.last_check[0] if self.last_check else None,
+            "last_check": self.last_check[1] if self.last_check else None
+        }
+
+
+expiry_scheduler = ExpiryScheduler(CERTIFICATE_EXPIRY_CHECK_SECONDS)
@@ -0,0 +1,102 @@
+"""
+Training completion certificates
+
+Rendering runs in the shared process pool: render_certificate must stay a
+top-level function taking plain dicts so it can be pickled to workers.
+Template backgrounds and fonts are cached per worker process.
+"""
+
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional
+import hashlib
+import hmac
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.core.config import SECRET_KEY, PUBLIC_API_URL
+from app.services.qrcode_service import QRCodeService
+
+# A4 landscape at 150 DPI
+PAGE_SIZE = (1754, 1240)
+PAGE_DPI = 150
+
+CERTIFICATE_TEMPLATES = {
+    "default": {"accent": (22, 101, 52), "background": (255, 255, 255), "heading": "Certificate of Completion"},
+    "classic": {"accent": (120, 53, 15), "background": (255, 251, 235), "heading": "Certificate of Training"},
+}
+
+
+def certificate_code(enrollment_id: int) -> str:
+    """Verification code printed on the certificate: '<enrollment id>-<signature>'"""
+    signature = hmac.new(SECRET_KEY.encode(), f"certificate:{enrollment_id}".encode(), hashlib.sha256)
+    return f"{enrollment_id}-{signature.hexdigest()[:12]}"
+
+
+def parse_certificate_code(code: str) -> Optional[int]:
+    """Return the enrollment id for a genuine code, None otherwise"""
+    enrollment_id, _, _ = code.partition("-")
+    if not enrollment_id.isdigit():
+        return None
+    if not hmac.compare_digest(certificate_code(int(enrollment_id)), code):
+        return None
+    return int(enrollment_id)
+
+
+def certificate_verify_url(code: str) -> str:
+    return f"{PUBLIC_API_URL}/public/certificates/{code}"
+
+
+@lru_cache(maxsize=8)
+def _font(size: int, bold: bool = False):
+    name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=len(CERTIFICATE_TEMPLATES))
+def _template_base(template: str) -> Image.Image:
+    """Static part of a template (background, border, heading), drawn once per process"""
+    style = CERTIFICATE_TEMPLATES[template]
+    width, height = PAGE_SIZE
+
+    page = Image.new("RGB", PAGE_SIZE, style["background"])
+    draw = ImageDraw.Draw(page)
+    draw.rectangle([40, 40, width - 40, height - 40], outline=style["accent"], width=12)
+    draw.rectangle([64, 64, width - 64, height - 64], outline=style["accent"], width=2)
+    draw.text((width // 2, 220), style["heading"], font=_font(84, bold=True), fill=style["accent"], anchor="mm")
+    draw.text((width // 2, 360), "This certifies that", font=_font(40), fill=(55, 65, 81), anchor="mm")
+    draw.text((width // 2, 610), "has successfully completed the course", font=_font(40), fill=(55, 65, 81), anchor="mm")
+    draw.text((140, height - 150), "SkillChain Compliance", font=_font(32, bold=True), fill=style["accent"])
+
+    return page
+
+
+def render_certificate(certificate: dict) -> bytes:
+    """
+    Render one certificate as a single-page PDF
+    certificate: worker_name, course_title, factory_name, completed_at (ISO date), code, template
+    """
+    template = certificate.get("template") or "default"
+    style = CERTIFICATE_TEMPLATES[template]
+    width, height = PAGE_SIZE
+
+    page = _template_base(template).copy()
+    draw = ImageDraw.Draw(page)
+    draw.text((width // 2, 480), certificate["worker_name"], font=_font(96, bold=True), fill=(17, 24, 39), anchor="mm")
+    draw.text((width // 2, 720), certificate["course_title"], font=_font(60, bold=True), fill=style["accent"], anchor="mm")
+
+    details = f"{certificate.get('factory_name') or ''}  ·  Completed {certificate['completed_at']}"
+    draw.text((width // 2, 820), details.strip(" ·"), font=_font(36), fill=(75, 85, 99), anchor="mm")
+    draw.text((140, height - 110), f"Certificate No. {certificate['code']}", font=_font(26), fill=(107, 114, 128))
+
+    # Verification QR in the bottom-right corner
+    qr = Image.open(QRCodeService.generate_qr_code(certificate_verify_url(certificate["code"])))
+    qr = qr.convert("RGB").resize((260, 260), Image.NEAREST)
+    page.paste(qr, (width - 140 - 260, height - 140 - 260))
+
+    buffer = BytesIO()
+    page.save(buffer, format="PDF", resolution=PAGE_DPI)
+    return buffer.getvalue()
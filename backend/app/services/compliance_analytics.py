@@ -0,0 +1,214 @@
+"""
+Compliance analytics from pre-aggregated rollups
+
+compliance_rollups counts events per factory, status and bucket (day, ISO
+week, month), overall and per event_type and area. ComplianceSummaryService
+applies each event change to them (+1/-1 on the event's buckets) in the
+same transaction as the summary, and rebuilds them from the events together
+with the summary. Reads are one grouped query over at most a few hundred
+rows per bucket, whatever the number of events:
+
+- status_counts: all-time totals per status (the month buckets summed)
+- analytics: totals, event_type and area breakdowns and a zero-filled trend
+  for a window of days, weeks or months
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.compliance_rollup import ComplianceRollup
+from app.models.complience_event import ComplianceEvent
+
+PERIODS = ("day", "week", "month")
+DIMENSIONS = ("event_type", "area")
+DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12}
+MAX_BUCKETS = {"day": 366, "week": 260, "month": 120}
+INSERT_BATCH = 5000
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def shift_period(start: date, period: str, buckets: int) -> date:
+    """Start of the bucket `buckets` away (negative: earlier) from a bucket start"""
+    if period == "month":
+        months = start.year * 12 + start.month - 1 + buckets
+        return date(months // 12, months % 12 + 1, 1)
+    return start + timedelta(days=buckets * (7 if period == "week" else 1))
+
+
+def _as_date(value) -> date:
+    # func.date() comes back as a string on SQLite
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _keys(factory_id: int, day: date, event_type: str, area: str, status: str) -> Iterable[tuple]:
+    """Rollup keys (factory_id, period, period_start, dimension, value, status) an event counts towards"""
+    for period in PERIODS:
+        start = period_start(day, period)
+        yield factory_id, period, start, "all", "", status
+        yield factory_id, period, start, "event_type", event_type or "", status
+        yield factory_id, period, start, "area", area or "", status
+
+
+def _rows(counts: Dict[tuple, int]) -> List[dict]:
+    return [
+        {"factory_id": key[0], "period": key[1], "period_start": key[2], "dimension": key[3],
+         "value": key[4], "status": key[5], "count": count}
+        for key, count in counts.items()
+    ]
+
+
+class ComplianceAnalyticsService:
+
+    @staticmethod
+    def _add_counts(db: Session, rows: List[dict]):
+        """INSERT ... ON CONFLICT DO UPDATE adding to count"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(ComplianceRollup)
+        elif dialect == "sqlite":
+            statement = sqlite.insert(ComplianceRollup)
+        else:
+            raise NotImplementedError(f"Compliance rollups need PostgreSQL or SQLite, not {dialect}")
+        statement = statement.on_conflict_do_update(
+            index_elements=["factory_id", "period", "period_start", "dimension", "value", "status"],
+            set_={"count": ComplianceRollup.count + statement.excluded.count}
+        )
+        db.execute(statement, rows)
+
+    @staticmethod
+    def record(db: Session, event: ComplianceEvent, status: str, delta: int):
+        """Count an event (delta=1) or stop counting it (delta=-1) under a status; the caller commits"""
+        created = event.created_at or datetime.now(timezone.utc)
+        counts = {key: delta for key in _keys(event.factory_id, created.date(), event.event_type, event.area, status)}
+        ComplianceAnalyticsService._add_counts(db, _rows(counts))
+
+    @staticmethod
+    def rebuild(db: Session, factory_ids: Optional[List[int]] = None) -> int:
+        """
+        Recompute rollups from the events (the given factories, or all of them)
+        One grouped pass over the events per day; weeks and months are summed
+        from the days. Returns the number of rollup rows written. The caller commits.
+        """
+        removed = delete(ComplianceRollup)
+        daily = select(
+            ComplianceEvent.factory_id, func.date(ComplianceEvent.created_at), ComplianceEvent.event_type,
+            ComplianceEvent.area, ComplianceEvent.status, func.count()
+        ).group_by(
+            ComplianceEvent.factory_id, func.date(ComplianceEvent.created_at), ComplianceEvent.event_type,
+            ComplianceEvent.area, ComplianceEvent.status
+        )
+        if factory_ids is not None:
+            removed = removed.where(ComplianceRollup.factory_id.in_(factory_ids))
+            daily = daily.where(ComplianceEvent.factory_id.in_(factory_ids))
+        db.execute(removed)
+
+        counts = Counter()
+        for factory_id, day, event_type, area, status, count in db.execute(daily):
+            if day is None:
+                continue
+            for key in _keys(factory_id, _as_date(day), event_type, area, status):
+                counts[key] += count
+
+        rows = _rows(counts)
+        for start in range(0, len(rows), INSERT_BATCH):
+            db.execute(insert(ComplianceRollup), rows[start:start + INSERT_BATCH])
+        return len(rows)
+
+    @staticmethod
+    def _scope(query, factory_id: Optional[int]):
+        return query.where(ComplianceRollup.factory_id == factory_id) if factory_id is not None else query
+
+    @staticmethod
+    def status_counts(db: Session, factory_id: Optional[int] = None) -> Dict[str, int]:
+        """All-time event count per status, for one factory or the whole platform"""
+        query = select(ComplianceRollup.status, func.sum(ComplianceRollup.count)).where(
+            ComplianceRollup.period == "month", ComplianceRollup.dimension == "all"
+        ).group_by(ComplianceRollup.status)
+        rows = db.execute(ComplianceAnalyticsService._scope(query, factory_id)).all()
+        return {status: int(count) for status, count in rows if count}
+
+    @staticmethod
+    def window(period: str, start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+        """First and last bucket start of a window; defaults to the last DEFAULT_BUCKETS buckets up to today"""
+        if period not in PERIODS:
+            raise ValueError(f"Period must be one of: {', '.join(PERIODS)}")
+        last = period_start(end or datetime.now(timezone.utc).date(), period)
+        first = period_start(start, period) if start else shift_period(last, period, 1 - DEFAULT_BUCKETS[period])
+        if first > last:
+            raise ValueError("start must not be after end")
+        if first < shift_period(last, period, 1 - MAX_BUCKETS[period]):
+            raise ValueError(f"At most {MAX_BUCKETS[period]} {period} buckets per request")
+        return first, last
+
+    @staticmethod
+    def analytics(db: Session, factory_id: Optional[int], period: str = "day",
+                  start: Optional[date] = None, end: Optional[date] = None) -> dict:
+        """Status totals, event_type and area breakdowns, and the trend of a window, from one grouped query"""
+        first, last = ComplianceAnalyticsService.window(period, start, end)
+        query = select(
+            ComplianceRollup.period_start, ComplianceRollup.dimension, ComplianceRollup.value,
+            ComplianceRollup.status, func.sum(ComplianceRollup.count)
+        ).where(
+            ComplianceRollup.period == period,
+            ComplianceRollup.period_start >= first,
+            ComplianceRollup.period_start <= last
+        ).group_by(
+            ComplianceRollup.period_start, ComplianceRollup.dimension, ComplianceRollup.value, ComplianceRollup.status
+        )
+
+        statuses = Counter()
+        breakdowns = {dimension: defaultdict(Counter) for dimension in DIMENSIONS}
+        trend = defaultdict(Counter)
+        for bucket, dimension, value, status, count in db.execute(ComplianceAnalyticsService._scope(query, factory_id)):
+            if not count:
+                continue  # Every event of the bucket changed status
+            if dimension == "all":
+                statuses[status] += count
+                trend[_as_date(bucket)][status] += count
+            else:
+                breakdowns[dimension][value][status] += count
+
+        def entry(counts: Counter) -> dict:
+            total = sum(counts.values())
+            return {
+                "total": total,
+                "statuses": dict(counts),
+                "compliance_score": int(counts["PASS"] / total * 100) if total else 0
+            }
+
+        buckets = []
+        bucket = first
+        while bucket <= last:
+            buckets.append({"period_start": bucket.isoformat(), **entry(trend.get(bucket, Counter()))})
+            bucket = shift_period(bucket, period, 1)
+
+        return {
+            "factory_id": factory_id,
+            "period": period,
+            "start": first.isoformat(),
+            "end": shift_period(last, period, 1).isoformat(),  # Exclusive
+            **entry(statuses),
+            "by_event_type": sorted(
+                ({"event_type": value, **entry(counts)} for value, counts in breakdowns["event_type"].items()),
+                key=lambda item: -item["total"]
+            ),
+            "by_area": sorted(
+                ({"area": value, **entry(counts)} for value, counts in breakdowns["area"].items()),
+                key=lambda item: -item["total"]
+            ),
+            "trend": buckets
+        }
@@ -0,0 +1,271 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.compliance_summary import FactoryComplianceSummary
+from app.models.complience_event import ComplianceEvent
+from app.models.factory import Factory
+from app.services import dpp_cache
+from app.services.compliance_analytics import ComplianceAnalyticsService
+from app.services.dpp_cache import invalidate_on_commit
+
+
+class ComplianceSummaryService:
+    """
+    Keeps factory_compliance_summary in step with compliance_events
+
+    The record_* hooks run inside the caller's transaction, right after the
+    event change and before commit, so the summary and the events commit
+    together. If a factory has no summary row yet, the hooks build it from
+    the events instead of applying a delta (or, if another transaction built
+    it first, apply the delta to that row). Every hook also drops the
+    factory's cached public passports.
+    
+    The factory's compliance_rollups (ComplianceAnalyticsService) are kept
+    the same way; summaries from before rollups existed are rebuilt once.
+    """
+
+    @staticmethod
+    def _entry(event: ComplianceEvent) -> dict:
+        return {
+            "event_id": event.id,
+            "status": event.status,
+            "date": event.created_at.isoformat() if event.created_at else None,
+            "area": event.area
+        }
+
+    @staticmethod
+    def _load_for_update(db: Session, factory_id: int) -> Optional[FactoryComplianceSummary]:
+        invalidate_on_commit(db, factory_id=factory_id)
+        return db.query(FactoryComplianceSummary).filter(
+            FactoryComplianceSummary.factory_id == factory_id
+        ).with_for_update().first()
+
+    @staticmethod
+    def _load_or_rebuild(db: Session, factory_id: int, need_rollups: bool = True) -> Optional[FactoryComplianceSummary]:
+        """
+        The factory's summary to apply a change to, or None if it had to be
+        rebuilt from the events (which already include the change)
+        """
+        summary = ComplianceSummaryService._load_for_update(db, factory_id)
+        if summary is not None and (summary.rollups_built or not need_rollups):
+            return summary
+
+        try:
+            with db.begin_nested():
+                ComplianceSummaryService.rebuild(db, factory_id)
+            return None
+        except IntegrityError:
+            # Built concurrently by another transaction, from events without this change: apply it to that row
+            summary = ComplianceSummaryService._load_for_update(db, factory_id)
+            if summary is None:
+                raise
+            return summary
+
+    @staticmethod
+    def record_created(db: Session, event: ComplianceEvent):
+        """Apply a newly added event (it becomes the latest of its type)"""
+        db.flush()
+        summary = ComplianceSummaryService._load_or_rebuild(db, event.factory_id)
+        if summary is None:
+            return
+
+        ComplianceAnalyticsService.record(db, event, event.status, 1)
+        summary.total_checks += 1
+        if event.status == "PASS":
+            summary.passed_checks += 1
+
+        by_type = dict(summary.by_type or {})
+        by_type[event.event_type] = ComplianceSummaryService._entry(event)
+        summary.by_type = by_type
+
+    @staticmethod
+    def record_status_change(db: Session, event: ComplianceEvent, old_status: str):
+        """Apply a status change of an existing event"""
+        if old_status == event.status:
+            return
+
+        db.flush()
+        summary = ComplianceSummaryService._load_or_rebuild(db, event.factory_id)
+        if summary is None:
+            return
+
+        ComplianceAnalyticsService.record(db, event, old_status, -1)
+        ComplianceAnalyticsService.record(db, event, event.status, 1)
+        if old_status == "PASS":
+            summary.passed_checks -= 1
+        if event.status == "PASS":
+            summary.passed_checks += 1
+
+        entry = (summary.by_type or {}).get(event.event_type)
+        if entry and entry.get("event_id") == event.id:
+            summary.by_type = {**summary.by_type, event.event_type: {**entry, "status": event.status}}
+
+    @staticmethod
+    def record_approved(db: Session, event: ComplianceEvent):
+        """Approval doesn't change the counts, but it does mark the summary as updated"""
+        db.flush()
+        summary = ComplianceSummaryService._load_or_rebuild(db, event.factory_id, need_rollups=False)
+        if summary is None:
+            return
+
+        summary.updated_at = func.now()
+
+    @staticmethod
+    def compute(db: Session, factory_id: Optional[int] = None) -> Dict[int, dict]:
+        """Summaries computed from the events themselves, keyed by factory_id"""
+        counts = db.query(
+            ComplianceEvent.factory_id,
+            func.count(ComplianceEvent.id),
+            func.sum(case((ComplianceEvent.status == "PASS", 1), else_=0))
+        ).group_by(ComplianceEvent.factory_id)
+
+        ranked = db.query(
+            ComplianceEvent,
+            func.row_number().over(
+                partition_by=(ComplianceEvent.factory_id, ComplianceEvent.event_type),
+                order_by=(ComplianceEvent.created_at.desc(), ComplianceEvent.id.desc())
+            ).label("rank")
+        )
+
+        if factory_id is not None:
+            counts = counts.filter(ComplianceEvent.factory_id == factory_id)
+            ranked = ranked.filter(ComplianceEvent.factory_id == factory_id)
+
+        summaries = {
+            row_factory_id: {"total_checks": total, "passed_checks": int(passed or 0), "by_type": {}}
+            for row_factory_id, total, passed in counts.all()
+        }
+
+        ranked = ranked.subquery()
+        latest = db.query(ranked).filter(ranked.c.rank == 1).all()
+        for row in latest:
+            summaries[row.factory_id]["by_type"][row.event_type] = {
+                "event_id": row.id,
+                "status": row.status,
+                "date": row.created_at.isoformat() if row.created_at else None,
+                "area": row.area
+            }
+
+        return summaries
+
+    @staticmethod
+    def rebuild(db: Session, factory_id: Optional[int] = None, invalidate: bool = True) -> int:
+        """
+        Recompute summaries and rollups from the events (one factory, or all of them)
+        Returns the number of summary rows written. The caller commits.
+        """
+        summaries = ComplianceSummaryService.compute(db, factory_id)
+
+        existing = db.query(FactoryComplianceSummary)
+        if factory_id is not None:
+            existing = existing.filter(FactoryComplianceSummary.factory_id == factory_id)
+        existing.delete(synchronize_session=False)
+
+        if invalidate and factory_id is not None:
+            invalidate_on_commit(db, factory_id=factory_id)
+        elif invalidate:
+            dpp_cache.clear_all()
+
+        if factory_id is not None and factory_id not in summaries:
+            summaries[factory_id] = {"total_checks": 0, "passed_checks": 0, "by_type": {}}
+
+        db.add_all([
+            FactoryComplianceSummary(factory_id=summary_factory_id, rollups_built=True, **summary)
+            for summary_factory_id, summary in summaries.items()
+        ])
+        ComplianceAnalyticsService.rebuild(db, [factory_id] if factory_id is not None else None)
+        db.flush()
+
+        return len(summaries)
+
+    @staticmethod
+    def check_consistency(db: Session, factory_id: Optional[int] = None) -> List[dict]:
+        """Compare stored summaries with the events; returns one entry per mismatch"""
+        expected = ComplianceSummaryService.compute(db, factory_id)
+
+        stored_query = db.query(FactoryComplianceSummary)
+        if factory_id is not None:
+            stored_query = stored_query.filter(FactoryComplianceSummary.factory_id == factory_id)
+        stored = {summary.factory_id: summary for summary in stored_query.all()}
+
+        empty = {"total_checks": 0, "passed_checks": 0, "by_type": {}}
+        mismatches = []
+        for summary_factory_id in sorted(set(expected) | set(stored)):
+            want = expected.get(summary_factory_id, empty)
+            have = stored.get(summary_factory_id)
+            if have is None:
+                if want != empty:
+                    mismatches.append({"factory_id": summary_factory_id, "field": "row", "expected": want, "actual": None})
+                continue
+            for field in ("total_checks", "passed_checks", "by_type"):
+                actual = getattr(have, field) or ({} if field == "by_type" else 0)
+                if actual != want[field]:
+                    mismatches.append({
+                        "factory_id": summary_factory_id,
+                        "field": field,
+                        "expected": want[field],
+                        "actual": actual
+                    })
+
+        return mismatches
+
+    @staticmethod
+    def get(db: Session, factory_id: int) -> FactoryComplianceSummary:
+        """Summary for one factory; builds and stores it on first access"""
+        summary = db.query(FactoryComplianceSummary).filter(
+            FactoryComplianceSummary.factory_id == factory_id
+        ).first()
+        if summary is not None:
+            return summary
+
+        try:
+            # Nothing changed, so there is nothing to invalidate
+            ComplianceSummaryService.rebuild(db, factory_id, invalidate=False)
+            db.commit()
+        except IntegrityError:
+            # Built concurrently by another request
+            db.rollback()
+
+        return db.query(FactoryComplianceSummary).filter(
+            FactoryComplianceSummary.factory_id == factory_id
+        ).first()
+
+    @staticmethod
+    def ensure_rollups(db: Session, factory_id: Optional[int] = None):
+        """
+        Build summaries and rollups for factories (one, or all) that have
+        none yet, before reading rollups; a no-op query once they exist
+        """
+        missing = select(Factory.id).outerjoin(
+            FactoryComplianceSummary, FactoryComplianceSummary.factory_id == Factory.id
+        ).where(or_(FactoryComplianceSummary.factory_id.is_(None), FactoryComplianceSummary.rollups_built.is_(False)))
+        if factory_id is not None:
+            missing = missing.where(Factory.id == factory_id)
+
+        for (missing_factory_id,) in db.execute(missing).all():
+            try:
+                # Rebuilt from the same events, so there is nothing to invalidate
+                ComplianceSummaryService.rebuild(db, missing_factory_id, invalidate=False)
+                db.commit()
+            except IntegrityError:
+                # Built concurrently by another request
+                db.rollback()
+
+    @staticmethod
+    def public_status(summary: FactoryComplianceSummary) -> dict:
+        """Compliance figures as shown on the public DPP"""
+        total = summary.total_checks or 0
+        passed = summary.passed_checks or 0
+
+        return {
+            "score": round((passed / total * 100), 1) if total > 0 else 0,
+            "total_checks": total,
+            "passed_checks": passed,
+            "by_type": {
+                event_type: {"status": entry["status"], "date": entry["date"], "area": entry["area"]}
+                for event_type, entry in (summary.by_type or {}).items()
+            }
+        }
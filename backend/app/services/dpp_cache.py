@@ -0,0 +1,176 @@
+"""
+Pre-serialized public DPP responses (JSON and HTML page), keyed by dpp_id
+
+Entries are dropped when the product, its factory or that factory's
+compliance events change. Writers call invalidate_on_commit() inside their
+transaction; the entries are dropped immediately and again once the
+session commits, so a request that read the old rows mid-transaction
+cannot put them back.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+import gzip
+import hashlib
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import DPP_CACHE_MAX_BYTES, DPP_CACHE_TTL_SECONDS
+
+
+class CachedResponse:
+    __slots__ = ("body", "gzip_body", "etag", "factory_id", "expires_at")
+
+    def __init__(self, body: bytes, factory_id: int, expires_at: float, compress: bool = False):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9) if compress else None
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        self.factory_id = factory_id
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip_body or b"")
+
+
+class ResponseCache:
+    """
+    Byte-bounded LRU of response bodies with a factory -> keys index
+    Fills are guarded by an epoch: a body built before an invalidation is
+    discarded instead of stored.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._by_factory: Dict[int, Set[str]] = {}
+        self._size = 0
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def epoch(self) -> int:
+        """Take before reading from the database; pass to put()"""
+        return self._epoch
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, body: bytes, factory_id: int, epoch: int, compress: bool = False) -> CachedResponse:
+        """Store a body; with compress=True a gzip copy is made once, here"""
+        entry = CachedResponse(body, factory_id, time.monotonic() + self.ttl_seconds, compress)
+        if entry.size > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if epoch != self._epoch:
+                return entry
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_factory.setdefault(factory_id, set()).add(key)
+            self._size += entry.size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._epoch += 1
+            if self._remove(key):
+                self.invalidations += 1
+
+    def invalidate_factory(self, factory_id: int):
+        with self._lock:
+            self._epoch += 1
+            for key in list(self._by_factory.get(factory_id, ())):
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._by_factory.clear()
+            self._size = 0
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._size -= entry.size
+        keys = self._by_factory.get(entry.factory_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_factory[entry.factory_id]
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+public_dpp_cache = ResponseCache(DPP_CACHE_MAX_BYTES, DPP_CACHE_TTL_SECONDS)
+public_dpp_page_cache = ResponseCache(DPP_CACHE_MAX_BYTES, DPP_CACHE_TTL_SECONDS)
+
+PUBLIC_DPP_CACHES = (public_dpp_cache, public_dpp_page_cache)
+
+
+def _invalidate(dpp_id: Optional[str] = None, factory_id: Optional[int] = None):
+    for cache in PUBLIC_DPP_CACHES:
+        if dpp_id is not None:
+            cache.invalidate(dpp_id)
+        if factory_id is not None:
+            cache.invalidate_factory(factory_id)
+
+
+def clear_all():
+    for cache in PUBLIC_DPP_CACHES:
+        cache.clear()
+
+
+def invalidate_on_commit(db: Session, dpp_id: Optional[str] = None, factory_id: Optional[int] = None):
+    """Drop cached passports for a product and/or a whole factory"""
+    _invalidate(dpp_id, factory_id)
+    db.info.setdefault("dpp_cache_invalidations", set()).add((dpp_id, factory_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    for dpp_id, factory_id in session.info.pop("dpp_cache_invalidations", ()):
+        _invalidate(dpp_id, factory_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session):
+    session.info.pop("dpp_cache_invalidations", None)
@@ -0,0 +1,146 @@
+"""
+Bulk public DPP export as NDJSON or JSON-LD, optionally gzipped
+
+Products are read through a server-side cursor (yield_per) and written out
+as they arrive. Factory details and compliance summaries are loaded once per
+factory before the stream starts, so each passport is built without further
+queries. Exports can be incremental: since= selects products created or
+updated after that time, plus every product of a factory whose compliance
+summary changed.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import zlib
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import PUBLIC_API_URL
+from app.db.session import SessionLocal
+from app.models.compliance_summary import FactoryComplianceSummary
+from app.models.factory import Factory
+from app.models.product import Product
+from app.services.compliance_summary import ComplianceSummaryService
+from app.services.passport import dpp_public_url, manufacturer_details, public_dpp
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "jsonld": ("application/ld+json", "jsonld"),
+}
+EXPORT_BATCH_SIZE = 1000
+
+# Passport fields mapped onto schema.org where a term exists; the rest fall in the platform's vocabulary
+DPP_JSONLD_CONTEXT = {
+    "@vocab": f"{PUBLIC_API_URL}/dpp/vocab#",
+    "schema": "https://schema.org/",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "Product": "schema:Product",
+    "dpp_id": "schema:identifier",
+    "product_name": "schema:name",
+    "name": "schema:name",
+    "sku": "schema:sku",
+    "description": "schema:description",
+    "category": "schema:category",
+    "manufacturer": "schema:manufacturer",
+    "country": "schema:countryOfOrigin",
+    "images": {"@id": "schema:image", "@type": "@id", "@container": "@list"},
+    "qr_code_url": {"@type": "@id"},
+    "last_updated": {"@id": "schema:dateModified", "@type": "xsd:dateTime"},
+    "manufactured_date": {"@id": "schema:productionDate", "@type": "xsd:dateTime"},
+}
+
+
+def export_conditions(factory_id: Optional[int] = None, dpp_ids: Optional[List[str]] = None,
+                      since: Optional[datetime] = None) -> list:
+    """WHERE clauses for a factory scope, a list of DPP IDs, and/or an incremental export"""
+    conditions = []
+    if factory_id is not None:
+        conditions.append(Product.factory_id == factory_id)
+    if dpp_ids is not None:
+        conditions.append(Product.dpp_id.in_(dpp_ids))
+    if since is not None:
+        since = since.replace(tzinfo=None)
+        conditions.append(or_(
+            Product.created_at >= since,
+            Product.updated_at >= since,
+            Product.factory_id.in_(
+                select(FactoryComplianceSummary.factory_id).where(FactoryComplianceSummary.updated_at >= since)
+            )
+        ))
+    return conditions
+
+
+def _factory_details(db: Session, factory_ids: List[int]) -> Dict[int, Tuple[dict, dict]]:
+    """(manufacturer, compliance status) per factory; missing summaries are computed, not stored"""
+    factories = {factory.id: factory for factory in db.query(Factory).filter(Factory.id.in_(factory_ids)).all()}
+    summaries = {
+        summary.factory_id: summary for summary in db.query(FactoryComplianceSummary).filter(
+            FactoryComplianceSummary.factory_id.in_(factory_ids)
+        ).all()
+    }
+    for factory_id in set(factory_ids) - set(summaries):
+        computed = ComplianceSummaryService.compute(db, factory_id).get(
+            factory_id, {"total_checks": 0, "passed_checks": 0, "by_type": {}}
+        )
+        summaries[factory_id] = FactoryComplianceSummary(factory_id=factory_id, **computed)
+
+    return {
+        factory_id: (manufacturer_details(factory), ComplianceSummaryService.public_status(summaries[factory_id]))
+        for factory_id, factory in factories.items()
+    }
+
+
+def jsonld_node(passport: dict) -> dict:
+    return {"@id": dpp_public_url(passport["dpp_id"]), "@type": "Product", **passport}
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _passports(conditions: list) -> Iterator[List[dict]]:
+    """Passports in batches of EXPORT_BATCH_SIZE, from a server-side cursor"""
+    db = SessionLocal()
+    try:
+        factory_ids = [factory_id for (factory_id,) in db.execute(
+            select(Product.factory_id).where(*conditions).distinct()
+        ).all()]
+        details = _factory_details(db, factory_ids)
+
+        result = db.execute(
+            select(Product).where(*conditions).order_by(Product.factory_id, Product.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        ).scalars()
+        for products in result.partitions():
+            yield [public_dpp(product, *details[product.factory_id]) for product in products]
+    finally:
+        db.close()
+
+
+def stream_dpp_export(conditions: list, fmt: str = "ndjson", compress: bool = True) -> Iterator[bytes]:
+    """The export file, yielded a batch of products at a time"""
+    def chunks():
+        if fmt == "jsonld":
+            yield b'{"@context":' + _encode(DPP_JSONLD_CONTEXT) + b',"@graph":['
+            first = True
+            for passports in _passports(conditions):
+                body = b",".join(_encode(jsonld_node(passport)) for passport in passports)
+                yield body if first else b"," + body
+                first = False
+            yield b"]}\n"
+        else:
+            for passports in _passports(conditions):
+                yield b"".join(_encode(passport) + b"\n" for passport in passports)
+
+    if not compress:
+        yield from chunks()
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks():
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,73 @@
+"""
+Compact DPP identifiers
+
+Product.dpp_id stays the canonical UUID string; QR codes carry the same 128
+bits as 26 characters of Crockford base32 (digits and upper-case letters
+without I, L, O, U). That is 10 characters shorter than the hyphenated UUID,
+usually one QR version smaller with a correspondingly smaller, faster image
+(benchmarks/dpp_ids.py measures it for a given base URL), and it is
+case-insensitive and hard to misread when typed from a label.
+
+Both forms resolve everywhere: public routes canonicalize whatever they are
+given, and Product.dpp_key holds the 16 raw bytes for an indexed lookup.
+"""
+
+from typing import Optional
+import uuid
+
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+COMPACT_LENGTH = 26  # ceil(128 / 5)
+
+_DECODE = {char: value for value, char in enumerate(CROCKFORD_ALPHABET)}
+_DECODE.update({char.lower(): value for char, value in list(_DECODE.items())})
+_DECODE.update({"O": 0, "o": 0, "I": 1, "i": 1, "L": 1, "l": 1})  # Common misreadings
+
+
+def new_dpp_id() -> str:
+    return str(uuid.uuid4())
+
+
+def _uuid_bytes(dpp_id: str) -> Optional[bytes]:
+    """16 bytes of a canonical (lower-case, hyphenated) UUID string, else None"""
+    try:
+        parsed = uuid.UUID(dpp_id)
+    except (ValueError, AttributeError, TypeError):
+        return None
+    return parsed.bytes if str(parsed) == dpp_id else None
+
+
+def _compact_bytes(value: str) -> Optional[bytes]:
+    """16 bytes of a compact ID, else None"""
+    if not isinstance(value, str) or len(value) != COMPACT_LENGTH:
+        return None
+    number = 0
+    for char in value:
+        digit = _DECODE.get(char)
+        if digit is None:
+            return None
+        number = (number << 5) | digit
+    if number >> 128:
+        return None  # The leading character can only carry 3 bits
+    return number.to_bytes(16, "big")
+
+
+def compact_dpp_id(dpp_id: str) -> str:
+    """26-character form of a UUID DPP ID; other (legacy) IDs are returned unchanged"""
+    raw = _uuid_bytes(dpp_id)
+    if raw is None:
+        return dpp_id
+    number = int.from_bytes(raw, "big")
+    return "".join(
+        CROCKFORD_ALPHABET[(number >> shift) & 31] for shift in range(5 * (COMPACT_LENGTH - 1), -1, -5)
+    )
+
+
+def canonical_dpp_id(value: str) -> str:
+    """The Product.dpp_id for a compact or canonical ID; anything else passes through"""
+    raw = _compact_bytes(value)
+    return str(uuid.UUID(bytes=raw)) if raw is not None else value
+
+
+def dpp_key(value: str) -> Optional[bytes]:
+    """Product.dpp_key for a compact or canonical UUID ID, None for other IDs"""
+    return _uuid_bytes(value) or _compact_bytes(value)
@@ -0,0 +1,294 @@
+"""
+In-memory index of valid DPP IDs for the verify endpoints
+
+A Bloom filter answers most invalid IDs (counterfeits, scanner noise) with a
+few bit tests; valid IDs map to a packed record (factory id, verified flag,
+product name) with factory names held once per factory.
+
+Writers in this process update the index when their transaction commits
+(index_on_commit). Writes from other API workers, or code that bypasses the
+hooks, are picked up by a delta sync (products created or updated since the
+last sync) run at most every DPP_INDEX_SYNC_SECONDS.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import math
+import struct
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import DPP_INDEX_FALSE_POSITIVE_RATE, DPP_INDEX_SYNC_SECONDS
+from app.db.session import SessionLocal
+from app.models.factory import Factory
+from app.models.product import Product
+from app.services.dpp_ids import canonical_dpp_id, dpp_key
+
+_RECORD = struct.Struct("<I?")  # factory_id, compliance_verified; followed by the UTF-8 product name
+_UINT64 = (1 << 64) - 1
+
+
+def index_key(dpp_id: str) -> bytes:
+    """16 raw bytes for UUID IDs (canonical or compact), the UTF-8 string otherwise"""
+    return dpp_key(dpp_id) or str(dpp_id).encode()
+
+
+def _hash_pair(key: bytes) -> Tuple[int, int]:
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """Bit array with k positions per key from double hashing (mod 2**64, as in NumPy)"""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        capacity = max(capacity, 1024)
+        self.capacity = capacity
+        self.size = int(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key: bytes):
+        h1, h2 = _hash_pair(key)
+        for i in range(self.hashes):
+            position = ((h1 + i * h2) & _UINT64) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def add_many(self, keys: List[bytes]):
+        """Vectorised add for bulk loads"""
+        if not keys:
+            return
+        pairs = np.array([_hash_pair(key) for key in keys], dtype=np.uint64)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        positions = ((pairs[:, :1] + steps * pairs[:, 1:]) % np.uint64(self.size)).ravel()
+        bits = np.frombuffer(self.bits, dtype=np.uint8).copy()
+        np.bitwise_or.at(bits, (positions >> np.uint64(3)).astype(np.intp),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.bits = bytearray(bits.tobytes())
+
+    def __contains__(self, key: bytes) -> bool:
+        h1, h2 = _hash_pair(key)
+        for i in range(self.hashes):
+            position = ((h1 + i * h2) & _UINT64) % self.size
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class DppIndex:
+    def __init__(self, sync_seconds: float, false_positive_rate: float):
+        self.sync_seconds = sync_seconds
+        self.false_positive_rate = false_positive_rate
+
+        self._records: Dict[bytes, bytes] = {}
+        self._factories: Dict[int, str] = {}
+        self._bloom: Optional[BloomFilter] = None
+        self._max_product_id = 0
+        self._synced_at: Optional[datetime] = None
+        self._next_sync = 0.0
+        self._lock = threading.RLock()
+
+        self.lookups = 0
+        self.bloom_rejections = 0
+        self.syncs = 0
+
+    # Loading and syncing
+
+    def _load_rows(self, db: Session, products_query, factories_query):
+        rows = db.connection().execute(products_query).all()
+        factories = db.connection().execute(factories_query).all()
+
+        with self._lock:
+            self._factories.update((factory_id, name or "") for factory_id, name in factories)
+            new_keys = []
+            for product_id, dpp_id, name, factory_id, verified in rows:
+                key = index_key(dpp_id)
+                if key not in self._records:
+                    new_keys.append(key)
+                self._records[key] = _RECORD.pack(factory_id, bool(verified)) + (name or "").encode()
+                self._max_product_id = max(self._max_product_id, product_id)
+
+            if self._bloom is None or len(self._records) > self._bloom.capacity:
+                # (Re)size for twice the current count so growth rebuilds rarely
+                self._bloom = BloomFilter(2 * len(self._records), self.false_positive_rate)
+                self._bloom.add_many(list(self._records))
+            elif len(new_keys) > 64:
+                self._bloom.add_many(new_keys)
+            else:
+                for key in new_keys:
+                    self._bloom.add(key)
+
+    def _columns(self):
+        return select(Product.id, Product.dpp_id, Product.name, Product.factory_id, Product.compliance_verified)
+
+    def load(self, db: Session):
+        """Full build from the products table"""
+        started = datetime.now(timezone.utc)
+        with self._lock:
+            self._records = {}
+            self._factories = {}
+            self._bloom = None
+            self._max_product_id = 0
+            self._load_rows(db, self._columns(), select(Factory.id, Factory.name))
+            self._synced_at = started
+            self._next_sync = time.monotonic() + self.sync_seconds
+
+    def sync(self, db: Session):
+        """Pick up products created or updated since the last sync"""
+        started = datetime.now(timezone.utc)
+        # A little overlap covers transactions that committed while the previous sync ran
+        since = (self._synced_at - timedelta(seconds=self.sync_seconds)).replace(tzinfo=None)
+        self._load_rows(
+            db,
+            self._columns().where(or_(
+                Product.id > self._max_product_id, Product.created_at >= since, Product.updated_at >= since
+            )),
+            select(Factory.id, Factory.name)
+        )
+        self._synced_at = started
+        self.syncs += 1
+
+    def _ensure_current(self):
+        if self._synced_at is not None and time.monotonic() < self._next_sync:
+            return
+        with self._lock:
+            if self._synced_at is not None and time.monotonic() < self._next_sync:
+                return
+            db = SessionLocal()
+            try:
+                if self._synced_at is None:
+                    self.load(db)
+                else:
+                    self.sync(db)
+            finally:
+                db.close()
+            self._next_sync = time.monotonic() + self.sync_seconds
+
+    # Updates from writers
+
+    def put(self, dpp_id: str, name: str, factory_id: int, verified: bool, product_id: int = 0):
+        with self._lock:
+            if self._bloom is None:
+                return  # Not loaded yet; the first load reads it from the database
+            key = index_key(dpp_id)
+            if key not in self._records:
+                self._bloom.add(key)
+            self._records[key] = _RECORD.pack(factory_id, bool(verified)) + (name or "").encode()
+            self._max_product_id = max(self._max_product_id, product_id or 0)
+
+    def put_factory(self, factory_id: int, name: str):
+        with self._lock:
+            self._factories[factory_id] = name or ""
+
+    # Lookups
+
+    def _lookup(self, dpp_id: str) -> Optional[dict]:
+        key = index_key(dpp_id)
+        if key not in self._bloom:
+            self.bloom_rejections += 1
+            return None
+        record = self._records.get(key)
+        if record is None:
+            return None
+        factory_id, verified = _RECORD.unpack_from(record)
+        return {
+            "product_name": record[_RECORD.size:].decode(),
+            "factory_id": factory_id,
+            "manufacturer": self._factories.get(factory_id, ""),
+            "compliance_verified": verified
+        }
+
+    def lookup(self, dpp_id: str) -> Optional[dict]:
+        """Verification record for a DPP ID, or None if it isn't valid"""
+        self._ensure_current()
+        self.lookups += 1
+        return self._lookup(dpp_id)
+
+    def lookup_many(self, dpp_ids: Iterable[str]) -> List[Optional[dict]]:
+        self._ensure_current()
+        results = [self._lookup(dpp_id) for dpp_id in dpp_ids]
+        self.lookups += len(results)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self._bloom is not None,
+                "products": len(self._records),
+                "factories": len(self._factories),
+                "bloom_bits": self._bloom.size if self._bloom else 0,
+                "bloom_hashes": self._bloom.hashes if self._bloom else 0,
+                "lookups": self.lookups,
+                "bloom_rejections": self.bloom_rejections,
+                "syncs": self.syncs,
+                "synced_at": self._synced_at.isoformat() if self._synced_at else None
+            }
+
+
+dpp_index = DppIndex(DPP_INDEX_SYNC_SECONDS, DPP_INDEX_FALSE_POSITIVE_RATE)
+
+
+def index_on_commit(db: Session, product: Optional[Product] = None, factory: Optional[Factory] = None):
+    """Apply a product's (or factory's) current values to the index once db commits"""
+    pending = db.info.setdefault("dpp_index_updates", [])
+    if product is not None:
+        pending.append(("product", product.dpp_id, product.name, product.factory_id, product.compliance_verified, product.id))
+    if factory is not None:
+        pending.append(("factory", factory.id, factory.name))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session):
+    for update in session.info.pop("dpp_index_updates", ()):
+        if update[0] == "product":
+            dpp_index.put(*update[1:])
+        else:
+            dpp_index.put_factory(*update[1:])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session):
+    session.info.pop("dpp_index_updates", None)
+
+
+def verify_many(db: Session, dpp_ids: List[str]) -> List[dict]:
+    """
+    Verification results for many DPP IDs, in input order
+    Answered from the index; IDs it doesn't know are confirmed with one IN
+    query, so products written by another worker since the last sync are
+    not reported as invalid.
+    """
+    records = dpp_index.lookup_many(dpp_ids)
+
+    missing = {canonical_dpp_id(dpp_id) for dpp_id, record in zip(dpp_ids, records) if record is None}
+    if missing:
+        found = {}
+        rows = db.query(
+            Product.id, Product.dpp_id, Product.name, Product.factory_id, Product.compliance_verified, Factory.name
+        ).join(Factory, Factory.id == Product.factory_id).filter(Product.dpp_id.in_(missing)).all()
+        for product_id, dpp_id, name, factory_id, verified, factory_name in rows:
+            dpp_index.put_factory(factory_id, factory_name)
+            dpp_index.put(dpp_id, name, factory_id, verified, product_id)
+            found[dpp_id] = {
+                "product_name": name,
+                "factory_id": factory_id,
+                "manufacturer": factory_name or "",
+                "compliance_verified": bool(verified)
+            }
+        records = [record or found.get(canonical_dpp_id(dpp_id)) for dpp_id, record in zip(dpp_ids, records)]
+
+    return [
+        {
+            "dpp_id": dpp_id,
+            "valid": True,
+            "product_name": record["product_name"],
+            "manufacturer": record["manufacturer"],
+            "compliance_verified": record["compliance_verified"]
+        } if record else {"dpp_id": dpp_id, "valid": False}
+        for dpp_id, record in zip(dpp_ids, records)
+    ]
@@ -0,0 +1,235 @@
+"""
+Signed DPP claims for offline verification
+
+A signed QR code points at {DPP_PAGE_BASE_URL}/{compact id}?s={token}, where
+the token is base64url (unpadded) of claim || Ed25519 signature (64 bytes):
+
+    version     1 byte   (1)
+    kid length  1 byte
+    kid         ASCII
+    dpp id      16 bytes (the UUID)
+    factory id  4 bytes, big-endian
+    issued      2 bytes, big-endian days since 1970-01-01 (the product's creation date)
+    sku         UTF-8, the rest of the claim
+
+Scanner apps verify it against the public keys published at
+/.well-known/dpp-keys.json (a JWKS of Ed25519 keys, RFC 8037) and only call
+the API for the full passport. Signatures are deterministic, so a product's
+token (and its cached QR image) only changes when the signing key does.
+
+Without DPP_SIGNING_KEYS nothing is signed (signed QR requests get a 503),
+unless DPP_SIGNING_DEV_KEY allows a key derived from SECRET_KEY for local
+development; labels signed with it stop verifying once SECRET_KEY changes.
+"""
+
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+import base64
+import struct
+import sys
+import threading
+import hashlib
+import uuid
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+from app.core.config import (
+    DPP_RETIRED_PUBLIC_KEYS, DPP_SIGNATURE_CACHE_SIZE, DPP_SIGNING_DEV_KEY, DPP_SIGNING_KEYS, SECRET_KEY
+)
+from app.services.dpp_ids import dpp_key
+from app.services.passport import dpp_public_url
+
+CLAIM_VERSION = 1
+SIGNATURE_SIZE = 64
+_CLAIM_TAIL = struct.Struct(">IH")  # factory id, issue day
+_EPOCH = date(1970, 1, 1)
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+class KeyRing:
+    """Ed25519 signing key plus the public keys that tokens may be verified with, by key ID"""
+
+    def __init__(self, signing_keys: str, retired_public_keys: str = "", allow_dev_key: bool = False):
+        self.public_keys: Dict[str, Ed25519PublicKey] = {}
+        self.signing_kid: Optional[str] = None
+        self._signing_key: Optional[Ed25519PrivateKey] = None
+
+        for kid, value in self._parse(signing_keys):
+            private_key = Ed25519PrivateKey.from_private_bytes(b64url_decode(value))
+            if self._signing_key is None:
+                self.signing_kid, self._signing_key = kid, private_key
+            self.public_keys[kid] = private_key.public_key()
+        for kid, value in self._parse(retired_public_keys):
+            self.public_keys.setdefault(kid, Ed25519PublicKey.from_public_bytes(b64url_decode(value)))
+
+        if self._signing_key is None and allow_dev_key:
+            # Development fallback: a key derived from SECRET_KEY, stable across workers and restarts
+            print("WARNING: signing DPP claims with the development key derived from SECRET_KEY (kid \"dev\"); "
+                  "set DPP_SIGNING_KEYS in production")
+            seed = hashlib.sha256(b"dpp-signing:" + SECRET_KEY.encode()).digest()
+            self.signing_kid, self._signing_key = "dev", Ed25519PrivateKey.from_private_bytes(seed)
+            self.public_keys["dev"] = self._signing_key.public_key()
+        elif self._signing_key is None:
+            print("No DPP signing key configured (DPP_SIGNING_KEYS); signed QR codes are disabled")
+
+    @staticmethod
+    def _parse(value: str):
+        for entry in filter(None, (part.strip() for part in value.split(","))):
+            kid, _, key = entry.partition(":")
+            if not kid or not key or len(kid) > 255 or not kid.isascii():
+                raise ValueError(f"Invalid DPP key entry {kid!r}; expected kid:<base64url key>")
+            yield kid, key
+
+    @property
+    def can_sign(self) -> bool:
+        return self._signing_key is not None
+
+    def sign(self, message: bytes) -> bytes:
+        if self._signing_key is None:
+            raise RuntimeError("No DPP signing key configured (DPP_SIGNING_KEYS)")
+        return self._signing_key.sign(message)
+
+    def jwks(self) -> dict:
+        return {"keys": [
+            {
+                "kty": "OKP",
+                "crv": "Ed25519",
+                "kid": kid,
+                "x": b64url_encode(key.public_bytes(Encoding.Raw, PublicFormat.Raw)),
+                "use": "sig",
+                "alg": "EdDSA"
+            }
+            for kid, key in self.public_keys.items()
+        ]}
+
+
+key_ring = KeyRing(DPP_SIGNING_KEYS, DPP_RETIRED_PUBLIC_KEYS, DPP_SIGNING_DEV_KEY)
+
+
+def encode_claim(kid: str, dpp_id: str, sku: str, factory_id: int, issued: date) -> Optional[bytes]:
+    """Claim bytes, or None for a DPP ID that isn't a UUID (those can't be signed compactly)"""
+    raw_id = dpp_key(dpp_id)
+    if raw_id is None:
+        return None
+    kid_bytes = kid.encode("ascii")
+    return (
+        bytes((CLAIM_VERSION, len(kid_bytes))) + kid_bytes + raw_id
+        + _CLAIM_TAIL.pack(factory_id, (issued - _EPOCH).days) + sku.encode("utf-8")
+    )
+
+
+def decode_claim(claim: bytes) -> dict:
+    if len(claim) < 2 or claim[0] != CLAIM_VERSION:
+        raise ValueError("Unsupported claim version")
+    kid_end = 2 + claim[1]
+    tail_end = kid_end + 16 + _CLAIM_TAIL.size
+    if len(claim) < tail_end:
+        raise ValueError("Truncated claim")
+    factory_id, issued = _CLAIM_TAIL.unpack_from(claim, kid_end + 16)
+    return {
+        "kid": claim[2:kid_end].decode("ascii"),
+        "dpp_id": str(uuid.UUID(bytes=claim[kid_end:kid_end + 16])),
+        "factory_id": factory_id,
+        "issued": date.fromordinal(_EPOCH.toordinal() + issued).isoformat(),
+        "sku": claim[tail_end:].decode("utf-8")
+    }
+
+
+def verify_token(token: str, ring: KeyRing = None) -> Optional[dict]:
+    """The claim in a token if its signature checks out against the key ring, else None"""
+    ring = ring or key_ring
+    try:
+        data = b64url_decode(token)
+        claim, signature = data[:-SIGNATURE_SIZE], data[-SIGNATURE_SIZE:]
+        decoded = decode_claim(claim)
+        public_key = ring.public_keys.get(decoded["kid"])
+        if public_key is None:
+            return None
+        public_key.verify(signature, claim)
+    except (ValueError, UnicodeDecodeError, InvalidSignature):
+        return None
+    return decoded
+
+
+class SignatureCache:
+    """LRU of signed tokens per product; an entry is reused while its claim is unchanged"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.signed = 0
+
+    def get(self, dpp_id: str) -> Optional[str]:
+        """Cached token for a product, without checking its claim (for lookups by ID alone)"""
+        with self._lock:
+            entry = self._entries.get(dpp_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(dpp_id)
+            self.hits += 1
+            return entry[1]
+
+    def token(self, dpp_id: str, sku: str, factory_id: int, created_at: Optional[datetime]) -> Optional[str]:
+        issued = created_at.date() if created_at else date.today()
+        claim = encode_claim(key_ring.signing_kid, dpp_id, sku, factory_id, issued)
+        if claim is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(dpp_id)
+            if entry is not None and entry[0] == claim:
+                self._entries.move_to_end(dpp_id)
+                self.hits += 1
+                return entry[1]
+
+        token = b64url_encode(claim + key_ring.sign(claim))
+        with self._lock:
+            self._entries[dpp_id] = (claim, token)
+            self._entries.move_to_end(dpp_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.signed += 1
+        return token
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "signed": self.signed,
+                "signing_kid": key_ring.signing_kid
+            }
+
+
+signature_cache = SignatureCache(DPP_SIGNATURE_CACHE_SIZE)
+
+
+def signed_dpp_url(dpp_id: str, sku: str, factory_id: int, created_at: Optional[datetime]) -> str:
+    """dpp_public_url with the product's signed claim; unsigned for non-UUID IDs"""
+    token = signature_cache.token(dpp_id, sku, factory_id, created_at)
+    url = dpp_public_url(dpp_id)
+    return f"{url}?s={token}" if token else url
+
+
+if __name__ == "__main__":
+    # python -m app.services.dpp_signing generate <kid>
+    if len(sys.argv) != 3 or sys.argv[1] != "generate":
+        sys.exit("Usage: python -m app.services.dpp_signing generate <kid>")
+    from cryptography.hazmat.primitives.serialization import NoEncryption, PrivateFormat
+    private_key = Ed25519PrivateKey.generate()
+    seed = private_key.private_bytes(Encoding.Raw, PrivateFormat.Raw, NoEncryption())
+    public = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    print(f"DPP_SIGNING_KEYS entry:        {sys.argv[2]}:{b64url_encode(seed)}")
+    print(f"DPP_RETIRED_PUBLIC_KEYS entry: {sys.argv[2]}:{b64url_encode(public)}")
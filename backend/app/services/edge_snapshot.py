@@ -0,0 +1,327 @@
+"""
+Public passports exported for read-only edge replicas
+
+The primary writes its public passports to files; edge nodes (app/edge.py)
+serve them without a database. An export directory holds:
+
+    snapshot-20250101T120000000000Z.dpp     every passport, sorted by dpp_id
+    delta-20250101T121000000000Z.ndjson     passports changed since the previous file
+    ...
+
+The timestamp is when the export started. A snapshot is one file of
+passport bodies (the exact bytes the primary's public endpoint returns)
+followed by an index of fixed-size entries sorted by key, so an edge
+memory-maps it and finds a passport with a binary search: nothing is loaded
+up front and the page cache is shared by every worker process on the node.
+Deltas are NDJSON, the bulk export format; an edge keeps the passports of
+the deltas newer than its snapshot in memory, on top of the snapshot.
+
+Files are written under a temporary name and renamed, so an edge (or rsync)
+never sees half a file. Export them periodically on the primary:
+
+    python -m app.services.edge_snapshot snapshot [directory]    # e.g. daily
+    python -m app.services.edge_snapshot delta [directory]       # e.g. every minute
+
+Deltas select products like the incremental bulk export (created or
+updated, or their factory's compliance summary changed); products are never
+deleted by the API, so there are no removals to carry.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from app.core.config import EDGE_DATA_DIR
+
+SNAPSHOT_MAGIC = b"SKCEDGE1"
+_HEADER = struct.Struct("<8sQQ")  # magic, entry count, index offset
+_ENTRY = struct.Struct("<QHI")  # offset of key (the passport body follows it), key length, body length
+
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".dpp"
+DELTA_PREFIX = "delta-"
+DELTA_SUFFIX = ".ndjson"
+STAMP_FORMAT = "%Y%m%dT%H%M%S%fZ"
+
+# Deltas start this long before the previous export, for commits in flight while it ran; reapplying is harmless
+DELTA_OVERLAP = timedelta(seconds=5)
+SNAPSHOTS_KEPT = 2
+
+
+def _stamp(moment: datetime) -> str:
+    return moment.strftime(STAMP_FORMAT)
+
+
+def _parse_stamp(filename: str) -> Optional[datetime]:
+    for prefix, suffix in ((SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX), (DELTA_PREFIX, DELTA_SUFFIX)):
+        if filename.startswith(prefix) and filename.endswith(suffix):
+            try:
+                return datetime.strptime(filename[len(prefix):-len(suffix)], STAMP_FORMAT)
+            except ValueError:
+                return None
+    return None
+
+
+def export_files(directory: str) -> Tuple[List[str], List[str]]:
+    """(snapshots, deltas) in a directory, oldest first; names sort by time"""
+    names = sorted(name for name in os.listdir(directory) if _parse_stamp(name)) if os.path.isdir(directory) else []
+    return (
+        [name for name in names if name.startswith(SNAPSHOT_PREFIX)],
+        [name for name in names if name.startswith(DELTA_PREFIX)]
+    )
+
+
+# Writing (primary)
+
+def _publish(directory: str, name: str, write) -> str:
+    """Write a file via write(file) under a temporary name, then rename it into place"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    temporary = path + ".tmp"
+    try:
+        with open(temporary, "wb") as file:
+            write(file)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return path
+
+
+def export_snapshot(directory: str = EDGE_DATA_DIR) -> dict:
+    """Write a snapshot of every public passport, then drop files older than the snapshots kept"""
+    # Imported here: edge nodes use this module without a database
+    from app.services.dpp_export import _encode, _passports
+
+    started = datetime.utcnow()
+    count = 0
+
+    def write(file):
+        nonlocal count
+        file.write(_HEADER.pack(SNAPSHOT_MAGIC, 0, 0))
+        offset = _HEADER.size
+        entries = []
+        # Bodies are written as they stream in; only the (small) index is sorted in memory
+        for passports in _passports([]):
+            for passport in passports:
+                key = passport["dpp_id"].encode("utf-8")
+                body = _encode(passport)
+                file.write(key)
+                file.write(body)
+                entries.append((key, offset, len(key), len(body)))
+                offset += len(key) + len(body)
+        entries.sort()
+        for _, entry_offset, key_length, body_length in entries:
+            file.write(_ENTRY.pack(entry_offset, key_length, body_length))
+        file.seek(0)
+        file.write(_HEADER.pack(SNAPSHOT_MAGIC, len(entries), offset))
+        count = len(entries)
+
+    path = _publish(directory, f"{SNAPSHOT_PREFIX}{_stamp(started)}{SNAPSHOT_SUFFIX}", write)
+    _prune(directory)
+    return {"file": path, "passports": count, "bytes": os.path.getsize(path)}
+
+
+def export_delta(directory: str = EDGE_DATA_DIR) -> dict:
+    """Write the passports changed since the newest export in the directory (no file if none changed)"""
+    from app.services.dpp_export import _encode, _passports, export_conditions
+
+    snapshots, deltas = export_files(directory)
+    if not snapshots:
+        raise ValueError(f"No snapshot in {directory}; export one first")
+    started = datetime.utcnow()
+    since = max(_parse_stamp(name) for name in snapshots + deltas) - DELTA_OVERLAP
+
+    count = 0
+    lines = []
+    for passports in _passports(export_conditions(since=since)):
+        lines.extend(_encode(passport) + b"\n" for passport in passports)
+        count += len(passports)
+    if not count:
+        return {"file": None, "passports": 0, "since": since.isoformat()}
+
+    path = _publish(directory, f"{DELTA_PREFIX}{_stamp(started)}{DELTA_SUFFIX}", lambda file: file.writelines(lines))
+    return {"file": path, "passports": count, "since": since.isoformat()}
+
+
+def _prune(directory: str):
+    """Keep the newest SNAPSHOTS_KEPT snapshots and the deltas after the oldest of them"""
+    snapshots, deltas = export_files(directory)
+    if len(snapshots) <= SNAPSHOTS_KEPT:
+        return
+    oldest_kept = _parse_stamp(snapshots[-SNAPSHOTS_KEPT])
+    for name in snapshots[:-SNAPSHOTS_KEPT] + [name for name in deltas if _parse_stamp(name) <= oldest_kept]:
+        os.remove(os.path.join(directory, name))
+
+
+# Reading (edge)
+
+class Snapshot:
+    """A memory-mapped snapshot file; get() is a binary search over its index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._index_offset = _HEADER.unpack_from(self._map)
+        if magic != SNAPSHOT_MAGIC or self._index_offset + self.count * _ENTRY.size != len(self._map):
+            raise ValueError(f"Not a passport snapshot: {path}")
+
+    def _entry(self, position: int) -> Tuple[int, int, int]:
+        return _ENTRY.unpack_from(self._map, self._index_offset + position * _ENTRY.size)
+
+    def get(self, dpp_id: str) -> Optional[bytes]:
+        key = dpp_id.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset, key_length, body_length = self._entry(middle)
+            found = self._map[offset:offset + key_length]
+            if found == key:
+                return self._map[offset + key_length:offset + key_length + body_length]
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+
+def read_delta(path: str) -> Dict[str, bytes]:
+    """dpp_id -> passport body of a delta file; later lines win"""
+    bodies = {}
+    with open(path, "rb") as file:
+        for line in file:
+            line = line.rstrip(b"\n")
+            if line:
+                bodies[json.loads(line)["dpp_id"]] = line
+    return bodies
+
+
+class EdgeState:
+    """One consistent view: a snapshot plus the deltas applied on top of it"""
+    __slots__ = ("snapshot", "snapshot_name", "deltas", "overlay", "loaded_at")
+
+    def __init__(self, snapshot: Snapshot, snapshot_name: str, deltas: List[str], overlay: Dict[str, bytes]):
+        self.snapshot = snapshot
+        self.snapshot_name = snapshot_name
+        self.deltas = deltas
+        self.overlay = overlay
+        self.loaded_at = datetime.utcnow()
+
+
+class EdgeStore:
+    """
+    Public passports of an export directory, for the edge app
+    A background thread picks up new files every reload_seconds. Each reload
+    builds a new EdgeState and swaps it in, so a request never sees a
+    snapshot with the wrong deltas. on_change(dpp_ids) is told which
+    passports changed (None: all of them) so derived caches can drop them.
+    """
+
+    def __init__(self, directory: str, reload_seconds: float, on_change=None):
+        self.directory = directory
+        self.reload_seconds = reload_seconds
+        self.on_change = on_change
+        self._state: Optional[EdgeState] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.lookups = 0
+        self.reloads = 0
+        self.reload_errors = 0
+
+    def get(self, dpp_id: str) -> Optional[bytes]:
+        state = self._state
+        if state is None:
+            return None
+        self.lookups += 1
+        body = state.overlay.get(dpp_id)
+        return body if body is not None else state.snapshot.get(dpp_id)
+
+    def reload(self) -> bool:
+        """Apply new files from the directory; returns whether anything changed"""
+        with self._reload_lock:
+            snapshots, deltas = export_files(self.directory)
+            if not snapshots:
+                return False
+            current = self._state
+            newest = snapshots[-1]
+            snapshot_stamp = _parse_stamp(newest)
+            deltas = [name for name in deltas if _parse_stamp(name) > snapshot_stamp]
+
+            if current is not None and current.snapshot_name == newest:
+                added = [name for name in deltas if name not in current.deltas]
+                if not added:
+                    return False
+                changed = {}
+                for name in added:
+                    changed.update(read_delta(os.path.join(self.directory, name)))
+                self._state = EdgeState(current.snapshot, newest, current.deltas + added, {**current.overlay, **changed})
+                changed_ids = list(changed)
+            else:
+                overlay = {}
+                for name in deltas:
+                    overlay.update(read_delta(os.path.join(self.directory, name)))
+                # The old map is released with the last request still holding the old state
+                self._state = EdgeState(Snapshot(os.path.join(self.directory, newest)), newest, deltas, overlay)
+                changed_ids = None
+
+            self.reloads += 1
+        if self.on_change is not None:
+            self.on_change(changed_ids)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.reload_seconds):
+            try:
+                self.reload()
+            except Exception as e:
+                # A file removed or replaced mid-reload; the current state stays and the next round retries
+                self.reload_errors += 1
+                print(f"Error reloading edge passports from {self.directory}: {e}")
+
+    def start(self):
+        self.reload()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="edge-reload", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.reload_seconds + 1)
+            self._thread = None
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "loaded": state is not None,
+            "snapshot": state.snapshot_name if state else None,
+            "snapshot_passports": state.snapshot.count if state else 0,
+            "deltas": len(state.deltas) if state else 0,
+            "delta_passports": len(state.overlay) if state else 0,
+            "loaded_at": state.loaded_at.isoformat() if state else None,
+            "lookups": self.lookups,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors
+        }
+
+
+if __name__ == "__main__":
+    # python -m app.services.edge_snapshot snapshot|delta [directory]
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in ("snapshot", "delta"):
+        sys.exit("Usage: python -m app.services.edge_snapshot snapshot|delta [directory]")
+    import app.models  # noqa: F401
+    target = sys.argv[2] if len(sys.argv) == 3 else EDGE_DATA_DIR
+    started = time.perf_counter()
+    result = export_snapshot(target) if sys.argv[1] == "snapshot" else export_delta(target)
+    print({**result, "seconds": round(time.perf_counter() - started, 2)})
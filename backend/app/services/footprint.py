@@ -0,0 +1,294 @@
+"""
+Environmental footprint estimates and rollups
+
+Products carry hand-entered carbon_footprint_kg / water_usage_liters where
+the factory has an LCA; everything else gets an estimate from its material
+composition (product_materials) and the material_footprint_factors table:
+
+    estimate = weight_kg * sum(share_i * factor_i) / sum(share_i)
+
+over the materials that have a factor. A product is only estimated when
+those materials cover at least MIN_COVERAGE of its composition and its
+weight is known (entered, or a typical weight for its category).
+
+A recalculation loads the rows of a factory (or the whole platform) once
+and does the arithmetic with NumPy over flat arrays: one bincount turns the
+material rows into per-product intensities, another groups products into
+the per-factory, per-category and per-origin rollups. Only products whose
+estimate changed are written back.
+"""
+
+from typing import Dict, Optional
+import time
+
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.footprint import FootprintRollup, MaterialFootprintFactor
+from app.models.product import Product
+from app.models.product_attributes import ProductMaterial
+from app.services import dpp_cache
+from app.services.product_search import normalize
+
+# Share of the composition (by percentage) that needs a factor before a product is estimated
+MIN_COVERAGE = 0.8
+
+ROLLUP_DIMENSIONS = ("factory", "category", "origin_country")
+
+# Indicative cradle-to-gate figures per kg of fibre, used to seed an empty
+# factor table. Replace them with figures from your LCA database.
+DEFAULT_FACTORS = {
+    "cotton": ("Cotton", 5.9, 10000.0),
+    "organic cotton": ("Organic Cotton", 3.8, 9000.0),
+    "recycled cotton": ("Recycled Cotton", 1.3, 100.0),
+    "polyester": ("Polyester", 6.4, 60.0),
+    "recycled polyester": ("Recycled Polyester", 3.2, 30.0),
+    "nylon": ("Nylon", 8.0, 100.0),
+    "recycled nylon": ("Recycled Nylon", 3.5, 50.0),
+    "elastane": ("Elastane", 9.6, 150.0),
+    "spandex": ("Spandex", 9.6, 150.0),
+    "viscose": ("Viscose", 4.5, 650.0),
+    "lyocell": ("Lyocell", 2.6, 150.0),
+    "modal": ("Modal", 3.5, 300.0),
+    "wool": ("Wool", 17.0, 500.0),
+    "linen": ("Linen", 2.1, 2800.0),
+    "hemp": ("Hemp", 2.2, 2500.0),
+    "silk": ("Silk", 25.0, 10000.0),
+    "acrylic": ("Acrylic", 7.5, 200.0),
+}
+
+# Typical garment weights, for products without weight_kg
+DEFAULT_CATEGORY_WEIGHTS_KG = {
+    "t-shirt": 0.2,
+    "t-shirts": 0.2,
+    "shirt": 0.25,
+    "shirts": 0.25,
+    "polo": 0.25,
+    "dress": 0.35,
+    "dresses": 0.35,
+    "trousers": 0.5,
+    "pants": 0.5,
+    "jeans": 0.65,
+    "denim": 0.65,
+    "shorts": 0.3,
+    "skirt": 0.3,
+    "sweater": 0.5,
+    "knitwear": 0.5,
+    "hoodie": 0.6,
+    "sweatshirt": 0.55,
+    "jacket": 0.9,
+    "outerwear": 1.2,
+    "underwear": 0.08,
+    "socks": 0.06,
+    "activewear": 0.25,
+}
+
+
+def _changed(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Elementwise "needs a write", treating NaN as NULL and ignoring float noise"""
+    old_null, new_null = np.isnan(old), np.isnan(new)
+    differs = ~np.isclose(np.nan_to_num(old), np.nan_to_num(new), rtol=1e-9, atol=1e-6)
+    return (old_null != new_null) | (~old_null & ~new_null & differs)
+
+
+def _none(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 6)
+
+
+class FootprintService:
+
+    @staticmethod
+    def seed_factors(db: Session) -> int:
+        """Fill an empty factor table with DEFAULT_FACTORS; returns the number of rows added"""
+        if db.query(MaterialFootprintFactor.material).first():
+            return 0
+        db.execute(insert(MaterialFootprintFactor), [
+            {"material": key, "name": name, "co2e_kg_per_kg": co2e, "water_liters_per_kg": water,
+             "source": "Indicative default"}
+            for key, (name, co2e, water) in DEFAULT_FACTORS.items()
+        ])
+        return len(DEFAULT_FACTORS)
+
+    @staticmethod
+    def factors(db: Session) -> Dict[str, tuple]:
+        return {
+            material: (co2e, water)
+            for material, co2e, water in db.execute(select(
+                MaterialFootprintFactor.material,
+                MaterialFootprintFactor.co2e_kg_per_kg,
+                MaterialFootprintFactor.water_liters_per_kg
+            ))
+        }
+
+    @staticmethod
+    def estimate_product(db: Session, product: Product):
+        """Estimate a single product (after a create or update) from its JSON materials"""
+        FootprintService.seed_factors(db)
+        factors = FootprintService.factors(db)
+        weight = product.weight_kg or DEFAULT_CATEGORY_WEIGHTS_KG.get(normalize(product.category or ""))
+        co2e = water = coverage = 0.0
+        for material in product.materials or []:
+            factor = factors.get(normalize(material.get("material") or ""))
+            try:
+                share = float(material.get("percentage")) / 100
+            except (TypeError, ValueError):
+                continue
+            if factor:
+                co2e += share * factor[0]
+                water += share * factor[1]
+                coverage += share
+        if weight and coverage >= MIN_COVERAGE:
+            product.estimated_carbon_kg = round(weight * co2e / coverage, 6)
+            product.estimated_water_liters = round(weight * water / coverage, 6)
+        else:
+            product.estimated_carbon_kg = None
+            product.estimated_water_liters = None
+
+    @staticmethod
+    def recalculate(db: Session, factory_id: Optional[int] = None) -> dict:
+        """
+        Re-estimate every product of a factory (or all factories) and replace their rollups
+        Commits; returns counts and per-phase timings in milliseconds.
+        """
+        timings = {}
+        started = phase = time.perf_counter()
+
+        def lap(name):
+            nonlocal phase
+            now = time.perf_counter()
+            timings[name] = round((now - phase) * 1000, 1)
+            phase = now
+
+        FootprintService.seed_factors(db)
+        factors = FootprintService.factors(db)
+        factor_index = {material: i for i, material in enumerate(factors)}
+        factor_co2e = np.array([co2e for co2e, _ in factors.values()] + [0.0])
+        factor_water = np.array([water for _, water in factors.values()] + [0.0])
+        missing = len(factors)  # Index of the zero factor for materials not in the table
+
+        products = select(
+            Product.id, Product.factory_id, Product.category, Product.origin_country, Product.weight_kg,
+            Product.carbon_footprint_kg, Product.water_usage_liters,
+            Product.estimated_carbon_kg, Product.estimated_water_liters
+        ).order_by(Product.id)
+        materials = select(ProductMaterial.product_id, ProductMaterial.material, ProductMaterial.percentage).where(
+            ProductMaterial.percentage.is_not(None)
+        )
+        if factory_id is not None:
+            products = products.where(Product.factory_id == factory_id)
+            materials = materials.join(Product, Product.id == ProductMaterial.product_id).where(
+                Product.factory_id == factory_id
+            )
+        rows = db.execute(products).all()
+        material_rows = db.execute(materials).all()
+        lap("load_ms")
+
+        count = len(rows)
+        if count:
+            ids, factory_ids, categories, origins, weights, reported_co2e, reported_water, old_co2e, old_water = zip(*rows)
+        else:
+            ids = factory_ids = categories = origins = weights = reported_co2e = reported_water = old_co2e = old_water = ()
+        ids = np.array(ids, dtype=np.int64)
+        as_float = lambda values: np.array(values, dtype=float)  # None -> NaN
+
+        # Per-product intensity and coverage from the material rows
+        if material_rows:
+            product_ids, keys, percentages = zip(*material_rows)
+            positions = np.searchsorted(ids, np.array(product_ids, dtype=np.int64))
+            shares = as_float(percentages) / 100
+            which = np.array([factor_index.get(key, missing) for key in keys], dtype=np.intp)
+            known = which != missing
+            coverage = np.bincount(positions, weights=shares * known, minlength=count)
+            co2e_intensity = np.bincount(positions, weights=shares * factor_co2e[which], minlength=count)
+            water_intensity = np.bincount(positions, weights=shares * factor_water[which], minlength=count)
+        else:
+            coverage = co2e_intensity = water_intensity = np.zeros(count)
+
+        default_weights = as_float([DEFAULT_CATEGORY_WEIGHTS_KG.get(normalize(c or "")) for c in categories])
+        weights = as_float(weights)
+        weights = np.where(np.isnan(weights) | (weights <= 0), default_weights, weights)
+
+        estimable = (coverage >= MIN_COVERAGE) & ~np.isnan(weights)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            new_co2e = np.where(estimable, weights * co2e_intensity / coverage, np.nan)
+            new_water = np.where(estimable, weights * water_intensity / coverage, np.nan)
+        lap("estimate_ms")
+
+        # Write back only what changed
+        old_co2e, old_water = as_float(old_co2e), as_float(old_water)
+        changed = np.flatnonzero(_changed(old_co2e, new_co2e) | _changed(old_water, new_water))
+        if changed.size:
+            db.execute(update(Product), [
+                {"id": int(ids[i]), "estimated_carbon_kg": _none(new_co2e[i]), "estimated_water_liters": _none(new_water[i])}
+                for i in changed
+            ])
+        lap("write_ms")
+
+        # Rollups: reported figures win over estimates
+        reported_co2e, reported_water = as_float(reported_co2e), as_float(reported_water)
+        is_reported = ~np.isnan(reported_co2e)
+        effective_co2e = np.where(is_reported, reported_co2e, new_co2e)
+        effective_water = np.where(np.isnan(reported_water), new_water, reported_water)
+        is_estimated = ~is_reported & ~np.isnan(new_co2e)
+        has_water = ~np.isnan(effective_water)
+
+        factory_ids = np.array(factory_ids, dtype=np.int64)
+        dimension_values = {
+            "factory": [""] * count,
+            "category": [c or "" for c in categories],
+            "origin_country": [o or "" for o in origins],
+        }
+        rollups = []
+        for dimension in ROLLUP_DIMENSIONS:
+            # Group key: factory id and the value's position in a small vocabulary
+            vocabulary: Dict[str, int] = {}
+            codes = np.array([vocabulary.setdefault(v, len(vocabulary)) for v in dimension_values[dimension]], dtype=np.int64)
+            keys, inverse = np.unique(factory_ids * max(len(vocabulary), 1) + codes, return_inverse=True)
+            inverse = inverse.ravel()
+            labels = list(vocabulary)
+            size = len(keys)
+            products_count = np.bincount(inverse, minlength=size)
+            reported_count = np.bincount(inverse, weights=is_reported, minlength=size)
+            estimated_count = np.bincount(inverse, weights=is_estimated, minlength=size)
+            water_count = np.bincount(inverse, weights=has_water, minlength=size)
+            carbon_total = np.bincount(inverse, weights=np.nan_to_num(effective_co2e), minlength=size)
+            water_total = np.bincount(inverse, weights=np.nan_to_num(effective_water), minlength=size)
+            carbon_count = reported_count + estimated_count
+            group_factories, group_codes = np.divmod(keys, max(len(vocabulary), 1))
+            for g in range(size):
+                rollups.append({
+                    "factory_id": int(group_factories[g]),
+                    "dimension": dimension,
+                    "value": labels[group_codes[g]],
+                    "products": int(products_count[g]),
+                    "products_reported": int(reported_count[g]),
+                    "products_estimated": int(estimated_count[g]),
+                    "carbon_total_kg": round(float(carbon_total[g]), 3),
+                    "carbon_avg_kg": round(float(carbon_total[g] / carbon_count[g]), 3) if carbon_count[g] else None,
+                    "water_total_liters": round(float(water_total[g]), 3),
+                    "water_avg_liters": round(float(water_total[g] / water_count[g]), 3) if water_count[g] else None,
+                })
+
+        stale = delete(FootprintRollup)
+        if factory_id is not None:
+            stale = stale.where(FootprintRollup.factory_id == factory_id)
+        db.execute(stale)
+        if rollups:
+            db.execute(insert(FootprintRollup), rollups)
+        lap("rollups_ms")
+
+        if changed.size and factory_id is not None:
+            dpp_cache.invalidate_on_commit(db, factory_id=factory_id)  # Estimates show on the public passport
+        db.commit()
+        if changed.size and factory_id is None:
+            dpp_cache.clear_all()
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        return {
+            "products": count,
+            "estimated": int(np.count_nonzero(~np.isnan(new_co2e))),
+            "updated": int(changed.size),
+            "rollups": len(rollups),
+            "timings": timings
+        }
@@ -0,0 +1,205 @@
+"""
+Responsive derivatives of uploaded images
+
+Uploads are stored as sent (often multi-megabyte phone photos). After the
+upload returns, render_image_variants runs in the process pool and writes a
+WebP and a JPEG per width in IMAGE_VARIANT_WIDTHS next to the original:
+
+    uploads/products/20250101_120000_ab12cd34.jpg
+    uploads/products/20250101_120000_ab12cd34_320w.webp / _320w.jpg
+    ...
+
+Derivatives are EXIF-rotated, never upscaled and carry no metadata (EXIF,
+GPS, XMP, comments); only the colour profile is kept. The result is stored
+on the row as a srcset-ready structure:
+
+    {
+      "width": 4032, "height": 3024,
+      "sizes": {"thumbnail": {"width": 320, "height": 240, "webp": url, "jpeg": url}, ...},
+      "srcset": {"webp": "url 320w, url 800w, ...", "jpeg": "..."}
+    }
+
+Product.product_image_variants maps each product_images URL to one of these;
+Article/Course.featured_image_variants describe featured_image.
+"""
+
+from typing import Dict, Optional
+import os
+import sys
+
+from PIL import Image, ImageOps
+
+from app.db.session import SessionLocal
+from app.services.process_pool import get_process_pool, imap_bounded
+
+IMAGE_VARIANT_WIDTHS = {"thumbnail": 320, "medium": 800, "large": 1600}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB on a white background (JPEG has no alpha)"""
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_image_variants(source_path: str) -> dict:
+    """
+    Write the derivatives of one image; runs in the process pool
+    Returns file names (relative to the source's directory) per size.
+    """
+    directory, filename = os.path.split(source_path)
+    stem = os.path.splitext(filename)[0]
+    largest = max(IMAGE_VARIANT_WIDTHS.values())
+
+    with Image.open(source_path) as source:
+        # JPEG decoders can scale down by 1/2..1/8 while decoding, far cheaper than resizing afterwards
+        source.draft("RGB", (largest, largest))
+        icc_profile = source.info.get("icc_profile")
+        image = ImageOps.exif_transpose(source)
+        keep_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA") if keep_alpha else _flatten(image)
+        width, height = image.size
+
+    sizes = {}
+    current = image
+    # Largest first, each one resized from the previous: cheaper than always starting from the original
+    for name, target in sorted(IMAGE_VARIANT_WIDTHS.items(), key=lambda item: -item[1]):
+        if current.width > target:
+            current = current.resize(
+                (target, max(1, round(current.height * target / current.width))), Image.LANCZOS, reducing_gap=3.0
+            )
+        size = current.size
+        webp_name = f"{stem}_{size[0]}w.webp"
+        jpeg_name = f"{stem}_{size[0]}w.jpg"
+        if not any(existing["width"] == size[0] for existing in sizes.values()):  # Small originals repeat a width
+            extra = {"icc_profile": icc_profile} if icc_profile else {}
+            current.save(os.path.join(directory, webp_name), "WEBP", quality=WEBP_QUALITY, method=4, **extra)
+            _flatten(current).save(
+                os.path.join(directory, jpeg_name), "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True, **extra
+            )
+        sizes[name] = {"width": size[0], "height": size[1], "webp": webp_name, "jpeg": jpeg_name}
+
+    return {"width": width, "height": height, "sizes": sizes}
+
+
+def image_variants(rendered: dict, url: str) -> dict:
+    """Turn render_image_variants file names into URLs (siblings of the original's URL) and srcsets"""
+    base = url.rsplit("/", 1)[0]
+    sizes = {
+        name: {**size, "webp": f"{base}/{size['webp']}", "jpeg": f"{base}/{size['jpeg']}"}
+        for name, size in rendered["sizes"].items()
+    }
+    # Small images produce the same width more than once; a srcset lists each width once
+    widths = sorted({size["width"]: size for size in sizes.values()}.items())
+    return {
+        "width": rendered["width"],
+        "height": rendered["height"],
+        "sizes": sizes,
+        "srcset": {
+            image_format: ", ".join(f"{size[image_format]} {width}w" for width, size in widths)
+            for image_format in ("webp", "jpeg")
+        }
+    }
+
+
+def _attach(db, model, row_id: int, url: str, variants: dict) -> bool:
+    """Record variants on the row if the image is still in use; returns whether anything changed"""
+    from app.models.product import Product
+    from app.services.dpp_cache import invalidate_on_commit
+
+    row = db.get(model, row_id)
+    if row is None:
+        return False
+    if model is Product:
+        if url not in (row.product_images or []):
+            return False
+        row.product_image_variants = {**(row.product_image_variants or {}), url: variants}
+        invalidate_on_commit(db, dpp_id=row.dpp_id)
+    else:
+        if row.featured_image != url:
+            return False
+        row.featured_image_variants = variants
+    return True
+
+
+def generate_image_variants(model, row_id: int, url: str, file_path: str):
+    """Background task after an upload: render in the pool, then store on the row"""
+    try:
+        rendered = get_process_pool().submit(render_image_variants, file_path).result()
+    except Exception as e:
+        print(f"Error rendering image variants for {file_path}: {e}")
+        return
+
+    db = SessionLocal()
+    try:
+        if _attach(db, model, row_id, url, image_variants(rendered, url)):
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error storing image variants for {url}: {e}")
+    finally:
+        db.close()
+
+
+def file_path_for_url(url: str, upload_dir: str) -> Optional[str]:
+    """"/files/products/x.jpg" -> "uploads/products/x.jpg" for images uploaded here"""
+    if not url or not url.startswith("/files/"):
+        return None
+    path = os.path.join(upload_dir, *url[len("/files/"):].split("/"))
+    return path if os.path.isfile(path) else None
+
+
+def backfill_image_variants() -> Dict[str, int]:
+    """Render variants for images uploaded before the pipeline existed"""
+    from app.models.content import Article, Course
+    from app.models.product import Product
+    from app.services.file_upload import UPLOAD_DIR
+
+    db = SessionLocal()
+    tasks = []
+    try:
+        for product in db.query(Product).filter(Product.product_images.isnot(None)):
+            done = product.product_image_variants or {}
+            tasks.extend((Product, product.id, url) for url in product.product_images or [] if url not in done)
+        for model in (Article, Course):
+            for row in db.query(model).filter(model.featured_image.isnot(None)):
+                if not row.featured_image_variants:  # JSON null, not SQL NULL, after a re-upload
+                    tasks.append((model, row.id, row.featured_image))
+        tasks = [(model, row_id, url, path) for model, row_id, url in tasks
+                 if (path := file_path_for_url(url, UPLOAD_DIR))]
+
+        counts = {"rendered": 0, "failed": 0}
+        for (model, row_id, url, path), rendered in zip(tasks, imap_bounded(_render_safely, [t[3] for t in tasks])):
+            if rendered is None:
+                counts["failed"] += 1
+                continue
+            _attach(db, model, row_id, url, image_variants(rendered, url))
+            db.commit()
+            counts["rendered"] += 1
+        return counts
+    finally:
+        db.close()
+
+
+def _render_safely(source_path: str) -> Optional[dict]:
+    try:
+        return render_image_variants(source_path)
+    except Exception as e:
+        print(f"Error rendering image variants for {source_path}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    # python -m app.services.image_variants backfill
+    if len(sys.argv) != 2 or sys.argv[1] != "backfill":
+        sys.exit("Usage: python -m app.services.image_variants backfill")
+    import app.models  # noqa: F401
+    print(backfill_image_variants())
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import threading
+import uuid
+
+# Finished jobs kept around for progress polling
+MAX_FINISHED_JOBS = 200
+# Jobs nobody started (e.g. a certificate batch never downloaded) are expired and their payload dropped
+PENDING_JOB_TTL = timedelta(hours=1)
+
+
+class Job:
+    """
+    Progress record for a long-running batch (certificates, imports, labels)
+    Lives in process memory; poll it through the owning API.
+    """
+
+    def __init__(self, kind: str, total: int, owner_id: Optional[int] = None, payload: Any = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner_id = owner_id
+        self.payload = payload  # Whatever the job needs to run; never returned to clients
+
+        self.status = "pending"  # pending / running / completed / failed / cancelled / expired
+        self.total = total
+        self.processed = 0
+        self.failed = 0
+        self.errors = []
+        self.result: Dict[str, Any] = {}
+
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._lock = threading.Lock()  # Guards leaving "pending"
+
+    def claim(self) -> bool:
+        """Move a pending job to running; False if it was already started or expired"""
+        with self._lock:
+            if self.status != "pending":
+                return False
+            self.status = "running"
+            return True
+
+    def expire(self, created_before: datetime):
+        """Expire the job (dropping its payload) if it is still pending and older than created_before"""
+        with self._lock:
+            if self.status == "pending" and self.created_at < created_before:
+                self.finish("expired")
+
+    def advance(self, count: int = 1):
+        self.processed += count
+
+    def add_error(self, error: dict):
+        self.failed += 1
+        self.errors.append(error)
+
+    def finish(self, status: str = "completed"):
+        self.status = status
+        self.finished_at = datetime.utcnow()
+        self.payload = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "progress": round(self.processed / self.total * 100, 1) if self.total else 100.0,
+            "errors": self.errors[:100],
+            "result": self.result,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class JobRegistry:
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, total: int, owner_id: Optional[int] = None, payload: Any = None) -> Job:
+        job = Job(kind, total, owner_id, payload)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str, kind: Optional[str] = None) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+        job = self._jobs.get(job_id)
+        if job and kind and job.kind != kind:
+            return None
+        return job
+
+    def _prune(self):
+        expire_before = datetime.utcnow() - PENDING_JOB_TTL
+        for job in self._jobs.values():
+            job.expire(expire_before)
+
+        finished = [job for job in self._jobs.values() if job.finished_at]
+        if len(finished) > MAX_FINISHED_JOBS:
+            finished.sort(key=lambda job: job.finished_at)
+            for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+                del self._jobs[job.id]
+
+
+job_registry = JobRegistry()
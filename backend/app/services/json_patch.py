@@ -0,0 +1,221 @@
+"""
+JSON Patch (RFC 6902) support for partial document updates.
+
+On top of the standard operations there is one extension, ``splice``, which
+edits a string in place so an editor can send the changed region of a long
+text field instead of the whole value:
+
+    {"op": "splice", "path": "/content", "offset": 120, "delete": 4, "insert": "new"}
+"""
+
+import copy
+from typing import Any, List, Tuple
+
+
+class JSONPatchError(ValueError):
+    """Raised when a patch is malformed or cannot be applied"""
+
+
+def _parse_pointer(path: str) -> List[str]:
+    """Split a JSON Pointer (RFC 6901) into unescaped tokens"""
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise JSONPatchError(f"Invalid path: {path}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _list_index(container: list, token: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit():
+        raise JSONPatchError(f"Invalid list index: {token}")
+    index = int(token)
+    upper = len(container) if allow_end else len(container) - 1
+    if index > upper:
+        raise JSONPatchError(f"List index out of range: {token}")
+    return index
+
+
+def _resolve_parent(document: Any, path: str) -> Tuple[Any, str]:
+    """Return the container holding the target of ``path`` and the last token"""
+    tokens = _parse_pointer(path)
+    if not tokens:
+        raise JSONPatchError("Operation on the document root is not supported")
+
+    node = document
+    for token in tokens[:-1]:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JSONPatchError(f"Path not found: {path}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_list_index(node, token)]
+        else:
+            raise JSONPatchError(f"Path not found: {path}")
+    return node, tokens[-1]
+
+
+def _get(document: Any, path: str) -> Any:
+    node = document
+    for token in _parse_pointer(path):
+        if isinstance(node, dict):
+            if token not in node:
+                raise JSONPatchError(f"Path not found: {path}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_list_index(node, token)]
+        else:
+            raise JSONPatchError(f"Path not found: {path}")
+    return node
+
+
+def _add(document: Any, path: str, value: Any):
+    parent, token = _resolve_parent(document, path)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, token, allow_end=True), value)
+    else:
+        raise JSONPatchError(f"Path not found: {path}")
+
+
+def _remove(document: Any, path: str) -> Any:
+    parent, token = _resolve_parent(document, path)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JSONPatchError(f"Path not found: {path}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, token))
+    raise JSONPatchError(f"Path not found: {path}")
+
+
+def _replace(document: Any, path: str, value: Any):
+    parent, token = _resolve_parent(document, path)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JSONPatchError(f"Path not found: {path}")
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent[_list_index(parent, token)] = value
+    else:
+        raise JSONPatchError(f"Path not found: {path}")
+
+
+def _splice(document: Any, operation: dict):
+    path = operation["path"]
+    text = _get(document, path)
+    if text is None:
+        text = ""
+    if not isinstance(text, str):
+        raise JSONPatchError(f"splice target is not a string: {path}")
+
+    offset = operation.get("offset")
+    delete = operation.get("delete", 0)
+    insert = operation.get("insert", "")
+    if not isinstance(offset, int) or not isinstance(delete, int) or not isinstance(insert, str):
+        raise JSONPatchError("splice requires integer 'offset'/'delete' and string 'insert'")
+    if offset < 0 or delete < 0 or offset + delete > len(text):
+        raise JSONPatchError(f"splice range out of bounds for {path}")
+
+    _replace(document, path, text[:offset] + insert + text[offset + delete:])
+
+
+def apply_patch(document: dict, operations: List[dict]) -> dict:
+    """
+    Apply a list of patch operations and return the patched copy.
+    The input document is left untouched; the patch is applied atomically.
+    """
+    result = copy.deepcopy(document)
+
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise JSONPatchError("Each operation needs 'op' and 'path'")
+
+        op = operation["op"]
+        path = operation["path"]
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JSONPatchError(f"'{op}' operation requires 'value'")
+
+        if op == "add":
+            _add(result, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(result, path)
+        elif op == "replace":
+            _replace(result, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            _add(result, path, _remove(result, operation.get("from", "")))
+        elif op == "copy":
+            _add(result, path, copy.deepcopy(_get(result, operation.get("from", ""))))
+        elif op == "test":
+            if _get(result, path) != operation["value"]:
+                raise JSONPatchError(f"Test failed for {path}")
+        elif op == "splice":
+            _splice(result, operation)
+        else:
+            raise JSONPatchError(f"Unsupported operation: {op}")
+
+    return result
+
+
+# Strings at least this long are diffed with splice instead of replaced
+SPLICE_MIN_LENGTH = 64
+
+
+def _escape(token) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _diff_string(old: str, new: str, path: str) -> List[dict]:
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    insert = new[prefix:len(new) - suffix]
+    if len(insert) >= len(new) // 2:
+        return [{"op": "replace", "path": path, "value": new}]
+    return [{"op": "splice", "path": path, "offset": prefix, "delete": len(old) - prefix - suffix, "insert": insert}]
+
+
+def diff(old: Any, new: Any, path: str = "") -> List[dict]:
+    """
+    Operations turning ``old`` into ``new`` (apply_patch(old, diff(old, new)) == new).
+    Dicts and equal-length lists are compared member by member, appended
+    list items become adds and long strings become splices, so the patch
+    grows with the size of the change rather than the document.
+    """
+    if type(old) is not type(new):  # Also tells 1 from 1.0 and True
+        return [{"op": "replace", "path": path, "value": copy.deepcopy(new)}]
+
+    if isinstance(old, dict):
+        operations = []
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            if key not in old:
+                operations.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": copy.deepcopy(value)})
+            else:
+                operations.extend(diff(old[key], value, f"{path}/{_escape(key)}"))
+        return operations
+
+    if isinstance(old, list):
+        if len(old) == len(new):
+            operations = []
+            for index, (old_item, new_item) in enumerate(zip(old, new)):
+                operations.extend(diff(old_item, new_item, f"{path}/{index}"))
+            return operations
+        if len(new) > len(old) and new[:len(old)] == old:
+            return [{"op": "add", "path": f"{path}/-", "value": copy.deepcopy(item)} for item in new[len(old):]]
+        return [{"op": "replace", "path": path, "value": copy.deepcopy(new)}]
+
+    if old == new:
+        return []
+    if isinstance(old, str) and path and len(old) >= SPLICE_MIN_LENGTH and len(new) >= SPLICE_MIN_LENGTH:
+        return _diff_string(old, new, path)
+    return [{"op": "replace", "path": path, "value": new}]
@@ -0,0 +1,171 @@
+"""
+Printable QR label sheets for production batches
+
+Labels are generated lazily (one per product or per unit of a batch) and
+rendered a page at a time in the process pool, so a sheet of any length is
+streamed with only a bounded number of pages in memory.
+
+In the PDF each QR code is a 1-bit image with one pixel per module, scaled
+by the page transform: a few hundred bytes per label and sharp at any
+printer resolution.
+"""
+
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+import zlib
+
+import numpy as np
+
+from app.services import qr_engine
+from app.services.pdf_stream import PdfStreamWriter, pdf_text
+from app.services.process_pool import imap_bounded
+from app.services.zip_stream import stream_zip
+
+MM = 72 / 25.4  # PDF points per millimetre
+
+PAGE_SIZES = {
+    "A4": (595.28, 841.89),
+    "Letter": (612.0, 792.0),
+}
+
+CAPTION_FONT_SIZE = 6.5
+CAPTION_LINES = 2
+
+
+class LabelLayout:
+    """Label grid on a page; takes millimetres, stores PDF points"""
+
+    def __init__(self, page_size: str = "A4", columns: int = 3, rows: int = 8,
+                 margin_mm: float = 8, gap_mm: float = 3, captions: bool = True):
+        self.page_width, self.page_height = PAGE_SIZES[page_size]
+        self.columns = columns
+        self.rows = rows
+        self.margin = margin_mm * MM
+        self.gap = gap_mm * MM
+        self.captions = captions
+
+        self.cell_width = (self.page_width - 2 * self.margin - (columns - 1) * self.gap) / columns
+        self.cell_height = (self.page_height - 2 * self.margin - (rows - 1) * self.gap) / rows
+        caption_height = CAPTION_LINES * CAPTION_FONT_SIZE * 1.2 if captions else 0
+        self.qr_size = min(self.cell_width, self.cell_height - caption_height)
+        if self.qr_size < 10 * MM:
+            raise ValueError("Labels are too small for a scannable QR code; use fewer columns or rows")
+
+    @property
+    def per_page(self) -> int:
+        return self.columns * self.rows
+
+    def position(self, index: int) -> Tuple[float, float]:
+        """Bottom-left corner of the QR code for the index-th label on a page"""
+        row, column = divmod(index, self.columns)
+        cell_x = self.margin + column * (self.cell_width + self.gap)
+        cell_top = self.page_height - self.margin - row * (self.cell_height + self.gap)
+        return cell_x + (self.cell_width - self.qr_size) / 2, cell_top - self.qr_size
+
+
+def render_label_page(args: Tuple[List[dict], str]) -> Tuple[List[dict], List[Tuple[int, bytes]]]:
+    """
+    Pool task: (labels, error correction) -> (labels, [(width in modules, deflated 1-bit rows)])
+    Rows are packed most significant bit first, 1 = light, as PDF DeviceGray expects.
+    """
+    labels, error_correction = args
+    images = []
+    for label in labels:
+        modules = qr_engine.qr_modules(label["payload"], error_correction)
+        light = np.pad(~modules, qr_engine.QR_BORDER, constant_values=True)
+        images.append((light.shape[0], zlib.compress(np.packbits(light, axis=1).tobytes())))
+    return labels, images
+
+
+def render_label_pngs(args: Tuple[List[dict], int, str]) -> List[Tuple[str, bytes]]:
+    """Pool task: (labels, size in pixels, error correction) -> [(filename, PNG bytes)]"""
+    labels, size, error_correction = args
+    images = qr_engine.render_many([label["payload"] for label in labels], size, "png", error_correction)
+    return [(f"{label['name']}.png", image) for label, image in zip(labels, images)]
+
+
+def _chunks(labels: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    labels = iter(labels)
+    while True:
+        chunk = list(islice(labels, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _page_content(layout: LabelLayout, labels: List[dict]) -> bytes:
+    commands = []
+    for index, label in enumerate(labels):
+        x, y = layout.position(index)
+        commands.append(f"q {layout.qr_size:.2f} 0 0 {layout.qr_size:.2f} {x:.2f} {y:.2f} cm /Im{index} Do Q")
+        if layout.captions:
+            for line, text in enumerate(label.get("caption", [])[:CAPTION_LINES]):
+                baseline = y - (line + 1) * CAPTION_FONT_SIZE * 1.2
+                commands.append(f"BT /F1 {CAPTION_FONT_SIZE} Tf {x + 2:.2f} {baseline:.2f} Td {pdf_text(text)} Tj ET")
+    return "\n".join(commands).encode("latin-1")
+
+
+def stream_label_pdf(labels: Iterable[dict], layout: LabelLayout, error_correction: str = "M",
+                     on_page=None) -> Iterator[bytes]:
+    """
+    Multi-page PDF of labels ({"payload", "caption": [lines]}), yielded page by page
+    on_page(label_count) is called after each page is written.
+    """
+    pdf = PdfStreamWriter()
+    catalog_id, pages_id, font_id = pdf.reserve(), pdf.reserve(), pdf.reserve()
+    page_ids = []
+
+    yield pdf.header()
+    yield pdf.object(catalog_id, f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+    yield pdf.object(font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    tasks = ((page, error_correction) for page in _chunks(labels, layout.per_page))
+    for page, images in imap_bounded(render_label_page, tasks):
+        parts, resources = [], []
+        for index, (width, data) in enumerate(images):
+            image_id = pdf.reserve()
+            resources.append(f"/Im{index} {image_id} 0 R")
+            parts.append(pdf.object(image_id, (
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {width} /ColorSpace /DeviceGray "
+                f"/BitsPerComponent 1 /Interpolate false /Filter /FlateDecode /Length {len(data)} >>"
+            ), data))
+
+        content = zlib.compress(_page_content(layout, page))
+        content_id, page_id = pdf.reserve(), pdf.reserve()
+        parts.append(pdf.object(content_id, f"<< /Filter /FlateDecode /Length {len(content)} >>", content))
+        parts.append(pdf.object(page_id, (
+            f"<< /Type /Page /Parent {pages_id} 0 R "
+            f"/MediaBox [0 0 {layout.page_width:.2f} {layout.page_height:.2f}] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> /XObject << {' '.join(resources)} >> >> "
+            f"/Contents {content_id} 0 R >>"
+        )))
+        page_ids.append(page_id)
+        yield b"".join(parts)
+        if on_page:
+            on_page(len(page))
+
+    if not page_ids:
+        # A PDF needs at least one page
+        page_id = pdf.reserve()
+        yield pdf.object(page_id, (
+            f"<< /Type /Page /Parent {pages_id} 0 R "
+            f"/MediaBox [0 0 {layout.page_width:.2f} {layout.page_height:.2f}] /Resources << >> >>"
+        ))
+        page_ids.append(page_id)
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    yield pdf.object(pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>")
+    yield pdf.trailer(catalog_id)
+
+
+def stream_label_zip(labels: Iterable[dict], size: int, error_correction: str = "M",
+                     chunk_size: int = 50, on_chunk=None) -> Iterator[bytes]:
+    """ZIP of one PNG per label ({"payload", "name"}), rendered in chunks in the process pool"""
+    def files():
+        tasks = ((chunk, size, error_correction) for chunk in _chunks(labels, chunk_size))
+        for rendered in imap_bounded(render_label_pngs, tasks):
+            yield from rendered
+            if on_chunk:
+                on_chunk(len(rendered))
+
+    return stream_zip(files())
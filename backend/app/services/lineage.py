@@ -0,0 +1,270 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.batch import Batch
+from app.models.complience_event import ComplianceEvent
+from app.models.factory import Factory
+from app.models.lineage import BatchInput, BatchLineage
+from app.models.product import Product
+
+
+class LineageService:
+    """
+    Keeps batch_lineage (the transitive closure of batch_inputs) in step
+
+    Adding an input links every ancestor of the input batch to every
+    descendant of the consuming batch, so upstream/downstream queries for a
+    product are one indexed lookup on batch_lineage instead of a graph walk.
+    Removing an input recomputes the closure of the batches below it with a
+    recursive CTE, since other paths may still connect them. Everything runs
+    in the caller's transaction; the caller commits.
+    """
+
+    # Maintenance
+
+    @staticmethod
+    def _ancestors(db: Session, batch_id: int) -> Dict[int, int]:
+        rows = db.query(BatchLineage.ancestor_id, BatchLineage.depth).filter(BatchLineage.descendant_id == batch_id)
+        return dict(rows.all())
+
+    @staticmethod
+    def _descendants(db: Session, batch_id: int) -> Dict[int, int]:
+        rows = db.query(BatchLineage.descendant_id, BatchLineage.depth).filter(BatchLineage.ancestor_id == batch_id)
+        return dict(rows.all())
+
+    @staticmethod
+    def _link(db: Session, upstream_id: int, downstream_id: int):
+        """Closure rows for a new edge upstream -> downstream (keeping the shortest depth)"""
+        ancestors = {upstream_id: 0, **LineageService._ancestors(db, upstream_id)}
+        descendants = {downstream_id: 0, **LineageService._descendants(db, downstream_id)}
+
+        existing = dict(
+            ((ancestor, descendant), depth) for ancestor, descendant, depth in db.query(
+                BatchLineage.ancestor_id, BatchLineage.descendant_id, BatchLineage.depth
+            ).filter(
+                BatchLineage.ancestor_id.in_(ancestors), BatchLineage.descendant_id.in_(descendants)
+            ).all()
+        )
+
+        new_rows, shorter = [], []
+        for ancestor, ancestor_depth in ancestors.items():
+            for descendant, descendant_depth in descendants.items():
+                depth = ancestor_depth + 1 + descendant_depth
+                current = existing.get((ancestor, descendant))
+                if current is None:
+                    new_rows.append({"ancestor_id": ancestor, "descendant_id": descendant, "depth": depth})
+                elif depth < current:
+                    shorter.append({"ancestor_id": ancestor, "descendant_id": descendant, "depth": depth})
+
+        if new_rows:
+            db.execute(insert(BatchLineage), new_rows)
+        for row in shorter:
+            db.execute(update(BatchLineage).where(
+                BatchLineage.ancestor_id == row["ancestor_id"], BatchLineage.descendant_id == row["descendant_id"]
+            ).values(depth=row["depth"]))
+
+    @staticmethod
+    def add_input(db: Session, batch_id: int, input_batch_id: Optional[int] = None,
+                  supplier_factory_id: Optional[int] = None, **details) -> BatchInput:
+        """Record an input of a batch; raises ValueError if it would make the lineage cyclic"""
+        if input_batch_id is not None:
+            if input_batch_id == batch_id or input_batch_id in LineageService._descendants(db, batch_id):
+                raise ValueError("A batch cannot be an input of itself or of its own inputs")
+
+        batch_input = BatchInput(
+            batch_id=batch_id, input_batch_id=input_batch_id, supplier_factory_id=supplier_factory_id, **details
+        )
+        db.add(batch_input)
+        db.flush()
+
+        if input_batch_id is not None:
+            LineageService._link(db, input_batch_id, batch_id)
+        return batch_input
+
+    @staticmethod
+    def remove_input(db: Session, batch_input: BatchInput):
+        db.delete(batch_input)
+        db.flush()
+        if batch_input.input_batch_id is not None:
+            affected = {batch_input.batch_id, *LineageService._descendants(db, batch_input.batch_id)}
+            LineageService.rebuild(db, affected)
+
+    @staticmethod
+    def compute(db: Session, descendant_ids: Optional[Iterable[int]] = None) -> List[tuple]:
+        """(ancestor_id, descendant_id, depth) from batch_inputs with a recursive CTE"""
+        edges = select(
+            BatchInput.input_batch_id.label("ancestor_id"),
+            BatchInput.batch_id.label("descendant_id"),
+            literal(1).label("depth")
+        ).where(BatchInput.input_batch_id.isnot(None))
+        if descendant_ids is not None:
+            edges = edges.where(BatchInput.batch_id.in_(list(descendant_ids)))
+
+        closure = edges.cte("closure", recursive=True)
+        closure = closure.union(
+            select(BatchInput.input_batch_id, closure.c.descendant_id, closure.c.depth + 1)
+            .join(closure, BatchInput.batch_id == closure.c.ancestor_id)
+            .where(BatchInput.input_batch_id.isnot(None))
+        )
+
+        return db.execute(
+            select(closure.c.ancestor_id, closure.c.descendant_id, func.min(closure.c.depth))
+            .group_by(closure.c.ancestor_id, closure.c.descendant_id)
+        ).all()
+
+    @staticmethod
+    def rebuild(db: Session, descendant_ids: Optional[Set[int]] = None) -> int:
+        """
+        Recompute closure rows (for the given descendants, or all of them)
+        Returns the number of rows written.
+        """
+        rows = LineageService.compute(db, descendant_ids)
+
+        stale = delete(BatchLineage)
+        if descendant_ids is not None:
+            stale = stale.where(BatchLineage.descendant_id.in_(list(descendant_ids)))
+        db.execute(stale)
+
+        if rows:
+            db.execute(insert(BatchLineage), [
+                {"ancestor_id": ancestor, "descendant_id": descendant, "depth": depth}
+                for ancestor, descendant, depth in rows
+            ])
+        return len(rows)
+
+    @staticmethod
+    def check_consistency(db: Session) -> List[dict]:
+        """Differences between batch_lineage and the closure of batch_inputs"""
+        expected = {(a, d): depth for a, d, depth in LineageService.compute(db)}
+        stored = dict(
+            ((a, d), depth) for a, d, depth in
+            db.query(BatchLineage.ancestor_id, BatchLineage.descendant_id, BatchLineage.depth).all()
+        )
+        return [
+            {"ancestor_id": a, "descendant_id": d, "expected": expected.get((a, d)), "actual": stored.get((a, d))}
+            for a, d in sorted(set(expected) | set(stored)) if expected.get((a, d)) != stored.get((a, d))
+        ]
+
+    # Queries
+
+    @staticmethod
+    def product_batch_ids(db: Session, product: Product) -> Set[int]:
+        """Batches that produced a product (Batch.product_id) or that it belongs to (Product.batch_id)"""
+        batch_ids = {batch_id for (batch_id,) in db.query(Batch.id).filter(Batch.product_id == product.id).all()}
+        if product.batch_id is not None:
+            batch_ids.add(product.batch_id)
+        return batch_ids
+
+    @staticmethod
+    def upstream(db: Session, product: Product) -> dict:
+        """
+        Every batch, supplier factory and compliance event upstream of a product
+        Tier 0 is the product's own batches, tier 1 their direct inputs, and so on.
+        """
+        own = LineageService.product_batch_ids(db, product)
+        tiers: Dict[int, int] = dict.fromkeys(own, 0)
+        if own:
+            for ancestor_id, depth in db.query(BatchLineage.ancestor_id, func.min(BatchLineage.depth)).filter(
+                BatchLineage.descendant_id.in_(own)
+            ).group_by(BatchLineage.ancestor_id).all():
+                tiers.setdefault(ancestor_id, depth)
+
+        batches = db.query(
+            Batch.id, Batch.batch_code, Product.dpp_id, Product.name, Product.factory_id, Factory.name
+        ).join(Product, Product.id == Batch.product_id).join(Factory, Factory.id == Product.factory_id).filter(
+            Batch.id.in_(tiers)
+        ).all() if tiers else []
+
+        suppliers: Dict[int, dict] = {}
+
+        def add_supplier(factory_id: int, name: str, tier: int):
+            if factory_id not in suppliers or tier < suppliers[factory_id]["tier"]:
+                suppliers[factory_id] = {"factory_id": factory_id, "name": name, "tier": tier}
+
+        for batch_id, _, _, _, factory_id, factory_name in batches:
+            if tiers[batch_id] > 0:
+                add_supplier(factory_id, factory_name, tiers[batch_id])
+
+        # Inputs not tracked as batches on the platform, from a named supplier
+        untracked = db.query(BatchInput, Factory.name).outerjoin(
+            Factory, Factory.id == BatchInput.supplier_factory_id
+        ).filter(BatchInput.batch_id.in_(tiers), BatchInput.input_batch_id.is_(None)).all() if tiers else []
+        for batch_input, factory_name in untracked:
+            if batch_input.supplier_factory_id is not None:
+                add_supplier(batch_input.supplier_factory_id, factory_name, tiers[batch_input.batch_id] + 1)
+
+        events = db.query(ComplianceEvent).filter(
+            ComplianceEvent.batch_id.in_(tiers)
+        ).order_by(ComplianceEvent.created_at.desc()).all() if tiers else []
+
+        return {
+            "dpp_id": product.dpp_id,
+            "batches": sorted((
+                {
+                    "batch_id": batch_id,
+                    "batch_code": batch_code,
+                    "tier": tiers[batch_id],
+                    "product": {"dpp_id": dpp_id, "name": name},
+                    "factory": {"id": factory_id, "name": factory_name}
+                }
+                for batch_id, batch_code, dpp_id, name, factory_id, factory_name in batches
+            ), key=lambda batch: (batch["tier"], batch["batch_id"])),
+            "untracked_inputs": [
+                {
+                    "batch_id": batch_input.batch_id,
+                    "material": batch_input.material,
+                    "quantity": batch_input.quantity,
+                    "unit": batch_input.unit,
+                    "supplier": {"id": batch_input.supplier_factory_id, "name": factory_name}
+                    if batch_input.supplier_factory_id is not None else None,
+                    "tier": tiers[batch_input.batch_id] + 1
+                }
+                for batch_input, factory_name in untracked
+            ],
+            "suppliers": sorted(suppliers.values(), key=lambda supplier: (supplier["tier"], supplier["factory_id"])),
+            "compliance_events": [
+                {
+                    "id": event.id,
+                    "batch_id": event.batch_id,
+                    "tier": tiers[event.batch_id],
+                    "factory_id": event.factory_id,
+                    "event_type": event.event_type,
+                    "status": event.status,
+                    "evidence_type": event.evidence_type,
+                    "expiry_date": event.expiry_date.isoformat() if event.expiry_date else None,
+                    "date": event.created_at.isoformat() if event.created_at else None
+                }
+                for event in events
+            ]
+        }
+
+    @staticmethod
+    def downstream(db: Session, product: Product) -> dict:
+        """Batches and products made from a product's batches (e.g. garments cut from a fabric lot)"""
+        own = LineageService.product_batch_ids(db, product)
+        rows = db.query(
+            Batch.id, Batch.batch_code, func.min(BatchLineage.depth), Product.dpp_id, Product.name, Product.sku,
+            Product.factory_id, Factory.name
+        ).join(Batch, Batch.id == BatchLineage.descendant_id).join(
+            Product, or_(Product.id == Batch.product_id, Product.batch_id == Batch.id)
+        ).join(Factory, Factory.id == Product.factory_id).filter(
+            BatchLineage.ancestor_id.in_(own)
+        ).group_by(
+            Batch.id, Batch.batch_code, Product.dpp_id, Product.name, Product.sku, Product.factory_id, Factory.name
+        ).all() if own else []
+
+        return {
+            "dpp_id": product.dpp_id,
+            "batches": sorted((
+                {
+                    "batch_id": batch_id,
+                    "batch_code": batch_code,
+                    "tier": depth,
+                    "product": {"dpp_id": dpp_id, "name": name, "sku": sku},
+                    "factory": {"id": factory_id, "name": factory_name}
+                }
+                for batch_id, batch_code, depth, dpp_id, name, sku, factory_id, factory_name in rows
+            ), key=lambda batch: (batch["tier"], batch["batch_id"]))
+        }
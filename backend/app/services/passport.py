@@ -0,0 +1,96 @@
+from sqlalchemy.orm import Session
+
+from app.core.config import DPP_PAGE_BASE_URL
+from app.models.factory import Factory
+from app.models.product import Product
+from app.services.compliance_summary import ComplianceSummaryService
+from app.services.dpp_ids import canonical_dpp_id, compact_dpp_id, dpp_key
+
+
+def dpp_public_url(dpp_id: str) -> str:
+    """URL encoded in a product's QR code, using the compact form of the ID"""
+    return f"{DPP_PAGE_BASE_URL}/{compact_dpp_id(dpp_id)}"
+
+
+def product_qr_url(dpp_id: str) -> str:
+    """Stored as Product.qr_code_url; the image is rendered on first request"""
+    return f"/qr/dpp/{dpp_id}"
+
+
+def find_product(db: Session, dpp_id: str, *columns):
+    """
+    Product (or just the given columns) for a compact or canonical DPP ID
+    UUID-based IDs go through the binary dpp_key index; rows written before
+    dpp_key existed, and non-UUID IDs, are found by dpp_id.
+    """
+    query = db.query(*columns) if columns else db.query(Product)
+    key = dpp_key(dpp_id)
+    if key is not None:
+        product = query.filter(Product.dpp_key == key).first()
+        if product is not None:
+            return product
+    return query.filter(Product.dpp_id.in_({dpp_id, canonical_dpp_id(dpp_id)})).first()
+
+
+def build_public_dpp(db: Session, product: Product) -> dict:
+    """
+    Public Digital Product Passport for a product
+    Shared by the public DPP endpoint and its response cache
+    """
+    factory = db.query(Factory).filter(Factory.id == product.factory_id).first()
+    
+    # Compliance figures come from the materialized per-factory summary
+    compliance_summary = ComplianceSummaryService.get(db, product.factory_id)
+    
+    return public_dpp(product, manufacturer_details(factory), ComplianceSummaryService.public_status(compliance_summary))
+
+
+def manufacturer_details(factory: Factory) -> dict:
+    return {
+        "name": factory.name,
+        "location": factory.location,
+        "id": factory.id
+    }
+
+
+def public_dpp(product: Product, manufacturer: dict, compliance_status: dict) -> dict:
+    """
+    Public passport from a product and its factory's (already loaded) details
+    Bulk exports build these once per factory rather than once per product.
+    """
+    return {
+        "dpp_id": product.dpp_id,
+        "compact_id": compact_dpp_id(product.dpp_id),
+        "product_name": product.name,
+        "category": product.category,
+        "sku": product.sku,
+        "description": product.description,
+        "manufacturer": manufacturer,
+        "materials": product.materials or [],
+        "environmental_impact": {
+            "carbon_footprint_kg": product.carbon_footprint_kg,
+            "water_usage_liters": product.water_usage_liters,
+            "recycled_content_percentage": product.recycled_content_percentage,
+            # From the material composition, for products without an LCA figure
+            "estimated_carbon_footprint_kg": product.estimated_carbon_kg,
+            "estimated_water_usage_liters": product.estimated_water_liters
+        },
+        "certifications": product.certifications or [],
+        "origin": {
+            "country": product.origin_country,
+            "raw_material_source": product.raw_material_source
+        },
+        "compliance_status": {
+            "verified": product.compliance_verified,
+            **compliance_status
+        },
+        "supply_chain": {
+            "manufactured_date": product.manufactured_date.isoformat() if product.manufactured_date else None,
+            "batch_tracking": product.batch_id is not None
+        },
+        "images": product.product_images or [],
+        # Aligned with images; null until an image's derivatives are rendered
+        "image_variants": [(product.product_image_variants or {}).get(url) for url in product.product_images or []],
+        "qr_code_url": product.qr_code_url,
+        "last_updated": product.updated_at.isoformat() if product.updated_at else product.created_at.isoformat()
+    }
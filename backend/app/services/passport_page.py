@@ -0,0 +1,157 @@
+"""
+Server-rendered passport page for QR scans
+
+A single small HTML response with inline critical CSS and no JavaScript,
+so a phone on a weak connection can show the passport without loading the
+SPA. Templates are compiled once at import; every value is escaped.
+"""
+
+from html import escape
+from string import Template
+
+PAGE_CSS = (
+    "*{box-sizing:border-box}"
+    "body{margin:0;font:15px/1.5 system-ui,-apple-system,Segoe UI,Roboto,sans-serif;color:#111827;background:#f3f4f6}"
+    "main{max-width:640px;margin:0 auto;padding:16px}"
+    "header{background:#166534;color:#fff;padding:20px 16px;border-radius:12px}"
+    "header h1{margin:0 0 4px;font-size:22px;line-height:1.25}"
+    "header p{margin:0;opacity:.85}"
+    "section{background:#fff;border-radius:12px;padding:14px 16px;margin-top:12px}"
+    "h2{font-size:13px;letter-spacing:.05em;text-transform:uppercase;color:#6b7280;margin:0 0 8px}"
+    "table{width:100%;border-collapse:collapse}"
+    "td{padding:6px 0;border-top:1px solid #f3f4f6;vertical-align:top}"
+    "td:last-child{text-align:right;font-weight:600}"
+    "tr:first-child td{border-top:0}"
+    ".badge{display:inline-block;padding:2px 10px;border-radius:999px;font-size:13px;font-weight:600;margin:2px 4px 2px 0}"
+    ".ok{background:#dcfce7;color:#166534}.warn{background:#fef3c7;color:#92400e}.bad{background:#fee2e2;color:#991b1b}"
+    ".tag{background:#e0e7ff;color:#3730a3}"
+    ".score{font-size:32px;font-weight:700;color:#166534}"
+    "img{max-width:100%;height:auto;border-radius:8px}"
+    "footer{color:#6b7280;font-size:12px;text-align:center;padding:16px}"
+    ".notice{background:#fee2e2;color:#991b1b;font-weight:600}"
+)
+
+# Rendered width of the product image: the page column minus section padding
+IMAGE_SIZES = "(max-width: 640px) calc(100vw - 64px), 576px"
+
+PAGE_TEMPLATE = Template("""<!doctype html>
+<html lang="en"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>$title · Digital Product Passport</title>
+<style>$css</style></head>
+<body><main>
+<header><h1>$title</h1><p>$subtitle</p></header>
+$notice$image
+<section><h2>Manufacturer</h2><table>$manufacturer</table></section>
+<section><h2>Materials</h2><table>$materials</table></section>
+<section><h2>Compliance</h2><p><span class="score">$score%</span> $verified</p><table>$compliance</table></section>
+<section><h2>Environmental impact</h2><table>$environment</table></section>
+<section><h2>Certifications</h2><p>$certifications</p></section>
+<section><h2>Origin</h2><table>$origin</table></section>
+</main>
+<footer>Digital Product Passport $dpp_id · Updated $updated</footer>
+</body></html>""")
+
+NOT_FOUND_PAGE = Template("""<!doctype html>
+<html lang="en"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>Passport not found</title><style>$css</style></head>
+<body><main><header><h1>Passport not found</h1>
+<p>This QR code does not match a registered Digital Product Passport.</p></header></main></body></html>""").substitute(css=PAGE_CSS)
+
+ROW = Template("<tr><td>$label</td><td>$value</td></tr>")
+BADGE = Template('<span class="badge $kind">$text</span>')
+STATUS_BADGE_KIND = {"PASS": "ok", "FAIL": "bad"}
+
+
+def _rows(rows) -> str:
+    rows = [(label, value) for label, value in rows if value not in (None, "")]
+    if not rows:
+        return ROW.substitute(label="Not provided", value="")
+    return "".join(ROW.substitute(label=escape(str(label)), value=escape(str(value))) for label, value in rows)
+
+
+def _status_row(event_type: str, check: dict) -> str:
+    badge = BADGE.substitute(kind=STATUS_BADGE_KIND.get(check.get("status"), "warn"), text=escape(str(check.get("status"))))
+    label = escape(event_type.replace("_", " ").title())
+    return f"<tr><td>{label}</td><td>{badge}</td></tr>"
+
+
+UNIT_NOTICES = {
+    "recalled": "This item has been recalled. Stop using it and contact the seller or manufacturer.",
+    "returned": "This item was returned to the manufacturer.",
+    "destroyed": "This item is registered as destroyed.",
+    "lost": "This item is registered as lost or stolen.",
+}
+
+
+def unit_notice(unit: dict) -> str:
+    """Banner for a scanned unit that is not in normal circulation"""
+    text = UNIT_NOTICES.get(unit["status"], f"Status: {unit['status']}")
+    return f'<section class="notice">{escape(text)}<br>Unit {escape(unit["serial"])} · {escape(str(unit["batch_code"]))}</section>'
+
+
+def render_passport_page(passport: dict, notice: str = "") -> str:
+    """Render the public passport payload (see build_public_dpp) as HTML, with an optional (pre-escaped) notice"""
+    manufacturer = passport.get("manufacturer") or {}
+    environment = passport.get("environmental_impact") or {}
+    origin = passport.get("origin") or {}
+    compliance = passport.get("compliance_status") or {}
+    images = passport.get("images") or []
+
+    materials = _rows(
+        (material.get("material"), f"{material.get('percentage'):g}%" if material.get("percentage") is not None else "")
+        for material in passport.get("materials") or []
+    )
+
+    by_type = compliance.get("by_type") or {}
+    compliance_rows = "".join(_status_row(event_type, check) for event_type, check in sorted(by_type.items()))
+    compliance_rows += ROW.substitute(
+        label="Checks passed",
+        value=f"{compliance.get('passed_checks', 0)} / {compliance.get('total_checks', 0)}"
+    )
+
+    certifications = "".join(
+        BADGE.substitute(kind="tag", text=escape(str(certification)))
+        for certification in passport.get("certifications") or []
+    ) or "None listed"
+
+    image = ""
+    variants = (passport.get("image_variants") or [None])[0]
+    if variants:
+        # Phones download the 320/800 px derivative instead of the original upload
+        attr = lambda value: escape(str(value), quote=True)
+        medium = variants["sizes"]["medium"]
+        image = (
+            f'<section><picture><source type="image/webp" srcset="{attr(variants["srcset"]["webp"])}" sizes="{IMAGE_SIZES}">'
+            f'<img src="{attr(medium["jpeg"])}" srcset="{attr(variants["srcset"]["jpeg"])}" sizes="{IMAGE_SIZES}" '
+            f'width="{medium["width"]}" height="{medium["height"]}" alt="" loading="lazy"></picture></section>'
+        )
+    elif images:
+        image = f'<section><img src="{escape(str(images[0]), quote=True)}" alt="" loading="lazy"></section>'
+
+    subtitle = " · ".join(escape(str(part)) for part in (passport.get("category"), passport.get("sku")) if part)
+
+    return PAGE_TEMPLATE.substitute(
+        css=PAGE_CSS,
+        notice=notice,
+        title=escape(str(passport.get("product_name") or "")),
+        subtitle=subtitle,
+        image=image,
+        manufacturer=_rows([("Name", manufacturer.get("name")), ("Location", manufacturer.get("location"))]),
+        materials=materials,
+        score=escape(str(compliance.get("score", 0))),
+        verified=BADGE.substitute(kind="ok", text="Verified") if compliance.get("verified") else "",
+        compliance=compliance_rows,
+        environment=_rows([
+            ("Carbon footprint", f"{environment['carbon_footprint_kg']:g} kg CO₂e" if environment.get("carbon_footprint_kg") is not None else None),
+            ("Carbon footprint (estimated)", f"{environment['estimated_carbon_footprint_kg']:.3g} kg CO₂e" if environment.get("carbon_footprint_kg") is None and environment.get("estimated_carbon_footprint_kg") is not None else None),
+            ("Water usage", f"{environment['water_usage_liters']:g} L" if environment.get("water_usage_liters") is not None else None),
+            ("Water usage (estimated)", f"{environment['estimated_water_usage_liters']:.3g} L" if environment.get("water_usage_liters") is None and environment.get("estimated_water_usage_liters") is not None else None),
+            ("Recycled content", f"{environment['recycled_content_percentage']:g}%" if environment.get("recycled_content_percentage") is not None else None),
+        ]),
+        certifications=certifications,
+        origin=_rows([("Country", origin.get("country")), ("Raw material source", origin.get("raw_material_source"))]),
+        dpp_id=escape(str(passport.get("dpp_id") or "")),
+        updated=escape(str(passport.get("last_updated") or "")[:10])
+    )
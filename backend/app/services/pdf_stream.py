@@ -0,0 +1,53 @@
+from typing import Dict, List, Optional
+
+
+class PdfStreamWriter:
+    """
+    Minimal PDF writer that emits the file front to back
+
+    Each method returns the bytes to send and records object offsets for the
+    cross-reference table, so pages can be streamed as soon as they are
+    built. Object numbers can be reserved before their object is written
+    (e.g. the page tree, which is only complete at the end).
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.offsets: Dict[int, int] = {}
+        self._next_id = 1
+
+    def _emit(self, data: bytes) -> bytes:
+        self.position += len(data)
+        return data
+
+    def reserve(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def header(self) -> bytes:
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def object(self, object_id: int, dictionary: str, stream: Optional[bytes] = None) -> bytes:
+        self.offsets[object_id] = self.position
+        if stream is None:
+            return self._emit(b"%d 0 obj\n%s\nendobj\n" % (object_id, dictionary.encode("latin-1")))
+        return self._emit(
+            b"%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n" % (object_id, dictionary.encode("latin-1"), stream)
+        )
+
+    def trailer(self, root_id: int) -> bytes:
+        size = self._next_id
+        xref_position = self.position
+        lines: List[bytes] = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for object_id in range(1, size):
+            offset = self.offsets.get(object_id)
+            lines.append(b"%010d 00000 n \n" % offset if offset is not None else b"0000000000 65535 f \n")
+        lines.append(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, root_id, xref_position))
+        return self._emit(b"".join(lines))
+
+
+def pdf_text(value: str) -> str:
+    """A PDF literal string for the standard (WinAnsi) fonts"""
+    value = value.encode("cp1252", errors="replace").decode("latin-1")
+    return "(" + value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
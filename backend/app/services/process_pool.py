@@ -0,0 +1,51 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+import threading
+
+from app.core.config import WORKER_PROCESSES
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound rendering (PDFs, QR codes, images)
+    Created on first use so API workers that never render don't fork
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES)
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def imap_bounded(fn: Callable, items: Iterable, window: int = None) -> Iterator:
+    """
+    Ordered map over the process pool with at most `window` tasks in flight
+    Unlike Executor.map this does not submit everything up front, so a slow
+    consumer (e.g. a streaming response) keeps memory bounded.
+    """
+    pool = get_process_pool()
+    window = window or WORKER_PROCESSES * 4
+    pending = deque()
+
+    try:
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
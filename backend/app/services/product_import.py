@@ -0,0 +1,267 @@
+"""
+Bulk product import (CSV, XLSX, NDJSON)
+
+The request only parses the file (in a worker thread); a row that cannot be
+read becomes a RowError, reported like any invalid row. run_product_import
+then validates rows
+against ProductCreate, checks SKUs in one set-based query, inserts in
+batches and pre-renders QR codes into the QR cache in the process pool,
+reporting progress and per-row errors on the job.
+"""
+
+from datetime import datetime
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from typing import Dict, List, Union
+import csv
+import json
+import os
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+
+from app.db.session import SessionLocal
+from app.models.product import Product
+from app.schemas.product import ProductCreate
+from app.services.dpp_ids import dpp_key, new_dpp_id
+from app.services.dpp_index import dpp_index
+from app.services.footprint import FootprintService
+from app.services.jobs import Job
+from app.services.passport import dpp_public_url, product_qr_url
+from app.services.process_pool import imap_bounded
+from app.services.product_search import insert_product_attributes
+from app.services.product_versions import ProductVersionService, product_document
+from app.services.qr_cache import qr_cache
+
+MAX_IMPORT_ROWS = 50000
+INSERT_BATCH_SIZE = 1000
+
+# Tabular cells that hold lists: "Cotton:95;Elastane:5" and "GOTS;OEKO-TEX"
+LIST_SEPARATOR = ";"
+
+
+def product_values(product: ProductCreate, factory_id: int) -> dict:
+    """Column values for a new Product, with a freshly generated DPP ID"""
+    dpp_id = new_dpp_id()
+    return {
+        "factory_id": factory_id,
+        "sku": product.sku,
+        "name": product.name,
+        "description": product.description,
+        "category": product.category,
+        "dpp_id": dpp_id,
+        "dpp_key": dpp_key(dpp_id),
+        "materials": [m.dict() for m in product.materials],
+        "origin_country": product.origin_country,
+        "raw_material_source": product.raw_material_source,
+        "carbon_footprint_kg": product.carbon_footprint_kg,
+        "water_usage_liters": product.water_usage_liters,
+        "recycled_content_percentage": product.recycled_content_percentage,
+        "weight_kg": product.weight_kg,
+        "certifications": product.certifications or [],
+        "manufactured_date": datetime.fromisoformat(product.manufactured_date) if product.manufactured_date else None,
+        "compliance_verified": False
+    }
+
+
+def render_product_qr(dpp_id: str) -> str:
+    """Pre-render a product's default QR code into the shared cache; returns its URL"""
+    qr_cache.get(dpp_public_url(dpp_id))
+    return product_qr_url(dpp_id)
+
+
+class RowError:
+    """A row of the file that could not be read, reported as that row's error"""
+
+    def __init__(self, message: str, sku=None):
+        self.message = message
+        self.sku = sku
+
+
+def _parse_materials(value: str) -> List[dict]:
+    materials = []
+    for part in value.split(LIST_SEPARATOR):
+        if not part.strip():
+            continue
+        material, _, percentage = part.rpartition(":")
+        if not material:
+            raise ValueError(f"Invalid material '{part.strip()}', expected 'Material:percentage'")
+        materials.append({"material": material.strip(), "percentage": percentage.strip()})
+    return materials
+
+
+def _tabular_row(raw: dict):
+    """Turn a CSV/XLSX row (flat strings) into ProductCreate input, or a RowError"""
+    row = {}
+    for key, value in raw.items():
+        if key is None:
+            continue
+        key = str(key).strip().lower()
+        if isinstance(value, str):
+            value = value.strip()
+        if value in ("", None):
+            continue
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        row[key] = value
+
+    try:
+        if isinstance(row.get("materials"), str) and not row["materials"].startswith("["):
+            row["materials"] = _parse_materials(row["materials"])
+        elif isinstance(row.get("materials"), str):
+            row["materials"] = json.loads(row["materials"])
+    except ValueError as e:  # json.JSONDecodeError included
+        return RowError(f"materials: {e}", row.get("sku"))
+    row.setdefault("materials", [])
+
+    if isinstance(row.get("certifications"), str):
+        row["certifications"] = [c.strip() for c in row["certifications"].split(LIST_SEPARATOR) if c.strip()]
+
+    for key in ("sku", "name", "category", "origin_country"):
+        if key in row:
+            row[key] = str(row[key])
+
+    return row
+
+
+def parse_import_file(filename: str, content: bytes) -> List[Union[dict, RowError]]:
+    """Read an uploaded file into a list of raw rows; raises ValueError if the file itself can't be read"""
+    extension = os.path.splitext(filename or "")[1].lower()
+
+    if extension == ".csv":
+        text = content.decode("utf-8-sig")
+        return [_tabular_row(row) for row in csv.DictReader(StringIO(text))]
+
+    if extension in (".ndjson", ".jsonl"):
+        rows = []
+        for line_number, line in enumerate(content.decode("utf-8").splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                rows.append(RowError(f"Invalid JSON on line {line_number}: {e}"))
+        return rows
+
+    if extension == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(BytesIO(content), read_only=True, data_only=True)
+        lines = workbook.active.iter_rows(values_only=True)
+        header = next(lines, None)
+        if not header:
+            return []
+        return [
+            _tabular_row(dict(zip(header, values)))
+            for values in lines
+            if any(value not in (None, "") for value in values)
+        ]
+
+    raise ValueError("Unsupported file type. Use .csv, .xlsx or .ndjson")
+
+
+def _validate(job: Job, rows: List[dict], factory_id: int) -> Dict[int, dict]:
+    """Validated Product values keyed by row number (1-based, excluding header)"""
+    valid = {}
+    seen_skus = {}
+
+    for row_number, raw in enumerate(rows, start=1):
+        if isinstance(raw, RowError):
+            job.add_error({"row": row_number, "sku": raw.sku, "errors": [raw.message]})
+            continue
+        if not isinstance(raw, dict):
+            job.add_error({"row": row_number, "sku": None, "errors": ["Row must be an object"]})
+            continue
+        try:
+            product = ProductCreate(**raw)
+            values = product_values(product, factory_id)
+        except ValidationError as e:
+            job.add_error({"row": row_number, "sku": raw.get("sku"), "errors": [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ]})
+            continue
+        except (TypeError, ValueError) as e:
+            job.add_error({"row": row_number, "sku": raw.get("sku"), "errors": [str(e)]})
+            continue
+
+        if product.sku in seen_skus:
+            job.add_error({"row": row_number, "sku": product.sku, "errors": [f"Duplicate SKU in file (row {seen_skus[product.sku]})"]})
+            continue
+        seen_skus[product.sku] = row_number
+        valid[row_number] = values
+
+    return valid
+
+
+def run_product_import(job: Job, factory_id: int):
+    """Background task: validate, insert and render QR codes for an import job"""
+    rows = job.payload
+    job.status = "running"
+    job.result = {"created": 0, "qr_rendered": 0}
+    db = SessionLocal()
+
+    try:
+        valid = _validate(job, rows, factory_id)
+        job.advance(len(rows) - len(valid))
+
+        # SKU uniqueness against the database in one set-based query
+        existing = set()
+        if valid:
+            existing = {
+                sku for (sku,) in db.query(Product.sku).filter(
+                    Product.sku.in_([values["sku"] for values in valid.values()])
+                ).all()
+            }
+        for row_number, values in list(valid.items()):
+            if values["sku"] in existing:
+                job.add_error({"row": row_number, "sku": values["sku"], "errors": ["SKU already exists"]})
+                job.advance()
+                del valid[row_number]
+
+        # Insert in batches
+        inserted = []
+        batch = list(valid.values())
+        for start in range(0, len(batch), INSERT_BATCH_SIZE):
+            chunk = batch[start:start + INSERT_BATCH_SIZE]
+            db.execute(insert(Product), chunk)
+            ids = dict(db.query(Product.dpp_id, Product.id).filter(
+                Product.dpp_id.in_([values["dpp_id"] for values in chunk])
+            ).all())
+            insert_product_attributes(db, [
+                (ids[values["dpp_id"]], values["materials"], values["certifications"]) for values in chunk
+            ])
+            ProductVersionService.snapshots(db, [
+                (ids[values["dpp_id"]], product_document(SimpleNamespace(**values))) for values in chunk
+            ], job.owner_id)
+            db.commit()
+            for values in chunk:
+                dpp_index.put(values["dpp_id"], values["name"], factory_id, values["compliance_verified"])
+                inserted.append((ids[values["dpp_id"]], values["dpp_id"]))
+            job.result["created"] += len(chunk)
+
+        # QR codes in the process pool, written back in batches
+        pending = []
+        for (product_id, _), qr_code_url in zip(inserted, imap_bounded(render_product_qr, [dpp_id for _, dpp_id in inserted])):
+            pending.append({"id": product_id, "qr_code_url": qr_code_url})
+            job.result["qr_rendered"] += 1
+            job.advance()
+            if len(pending) >= INSERT_BATCH_SIZE:
+                db.execute(update(Product), pending)
+                db.commit()
+                pending = []
+        if pending:
+            db.execute(update(Product), pending)
+            db.commit()
+
+        # Footprint estimates and the factory's rollups in one vectorized pass
+        if inserted:
+            job.result["footprint"] = FootprintService.recalculate(db, factory_id)
+
+        job.finish()
+
+    except Exception as e:
+        db.rollback()
+        job.add_error({"row": None, "errors": [str(e)]})
+        job.finish("failed")
+    finally:
+        db.close()
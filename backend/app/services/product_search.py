@@ -0,0 +1,175 @@
+"""
+Faceted product search over normalized materials and certifications
+
+Product.materials and Product.certifications stay the source of truth (the
+passport shows them as entered); product_materials and
+product_certifications mirror them with normalized keys so searches filter
+and count in SQL. Writers call sync_product_attributes (or
+insert_product_attributes for bulk inserts) in the same transaction as the
+product change.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.product_attributes import ProductCertification, ProductMaterial
+
+FACET_LIMIT = 50
+
+
+def normalize(value) -> str:
+    """Attribute key: case- and whitespace-insensitive"""
+    return " ".join(str(value).split()).lower()
+
+
+def attribute_rows(product_id: int, materials, certifications) -> Tuple[List[dict], List[dict]]:
+    """Side-table rows for one product; duplicate materials are merged, certifications deduplicated"""
+    material_rows: Dict[str, dict] = {}
+    certification_rows: Dict[str, dict] = {}
+
+    def add_certification(name):
+        key = normalize(name or "")
+        if key and key not in certification_rows:
+            certification_rows[key] = {"product_id": product_id, "certification": key, "name": str(name).strip()}
+
+    for material in materials or []:
+        key = normalize(material.get("material") or "")
+        if not key:
+            continue
+        try:
+            percentage = float(material["percentage"]) if material.get("percentage") is not None else None
+        except (TypeError, ValueError):
+            percentage = None
+        row = material_rows.get(key)
+        if row is None:
+            material_rows[key] = {
+                "product_id": product_id, "material": key, "name": str(material["material"]).strip(), "percentage": percentage
+            }
+        elif percentage is not None:
+            row["percentage"] = (row["percentage"] or 0) + percentage
+        # A certified material (e.g. GOTS cotton) makes the product findable by that certification
+        add_certification(material.get("certification"))
+
+    for certification in certifications or []:
+        add_certification(certification)
+
+    return list(material_rows.values()), list(certification_rows.values())
+
+
+def insert_product_attributes(db: Session, products: Iterable[Tuple[int, list, list]]):
+    """Bulk insert for new products: (product_id, materials, certifications)"""
+    materials, certifications = [], []
+    for product_id, product_materials, product_certifications in products:
+        material_rows, certification_rows = attribute_rows(product_id, product_materials, product_certifications)
+        materials.extend(material_rows)
+        certifications.extend(certification_rows)
+    if materials:
+        db.execute(insert(ProductMaterial), materials)
+    if certifications:
+        db.execute(insert(ProductCertification), certifications)
+
+
+def sync_product_attributes(db: Session, product: Product):
+    """Replace a product's side-table rows with its current materials and certifications"""
+    db.flush()
+    db.execute(delete(ProductMaterial).where(ProductMaterial.product_id == product.id))
+    db.execute(delete(ProductCertification).where(ProductCertification.product_id == product.id))
+    insert_product_attributes(db, [(product.id, product.materials, product.certifications)])
+
+
+def rebuild_product_attributes(db: Session, batch_size: int = 1000) -> int:
+    """Rebuild both side tables from the products' JSON columns; returns the number of products"""
+    db.execute(delete(ProductMaterial))
+    db.execute(delete(ProductCertification))
+    count = 0
+    rows = db.execute(
+        select(Product.id, Product.materials, Product.certifications).execution_options(yield_per=batch_size)
+    )
+    for partition in rows.partitions():
+        insert_product_attributes(db, partition)
+        count += len(partition)
+    return count
+
+
+class ProductSearch:
+    """Filters for /dpp/products/search; certifications are ANDed, other list filters ORed"""
+
+    def __init__(self, factory_id: Optional[int] = None, q: Optional[str] = None,
+                 categories: Optional[List[str]] = None, origin_countries: Optional[List[str]] = None,
+                 certifications: Optional[List[str]] = None, material: Optional[str] = None,
+                 min_percentage: Optional[float] = None, max_percentage: Optional[float] = None,
+                 compliance_verified: Optional[bool] = None):
+        self.factory_id = factory_id
+        self.q = q
+        self.categories = categories or []
+        self.origin_countries = origin_countries or []
+        self.certifications = [normalize(c) for c in certifications or [] if normalize(c)]
+        self.material = normalize(material) if material else None
+        self.min_percentage = min_percentage
+        self.max_percentage = max_percentage
+        self.compliance_verified = compliance_verified
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.factory_id is not None:
+            conditions.append(Product.factory_id == self.factory_id)
+        if self.q:
+            pattern = f"%{self.q}%"
+            conditions.append(or_(Product.name.ilike(pattern), Product.sku.ilike(pattern)))
+        if self.categories:
+            conditions.append(func.lower(Product.category).in_([c.lower() for c in self.categories]))
+        if self.origin_countries:
+            conditions.append(func.lower(Product.origin_country).in_([c.lower() for c in self.origin_countries]))
+        if self.compliance_verified is not None:
+            conditions.append(Product.compliance_verified == self.compliance_verified)
+        for certification in self.certifications:
+            conditions.append(Product.id.in_(
+                select(ProductCertification.product_id).where(ProductCertification.certification == certification)
+            ))
+        if self.material or self.min_percentage is not None or self.max_percentage is not None:
+            materials = select(ProductMaterial.product_id)
+            if self.material:
+                materials = materials.where(ProductMaterial.material == self.material)
+            if self.min_percentage is not None:
+                materials = materials.where(ProductMaterial.percentage >= self.min_percentage)
+            if self.max_percentage is not None:
+                materials = materials.where(ProductMaterial.percentage <= self.max_percentage)
+            conditions.append(Product.id.in_(materials))
+        return conditions
+
+    def results(self, db: Session, skip: int = 0, limit: int = 50) -> Tuple[int, List[Product]]:
+        conditions = self.conditions()
+        total = db.execute(select(func.count(Product.id)).where(*conditions)).scalar()
+        products = db.execute(
+            select(Product).where(*conditions).order_by(Product.id).offset(skip).limit(limit)
+        ).scalars().all()
+        return total, products
+
+    def facets(self, db: Session) -> dict:
+        """Value counts over the matching products, each facet one grouped query"""
+        matching = select(Product.id).where(*self.conditions())
+
+        def counts(statement) -> List[dict]:
+            rows = db.execute(statement.order_by(func.count().desc()).limit(FACET_LIMIT)).all()
+            return [{"value": value, "count": count} for value, count in rows if value is not None]
+
+        return {
+            "category": counts(
+                select(Product.category, func.count()).where(Product.id.in_(matching)).group_by(Product.category)
+            ),
+            "origin_country": counts(
+                select(Product.origin_country, func.count()).where(Product.id.in_(matching))
+                .group_by(Product.origin_country)
+            ),
+            "certification": counts(
+                select(func.min(ProductCertification.name), func.count())
+                .where(ProductCertification.product_id.in_(matching)).group_by(ProductCertification.certification)
+            ),
+            "material": counts(
+                select(func.min(ProductMaterial.name), func.count())
+                .where(ProductMaterial.product_id.in_(matching)).group_by(ProductMaterial.material)
+            ),
+        }
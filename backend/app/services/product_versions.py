@@ -0,0 +1,175 @@
+"""
+Product passport history, stored as deltas
+
+Every change to a product's passport fields appends a product_versions row.
+Most rows are JSON Patches against the previous version (json_patch.diff),
+so storage grows with the size of the changes. A full snapshot is stored
+for the first version, then again once PRODUCT_SNAPSHOT_INTERVAL - 1 deltas
+have piled up (or when a delta would be larger than half a snapshot), so any
+version is rebuilt from the nearest snapshot plus fewer than
+PRODUCT_SNAPSHOT_INTERVAL deltas.
+
+Only fields entered for the passport are versioned. Derived values
+(estimates, QR code URL, image derivatives) are not; a historical passport
+shows their current values.
+
+Products created before history existed get their pre-change state recorded
+as a baseline snapshot on their first change.
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+import copy
+import json
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import PRODUCT_SNAPSHOT_INTERVAL
+from app.models.product import Product
+from app.models.product_version import ProductVersion
+from app.services.json_patch import apply_patch, diff
+
+VERSIONED_FIELDS = (
+    "sku", "name", "description", "category", "materials", "origin_country", "raw_material_source",
+    "carbon_footprint_kg", "water_usage_liters", "recycled_content_percentage", "weight_kg",
+    "certifications", "product_images", "batch_id", "compliance_verified", "compliance_score",
+    "manufactured_date",
+)
+
+
+def product_document(product) -> dict:
+    """Versioned fields of a product (or of anything with the same attributes, e.g. import values)"""
+    document = copy.deepcopy({field: getattr(product, field, None) for field in VERSIONED_FIELDS})
+    if isinstance(document["manufactured_date"], datetime):
+        document["manufactured_date"] = document["manufactured_date"].isoformat()
+    return document
+
+
+def _utc(moment: datetime) -> datetime:
+    """Naive UTC, as stored in created_at"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _size(value) -> int:
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class ProductVersionService:
+
+    @staticmethod
+    def snapshots(db: Session, products: Iterable[Tuple[int, dict]], user_id: Optional[int] = None):
+        """Version 1 of new products, (product_id, document), in one insert"""
+        now = datetime.utcnow()
+        rows = [
+            {"product_id": product_id, "version": 1, "kind": "snapshot", "data": document,
+             "changed_fields": None, "changed_by": user_id, "created_at": now}
+            for product_id, document in products
+        ]
+        if rows:
+            db.execute(insert(ProductVersion), rows)
+
+    @staticmethod
+    def record(db: Session, product: Product, before: Optional[dict], user_id: Optional[int] = None) -> Optional[int]:
+        """
+        Record the product's current state; `before` is product_document() taken before the change
+        (None for a new product). Returns the new version, or None if no versioned field changed.
+        """
+        baseline_at = product.updated_at or product.created_at  # Read before the flush bumps updated_at
+        db.flush()
+        after = product_document(product)
+        latest = db.execute(
+            select(ProductVersion.version).where(ProductVersion.product_id == product.id)
+            .order_by(ProductVersion.version.desc()).limit(1)
+        ).scalar()
+
+        if latest is None:
+            if before is None or before == after:
+                ProductVersionService.snapshots(db, [(product.id, after)], user_id)
+                return 1
+            # First change of a product that predates history: keep what it said until now
+            db.add(ProductVersion(
+                product_id=product.id, version=1, kind="snapshot", data=before,
+                created_at=_utc(baseline_at) if baseline_at else datetime.utcnow()
+            ))
+            latest = 1
+
+        patch = diff(before, after) if before is not None else None
+        if patch == []:
+            return None
+
+        last_snapshot = db.execute(
+            select(func.max(ProductVersion.version)).where(
+                ProductVersion.product_id == product.id, ProductVersion.kind == "snapshot"
+            )
+        ).scalar() or 0
+        snapshot = (
+            patch is None
+            or latest + 1 - last_snapshot >= PRODUCT_SNAPSHOT_INTERVAL
+            or _size(patch) * 2 > _size(after)
+        )
+        version = latest + 1
+        db.add(ProductVersion(
+            product_id=product.id,
+            version=version,
+            kind="snapshot" if snapshot else "delta",
+            data=after if snapshot else patch,
+            changed_fields=sorted(field for field in VERSIONED_FIELDS if before is None or before.get(field) != after[field]),
+            changed_by=user_id,
+            created_at=datetime.utcnow()
+        ))
+        return version
+
+    @staticmethod
+    def history(db: Session, product_id: int) -> List[ProductVersion]:
+        return db.query(ProductVersion).filter(ProductVersion.product_id == product_id).order_by(
+            ProductVersion.version.desc()
+        ).all()
+
+    @staticmethod
+    def document(db: Session, product_id: int, version: Optional[int] = None,
+                 as_of: Optional[datetime] = None) -> Optional[Tuple[ProductVersion, dict]]:
+        """
+        A product's versioned fields at a version or a moment (latest if neither)
+        Loads the nearest snapshot at or before the target and the deltas up to it.
+        """
+        target = select(ProductVersion.version, ProductVersion.created_at).where(ProductVersion.product_id == product_id)
+        if version is not None:
+            target = target.where(ProductVersion.version == version)
+        if as_of is not None:
+            target = target.where(ProductVersion.created_at <= _utc(as_of))
+        target = db.execute(target.order_by(ProductVersion.version.desc()).limit(1)).first()
+        if target is None:
+            return None
+
+        base = db.execute(
+            select(func.max(ProductVersion.version)).where(
+                ProductVersion.product_id == product_id,
+                ProductVersion.kind == "snapshot",
+                ProductVersion.version <= target.version
+            )
+        ).scalar()
+        rows = db.query(ProductVersion).filter(
+            ProductVersion.product_id == product_id,
+            ProductVersion.version >= base,
+            ProductVersion.version <= target.version
+        ).order_by(ProductVersion.version).all()
+
+        document = rows[0].data
+        for row in rows[1:]:
+            document = apply_patch(document, row.data)
+        return rows[-1], document
+
+    @staticmethod
+    def as_product(product: Product, document: dict) -> Product:
+        """Detached copy of a product with its versioned fields taken from a historical document"""
+        values = {
+            column.key: getattr(product, column.key)
+            for column in Product.__table__.columns if column.key != "dpp_key"
+        }
+        values.update(document)
+        if values.get("manufactured_date"):
+            values["manufactured_date"] = datetime.fromisoformat(values["manufactured_date"])
+        return Product(**values)
@@ -0,0 +1,140 @@
+"""
+On-demand QR codes, content-addressed
+
+An image is keyed by a hash of everything that affects its bytes (payload,
+size, format, error correction, logo content). Lookups go memory LRU ->
+disk -> render; a rendered image is written to disk once and never changes,
+so it can be served with immutable cache headers.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+import hashlib
+import os
+import tempfile
+import threading
+
+from app.core.config import QR_CACHE_DIR, QR_CACHE_MAX_BYTES
+from app.services import qr_engine
+
+QR_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+QR_SIZES = (128, 256, 512, 1024)
+DEFAULT_QR_SIZE = 512
+
+QR_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@lru_cache(maxsize=16)
+def _logo_digest(path: str, mtime: float) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def logo_digest(logo_path: Optional[str]) -> str:
+    """Content hash of a logo file ('' for none), so replacing the file changes the key"""
+    if not logo_path or not os.path.exists(logo_path):
+        return ""
+    return _logo_digest(logo_path, os.path.getmtime(logo_path))
+
+
+def qr_key(payload: str, size: int, fmt: str, error_correction: str, logo_path: Optional[str] = None) -> str:
+    material = "\x1f".join([payload, str(size), fmt, error_correction, logo_digest(logo_path)])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def render_qr(payload: str, size: int = DEFAULT_QR_SIZE, fmt: str = "png",
+              error_correction: str = "M", logo_path: Optional[str] = None) -> bytes:
+    """Render one QR image; top-level so it can run in the process pool"""
+    return qr_engine.render(payload, size, fmt, error_correction, logo_path)
+
+
+class QRCache:
+    """Byte-bounded in-memory LRU in front of a content-addressed directory"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def lookup(self, key: str, fmt: str) -> Optional[bytes]:
+        """Cached image bytes, or None if it has never been rendered"""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return body
+
+        try:
+            with open(self.path(key, fmt), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, body)
+        return body
+
+    def store(self, key: str, fmt: str, body: bytes):
+        """Write atomically, so concurrent renders of one key never expose a partial file"""
+        path = self.path(key, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._remember(key, body)
+
+    def get(self, payload: str, size: int = DEFAULT_QR_SIZE, fmt: str = "png",
+            error_correction: str = "M", logo_path: Optional[str] = None) -> Tuple[str, bytes]:
+        """(key, image bytes), rendering on first request"""
+        key = qr_key(payload, size, fmt, error_correction, logo_path)
+        body = self.lookup(key, fmt)
+        if body is None:
+            body = render_qr(payload, size, fmt, error_correction, logo_path)
+            self.renders += 1
+            self.store(key, fmt, body)
+        return key, body
+
+    def _remember(self, key: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "renders": self.renders,
+            }
+
+
+qr_cache = QRCache(QR_CACHE_DIR, QR_CACHE_MAX_BYTES)
@@ -0,0 +1,366 @@
+"""
+NumPy QR rendering engine
+
+The qrcode package is only used for segmenting the payload and choosing
+the version. Codewords are built with an integer bit accumulator and
+table-driven Reed-Solomon; module placement, mask selection (all eight
+masks scored at once) and rasterization run on NumPy arrays, with the
+per-version layout and the resized logo cached. Output is module-for-module
+identical to qrcode.QRCode.
+"""
+
+from functools import lru_cache
+from io import BytesIO
+from typing import Iterable, List, Optional, Tuple
+import base64
+import os
+
+import numpy as np
+import qrcode
+from PIL import Image
+from qrcode import base, util
+
+ERROR_CORRECTION_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+QR_BORDER = 4
+LOGO_FRACTION = 5  # Logo covers 1/5 of the width; needs level Q or H to stay readable
+
+
+
+class QRSizeError(ValueError):
+    """The requested image has fewer pixels across than the symbol has modules"""
+
+
+# 1:1:3:1:1 finder-like runs with four light modules on either side, as 11-bit codes
+_FINDER_PATTERNS = (0b10111010000, 0b00001011101)
+
+
+class _Layout:
+    """Everything about a symbol that depends only on its version"""
+
+    def __init__(self, version: int):
+        size = version * 4 + 17
+        symbol = qrcode.QRCode(version=version)
+        symbol.modules_count = size
+        symbol.modules = [[None] * size for _ in range(size)]
+        symbol.setup_position_probe_pattern(0, 0)
+        symbol.setup_position_probe_pattern(size - 7, 0)
+        symbol.setup_position_probe_pattern(0, size - 7)
+        symbol.setup_position_adjust_pattern()
+        symbol.setup_timing_pattern()
+        unset = np.array([[module is None for module in row] for row in symbol.modules])
+        self.function = np.array([[bool(module) for module in row] for row in symbol.modules])
+
+        symbol.setup_type_info(True, 0)
+        if version >= 7:
+            symbol.setup_type_number(True)
+        self.data = np.array([[module is None for module in row] for row in symbol.modules])
+        self.type_info = unset & ~self.data
+
+        # Data modules in placement order: two-column zigzag from the bottom right
+        order = []
+        upward = True
+        for col in range(size - 1, 0, -2):
+            if col <= 6:
+                col -= 1
+            for row in (range(size - 1, -1, -1) if upward else range(size)):
+                for c in (col, col - 1):
+                    if self.data[row, c]:
+                        order.append(row * size + c)
+            upward = not upward
+        self.order = np.array(order, dtype=np.intp)
+
+        # All eight mask patterns, restricted to data modules
+        i, j = np.indices((size, size))
+        self.masks = np.stack([
+            (i + j) % 2 == 0,
+            i % 2 == 0,
+            j % 3 == 0,
+            (i + j) % 3 == 0,
+            (i // 2 + j // 3) % 2 == 0,
+            (i * j) % 2 + (i * j) % 3 == 0,
+            ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+            ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+        ]) & self.data
+
+        self.version = version
+        self.size = size
+
+
+@lru_cache(maxsize=40)
+def _layout(version: int) -> _Layout:
+    return _Layout(version)
+
+
+class _BitWriter:
+    """Stand-in for qrcode.util.BitBuffer that accumulates into one integer"""
+
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def put(self, num: int, length: int):
+        self.value = (self.value << length) | num
+        self.length += length
+
+
+def _gf_multiply(a: int, b: int) -> int:
+    if not a or not b:
+        return 0
+    return base.gexp(base.glog(a) + base.glog(b))
+
+
+@lru_cache(maxsize=64)
+def _generator_table(ec_count: int) -> List[int]:
+    """For each leading byte f, f * g(x) (minus its leading term) as an ec_count-byte integer"""
+    generator = [1]
+    for i in range(ec_count):
+        # generator *= (x + alpha^i)
+        root = base.gexp(i)
+        generator = [a ^ b for a, b in zip(generator + [0], [0] + [_gf_multiply(c, root) for c in generator])]
+
+    return [
+        int.from_bytes(bytes(_gf_multiply(factor, c) for c in generator[1:]), "big")
+        for factor in range(256)
+    ]
+
+
+def _error_correction(data: bytes, ec_count: int) -> bytes:
+    """Reed-Solomon remainder of one block, one table lookup per data byte"""
+    table = _generator_table(ec_count)
+    shift = 8 * (ec_count - 1)
+    full = (1 << (8 * ec_count)) - 1
+    remainder = 0
+    for byte in data:
+        remainder = ((remainder << 8) & full) ^ table[(remainder >> shift) ^ byte]
+    return remainder.to_bytes(ec_count, "big")
+
+
+def _codewords(version: int, error_correction: int, data_list) -> bytes:
+    """Same output as qrcode.util.create_data"""
+    buffer = _BitWriter()
+    for data in data_list:
+        buffer.put(data.mode, 4)
+        buffer.put(len(data), util.length_in_bits(data.mode, version))
+        data.write(buffer)
+
+    rs_blocks = base.rs_blocks(version, error_correction)
+    bit_limit = sum(block.data_count * 8 for block in rs_blocks)
+    if buffer.length > bit_limit:
+        raise qrcode.exceptions.DataOverflowError(
+            f"Code length overflow. Data size ({buffer.length}) > size available ({bit_limit})"
+        )
+
+    # Terminator, byte alignment, then alternating pad bytes
+    padding = min(bit_limit - buffer.length, 4)
+    padding += -(buffer.length + padding) % 8
+    buffer.put(0, padding)
+    data_bytes = buffer.value.to_bytes(buffer.length // 8, "big")
+    fill = bit_limit // 8 - len(data_bytes)
+    data_bytes += bytes([util.PAD0, util.PAD1] * (fill // 2 + 1))[:fill]
+
+    # Split into blocks and interleave data, then error correction codewords
+    blocks, ec_blocks = [], []
+    offset = 0
+    for block in rs_blocks:
+        chunk = data_bytes[offset:offset + block.data_count]
+        offset += block.data_count
+        blocks.append(chunk)
+        ec_blocks.append(_error_correction(chunk, block.total_count - block.data_count))
+
+    result = bytearray()
+    for group in (blocks, ec_blocks):
+        for i in range(max(len(chunk) for chunk in group)):
+            result.extend(chunk[i] for chunk in group if i < len(chunk))
+    return bytes(result)
+
+
+@lru_cache(maxsize=40 * 4 * 8)
+def _type_info(version: int, error_correction: int, mask: int) -> np.ndarray:
+    """Format (and version) information bits, in the order of layout.type_info"""
+    layout = _layout(version)
+    symbol = qrcode.QRCode(version=version, error_correction=error_correction)
+    symbol.modules_count = layout.size
+    symbol.modules = [[None] * layout.size for _ in range(layout.size)]
+    symbol.setup_type_info(False, mask)
+    if version >= 7:
+        symbol.setup_type_number(False)
+    modules = np.array([[bool(module) for module in row] for row in symbol.modules])
+    return modules[layout.type_info]
+
+
+def _penalties(candidates: np.ndarray) -> np.ndarray:
+    """ISO 18004 mask penalty (as computed by qrcode.util.lost_point) for each candidate"""
+    count, size, _ = candidates.shape
+    both = np.concatenate([candidates, candidates.transpose(0, 2, 1)], axis=1)  # rows, then columns
+
+    # N1: runs of five or more same-colour modules
+    boundaries = np.ones((count, 2 * size, size + 1), dtype=bool)
+    boundaries[:, :, 1:size] = both[:, :, 1:] != both[:, :, :-1]
+    positions = np.flatnonzero(boundaries)
+    lengths = np.diff(positions)
+    long_runs = lengths >= 5
+    n1 = np.bincount(
+        positions[:-1][long_runs] // (2 * size * (size + 1)),
+        weights=lengths[long_runs] - 2,
+        minlength=count
+    )
+
+    # N2: 2x2 blocks of one colour
+    corner = candidates[:, :-1, :-1]
+    blocks = (corner == candidates[:, 1:, :-1]) & (corner == candidates[:, :-1, 1:]) & (corner == candidates[:, 1:, 1:])
+    n2 = blocks.sum(axis=(1, 2)) * 3
+
+    # N3: finder-like patterns in rows and columns
+    codes = np.zeros((count, 2 * size, size - 10), dtype=np.int16)
+    for offset in range(11):
+        codes <<= 1
+        codes |= both[:, :, offset:size - 10 + offset]
+    finders = (codes == _FINDER_PATTERNS[0]) | (codes == _FINDER_PATTERNS[1])
+    n3 = finders.sum(axis=(1, 2)) * 40
+
+    # N4: deviation from 50% dark, float arithmetic as in qrcode
+    dark = candidates.sum(axis=(1, 2))
+    n4 = np.array([int(abs(float(d) / size ** 2 * 100 - 50) / 5) * 10 for d in dark])
+
+    return n1 + n2 + n3 + n4
+
+
+def qr_modules(payload: str, error_correction: str = "M", mask: Optional[int] = None) -> np.ndarray:
+    """Module matrix (bool, True = dark, no quiet zone) for a payload"""
+    level = ERROR_CORRECTION_LEVELS[error_correction]
+    symbol = qrcode.QRCode(error_correction=level)
+    symbol.add_data(payload)
+    version = symbol.best_fit()
+    codewords = _codewords(version, level, symbol.data_list)
+
+    layout = _layout(version)
+    bits = np.unpackbits(np.frombuffer(codewords, dtype=np.uint8))[:len(layout.order)]
+    unmasked = layout.function.copy()
+    unmasked.flat[layout.order[:len(bits)]] = bits.astype(bool)
+
+    if mask is None:
+        candidates = unmasked[None] ^ layout.masks
+        mask = int(np.argmin(_penalties(candidates)))
+        modules = candidates[mask]
+    else:
+        modules = unmasked ^ layout.masks[mask]
+
+    modules[layout.type_info] = _type_info(version, level, mask)
+    return modules
+
+
+@lru_cache(maxsize=16)
+def _logo(path: str, mtime: float, size: int) -> Tuple[np.ndarray, List[int]]:
+    """Logo resized and quantized to palette indices 2..255 (0 and 1 are white and black)"""
+    logo = Image.open(path).convert("RGBA").resize((size, size), Image.LANCZOS)
+    flat = Image.new("RGB", logo.size, (255, 255, 255))
+    flat.paste(logo, (0, 0), logo)
+    quantized = flat.quantize(colors=254)
+    colours = len(quantized.getcolors(256))
+    palette = [255, 255, 255, 0, 0, 0] + quantized.getpalette()[:colours * 3]
+    return np.asarray(quantized, dtype=np.uint8) + 2, palette
+
+
+def _resized_logo(path: Optional[str], size: int) -> Optional[Tuple[np.ndarray, List[int]]]:
+    """Logo prepared once per (file version, size) and reused across codes"""
+    if not path or not os.path.exists(path):
+        return None
+    return _logo(path, os.path.getmtime(path), size)
+
+
+def rasterize_png(modules: np.ndarray, size: Optional[int] = None, scale: Optional[int] = None,
+                  logo_path: Optional[str] = None) -> bytes:
+    """
+    PNG of a module matrix with a quiet zone
+    Either size (pixels; whole pixels per module, remainder added to the
+    quiet zone) or scale (pixels per module) sets the dimensions. Plain
+    codes are 1-bit; with a logo the image is 8-bit palette, not RGB.
+    """
+    light = np.pad(~modules, QR_BORDER, constant_values=True)
+    count = light.shape[0]
+    if size and size < count:
+        # Below one pixel per module the code can't be scanned, so don't downsample
+        raise QRSizeError(f"{size}px is too small for this QR code ({count} modules with the quiet zone); use a larger size")
+    if scale is None:
+        scale = max(1, (size or count) // count)
+    pixels = light.repeat(scale, axis=0).repeat(scale, axis=1)
+
+    if size and pixels.shape[0] != size:
+        offset = (size - pixels.shape[0]) // 2
+        pixels = np.pad(pixels, (offset, size - pixels.shape[0] - offset), constant_values=True)
+    width = pixels.shape[0]
+
+    logo = _resized_logo(logo_path, width // LOGO_FRACTION)
+    if logo is None:
+        image = Image.frombytes("1", (width, width), np.packbits(pixels, axis=1).tobytes())
+    else:
+        indices, palette = logo
+        canvas = (~pixels).view(np.uint8)
+        offset = (width - indices.shape[0]) // 2
+        canvas[offset:offset + indices.shape[0], offset:offset + indices.shape[1]] = indices
+        image = Image.fromarray(canvas, "P")
+        image.putpalette(palette)
+
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def rasterize_svg(modules: np.ndarray, size: int, logo_path: Optional[str] = None) -> bytes:
+    """SVG of a module matrix: one path, one segment per horizontal run of dark modules"""
+    count = modules.shape[0] + 2 * QR_BORDER
+
+    padded = np.zeros((modules.shape[0], modules.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = modules
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    path = "".join(
+        f"M{x + QR_BORDER} {y + QR_BORDER}h{w}v1h-{w}z"
+        for y, x, w in zip(rows.tolist(), starts.tolist(), (ends - starts).tolist())
+    )
+
+    logo = ""
+    if logo_path and os.path.exists(logo_path):
+        with open(logo_path, "rb") as f:
+            data = base64.b64encode(f.read()).decode()
+        mime = "image/svg+xml" if logo_path.endswith(".svg") else "image/png"
+        logo_size = count / LOGO_FRACTION
+        offset = (count - logo_size) / 2
+        logo = (f'<image x="{offset:g}" y="{offset:g}" width="{logo_size:g}" height="{logo_size:g}" '
+                f'href="data:{mime};base64,{data}"/>')
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">'
+        f'<rect width="{count}" height="{count}" fill="#fff"/>'
+        f'<path fill="#000" d="{path}"/>{logo}</svg>'
+    ).encode()
+
+
+def render(payload: str, size: int, fmt: str = "png", error_correction: str = "M",
+           logo_path: Optional[str] = None) -> bytes:
+    """One QR image as PNG or SVG bytes"""
+    modules = qr_modules(payload, error_correction)
+    if fmt == "svg":
+        return rasterize_svg(modules, size, logo_path)
+    return rasterize_png(modules, size=size, logo_path=logo_path)
+
+
+def render_many(payloads: Iterable[str], size: int, fmt: str = "png", error_correction: str = "M",
+                logo_path: Optional[str] = None) -> List[bytes]:
+    """
+    Render a batch of payloads with the same options
+    Top-level so chunks of a large batch can be sent to the process pool.
+    """
+    return [render(payload, size, fmt, error_correction, logo_path) for payload in payloads]
+
+
+def render_batch(args: Tuple[List[str], int, str, str, Optional[str]]) -> List[bytes]:
+    """render_many taking one tuple, for imap_bounded"""
+    return render_many(*args)
@@ -1,7 +1,7 @@
-import qrcode
 from io import BytesIO
 import os
-from PIL import Image
+
+from app.services import qr_engine
 
 class QRCodeService:
     
@@ -12,39 +12,8 @@ class QRCodeService:
         data: URL or text to encode
         logo_path: Optional logo to embed in center
         """
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,  # High error correction for logo
-            box_size=10,
-            border=4,
-        )
-        
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Add logo if provided
-        if logo_path and os.path.exists(logo_path):
-            logo = Image.open(logo_path)
-            
-            # Calculate logo size (should be ~1/5 of QR code)
-            qr_width, qr_height = img.size
-            logo_size = qr_width // 5
-            
-            # Resize logo
-            logo = logo.resize((logo_size, logo_size), Image.LANCZOS)
-            
-            # Calculate position (center)
-            logo_pos = ((qr_width - logo_size) // 2, (qr_height - logo_size) // 2)
-            
-            # Paste logo
-            img.paste(logo, logo_pos)
-        
-        # Save to BytesIO
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
+        modules = qr_engine.qr_modules(data, error_correction="H")  # High error correction for logo
+        buffer = BytesIO(qr_engine.rasterize_png(modules, scale=10, logo_path=logo_path))
         buffer.seek(0)
         
         return buffer
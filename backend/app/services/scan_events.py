@@ -0,0 +1,207 @@
+"""
+Public DPP scan analytics
+
+The public routes only append a small tuple to an in-process ring buffer
+(a bounded deque: a few hundred nanoseconds, no locks, no I/O). A flusher
+thread drains it every SCAN_FLUSH_SECONDS: raw events are bulk-inserted into
+dpp_scans, and the per-product and per-factory daily counters are upserted
+from counts aggregated in memory, so a batch of thousands of scans costs a
+handful of statements. The analytics endpoints read only the daily rollups.
+
+If the database is unavailable the batch is retried on the next flush; if
+the buffer fills up, the oldest records are dropped (and counted).
+"""
+
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import SCAN_BUFFER_SIZE, SCAN_FLUSH_BATCH, SCAN_FLUSH_SECONDS
+from app.db.session import SessionLocal
+from app.models.scan import DppScan, DppScanDaily, FactoryScanDaily
+
+_BOT_MARKERS = ("bot", "crawl", "spider", "slurp", "preview", "curl", "wget", "python-", "headless")
+
+
+def classify_device(user_agent: Optional[str]) -> str:
+    """Coarse device class from a User-Agent header"""
+    if not user_agent:
+        return "other"
+    agent = user_agent.lower()
+    if any(marker in agent for marker in _BOT_MARKERS):
+        return "bot"
+    if "ipad" in agent or "tablet" in agent or ("android" in agent and "mobile" not in agent):
+        return "tablet"
+    if "mobi" in agent or "iphone" in agent:
+        return "mobile"
+    if "windows" in agent or "macintosh" in agent or "x11" in agent or "cros" in agent:
+        return "desktop"
+    return "other"
+
+
+def primary_language(accept_language: Optional[str]) -> Optional[str]:
+    """"de-DE,de;q=0.9,en;q=0.8" -> "de\""""
+    if not accept_language:
+        return None
+    tag = accept_language.split(",", 1)[0].split(";", 1)[0].strip()
+    return tag.split("-", 1)[0].lower()[:8] or None
+
+
+# (dpp_id, factory_id, unix time, source, User-Agent, Accept-Language)
+ScanRecord = Tuple[str, int, float, str, Optional[str], Optional[str]]
+
+
+class ScanRecorder:
+    def __init__(self, buffer_size: int, flush_seconds: float, flush_batch: int):
+        self.flush_seconds = flush_seconds
+        self.flush_batch = flush_batch
+        self._buffer: "deque[ScanRecord]" = deque(maxlen=buffer_size)
+        self._retry: List[ScanRecord] = []
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+
+    # Request path
+
+    def record(self, dpp_id: str, factory_id: int, source: str,
+               user_agent: Optional[str] = None, accept_language: Optional[str] = None):
+        """Enqueue one scan; never blocks and never touches the database"""
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1
+        buffer.append((dpp_id, factory_id, time.time(), source, user_agent, accept_language))
+        self.recorded += 1
+
+    # Flushing
+
+    def _drain(self) -> List[ScanRecord]:
+        records, self._retry = self._retry, []
+        buffer = self._buffer
+        try:
+            while len(records) < self.flush_batch:
+                records.append(buffer.popleft())
+        except IndexError:
+            pass
+        return records
+
+    @staticmethod
+    def _upsert(db, model, rows: List[dict], keys: Tuple[str, ...], counters: Tuple[str, ...]):
+        """INSERT ... ON CONFLICT DO UPDATE adding to the counters"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(model)
+        elif dialect == "sqlite":
+            statement = sqlite.insert(model)
+        else:
+            raise NotImplementedError(f"Scan rollups need PostgreSQL or SQLite, not {dialect}")
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={counter: getattr(model, counter) + getattr(statement.excluded, counter) for counter in counters}
+        )
+        db.execute(statement, rows)
+
+    def _write(self, records: List[ScanRecord]):
+        scans, by_product, by_factory, mobile = [], Counter(), Counter(), Counter()
+        for dpp_id, factory_id, timestamp, source, user_agent, accept_language in records:
+            scanned_at = datetime.fromtimestamp(timestamp, timezone.utc)
+            device = classify_device(user_agent)
+            scans.append({
+                "dpp_id": dpp_id,
+                "factory_id": factory_id,
+                "scanned_at": scanned_at,
+                "source": source,
+                "device": device,
+                "language": primary_language(accept_language)
+            })
+            if device == "bot":
+                continue
+            day = scanned_at.date()
+            by_product[(dpp_id, day, factory_id)] += 1
+            by_factory[(factory_id, day)] += 1
+            if device == "mobile":
+                mobile[(factory_id, day)] += 1
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(DppScan), scans)
+            if by_product:
+                self._upsert(db, DppScanDaily, [
+                    {"dpp_id": dpp_id, "day": day, "factory_id": factory_id, "scans": count}
+                    for (dpp_id, day, factory_id), count in by_product.items()
+                ], ("dpp_id", "day"), ("scans",))
+                self._upsert(db, FactoryScanDaily, [
+                    {"factory_id": factory_id, "day": day, "scans": count, "mobile_scans": mobile[(factory_id, day)]}
+                    for (factory_id, day), count in by_factory.items()
+                ], ("factory_id", "day"), ("scans", "mobile_scans"))
+            db.commit()
+        finally:
+            db.close()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of scans written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                records = self._drain()
+                if not records:
+                    return written
+                started = time.perf_counter()
+                try:
+                    self._write(records)
+                except Exception:
+                    # Keep the batch for the next attempt (bounded like the buffer)
+                    self.flush_errors += 1
+                    self._retry = records[-self._buffer.maxlen:]
+                    raise
+                self.last_flush_ms = (time.perf_counter() - started) * 1000
+                self.flushed += len(records)
+                written += len(records)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Scan flush failed: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="scan-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_seconds + 5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Scan flush failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer) + len(self._retry),
+            "buffer_size": self._buffer.maxlen,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": round(self.last_flush_ms, 2)
+        }
+
+
+scan_recorder = ScanRecorder(SCAN_BUFFER_SIZE, SCAN_FLUSH_SECONDS, SCAN_FLUSH_BATCH)
@@ -0,0 +1,164 @@
+import base64
+import json
+from typing import Iterator, List
+
+import numpy as np
+from sqlalchemy import case, distinct, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.complience_event import ComplianceEvent
+from app.models.content import Course, CourseEnrollment
+from app.models.user import User
+
+# Courses per completion bitmask; stays clear of the sign bit of a 64-bit integer
+MASK_BITS = 62
+
+
+class TrainingMatrix:
+    """
+    Workers x required courses completion matrix for one factory
+
+    Built from a single query returning one row per worker (training-event
+    count plus completion bitmasks); all coverage math is done on NumPy arrays.
+    """
+
+    def __init__(self, factory_id: int, worker_ids: np.ndarray, worker_names: List[str],
+                 training_events: np.ndarray, course_ids: np.ndarray, course_titles: List[str],
+                 completed: np.ndarray):
+        self.factory_id = factory_id
+        self.worker_ids = worker_ids
+        self.worker_names = worker_names
+        self.training_events = training_events
+        self.course_ids = course_ids
+        self.course_titles = course_titles
+        self.completed = completed  # bool[n_workers, n_courses]
+
+    @classmethod
+    def build(cls, db: Session, factory_id: int, course_ids: List[int]) -> "TrainingMatrix":
+        course_ids = sorted(set(course_ids))
+        titles = dict(db.query(Course.id, Course.title).filter(Course.id.in_(course_ids)).all()) if course_ids else {}
+
+        # Passed WORKER_TRAINING records per worker
+        training = (
+            select(ComplianceEvent.user_id, func.count().label("events"))
+            .where(
+                ComplianceEvent.factory_id == factory_id,
+                ComplianceEvent.event_type == "WORKER_TRAINING",
+                ComplianceEvent.status == "PASS",
+            )
+            .group_by(ComplianceEvent.user_id)
+            .subquery()
+        )
+
+        # Completed courses per worker, folded into 62-bit masks in SQL so the
+        # result is one row per worker instead of one row per enrollment
+        chunks = [course_ids[i:i + MASK_BITS] for i in range(0, len(course_ids), MASK_BITS)]
+        mask_columns = [
+            func.sum(distinct(case(
+                {course_id: 1 << bit for bit, course_id in enumerate(chunk)},
+                value=CourseEnrollment.course_id,
+                else_=0,
+            ))).label(f"mask_{n}")
+            for n, chunk in enumerate(chunks)
+        ]
+        completions = None
+        if chunks:
+            completions = (
+                select(CourseEnrollment.user_id, *mask_columns)
+                .where(
+                    CourseEnrollment.course_id.in_(course_ids),
+                    or_(CourseEnrollment.completed_at.isnot(None), CourseEnrollment.progress >= 100),
+                )
+                .group_by(CourseEnrollment.user_id)
+                .subquery()
+            )
+
+        query = (
+            select(
+                User.id,
+                User.name,
+                func.coalesce(training.c.events, 0),
+                *[func.coalesce(completions.c[f"mask_{n}"], 0) for n in range(len(chunks))],
+            )
+            .outerjoin(training, training.c.user_id == User.id)
+            .where(User.factory_id == factory_id, User.role == "worker")
+            .order_by(User.id)
+        )
+        if completions is not None:
+            query = query.outerjoin(completions, completions.c.user_id == User.id)
+
+        workers = db.connection().execute(query).all()
+
+        worker_ids = np.fromiter((w[0] for w in workers), dtype=np.int64, count=len(workers))
+        worker_names = [w[1] for w in workers]
+        training_events = np.fromiter((w[2] for w in workers), dtype=np.int64, count=len(workers))
+
+        # Unpack the masks into a bool matrix
+        blocks = []
+        for n, chunk in enumerate(chunks):
+            masks = np.fromiter((int(w[3 + n]) for w in workers), dtype=np.int64, count=len(workers))
+            blocks.append((masks[:, None] >> np.arange(len(chunk), dtype=np.int64)) & 1)
+        completed = (
+            np.hstack(blocks).astype(bool) if blocks
+            else np.zeros((len(workers), 0), dtype=bool)
+        )
+
+        return cls(
+            factory_id=factory_id,
+            worker_ids=worker_ids,
+            worker_names=worker_names,
+            training_events=training_events,
+            course_ids=np.array(course_ids, dtype=np.int64),
+            course_titles=[titles.get(course_id, "") for course_id in course_ids],
+            completed=completed,
+        )
+
+    def summary(self) -> dict:
+        n_workers, n_courses = self.completed.shape
+        completed_per_worker = self.completed.sum(axis=1)
+
+        return {
+            "workers": n_workers,
+            "courses": n_courses,
+            "coverage": float(_percent(self.completed.mean())) if self.completed.size else 0.0,
+            "fully_trained_workers": int((completed_per_worker == n_courses).sum()) if n_courses else n_workers,
+            "workers_with_gaps": int((completed_per_worker < n_courses).sum()),
+            "untrained_workers": int((completed_per_worker == 0).sum()) if n_courses else 0,
+        }
+
+    def iter_json(self) -> Iterator[bytes]:
+        """
+        Compact JSON payload, yielded in chunks
+
+        The completion matrix is sent bit-packed: each worker row takes
+        ceil(courses / 8) bytes, most significant bit first, base64 encoded.
+        """
+        n_workers, n_courses = self.completed.shape
+        worker_coverage = self.completed.mean(axis=1) if n_courses else np.zeros(n_workers)
+        course_coverage = self.completed.mean(axis=0) if n_workers else np.zeros(n_courses)
+        course_missing = n_workers - self.completed.sum(axis=0)
+
+        yield b'{"factory_id":%d,"summary":%s' % (self.factory_id, _dumps(self.summary()))
+        yield b',"courses":' + _dumps({
+            "ids": self.course_ids.tolist(),
+            "titles": self.course_titles,
+            "coverage": _percent(course_coverage).tolist(),
+            "missing": course_missing.tolist(),
+        })
+        yield b',"workers":{"ids":' + _dumps(self.worker_ids.tolist())
+        yield b',"names":' + _dumps(self.worker_names)
+        yield b',"coverage":' + _dumps(_percent(worker_coverage).tolist())
+        yield b',"training_events":' + _dumps(self.training_events.tolist()) + b'}'
+
+        packed = np.packbits(self.completed, axis=1) if n_courses else np.zeros((n_workers, 0), dtype=np.uint8)
+        yield b',"matrix":{"encoding":"bitpacked-rows-base64","row_bytes":%d,"data":"' % packed.shape[1]
+        yield base64.b64encode(packed.tobytes())
+        yield b'"}}'
+
+
+def _percent(values):
+    return np.round(values * 100, 1)
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
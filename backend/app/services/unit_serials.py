@@ -0,0 +1,203 @@
+"""
+Unit-level serials stored as ranges
+
+A batch of 40,000 garments gets one unit_serial_ranges row, not 40,000
+products or rows: serials are allocated as contiguous blocks of one
+platform-wide sequence and a unit is just a number inside a block. Looking a
+serial up is a single index seek (the last range starting at or before it).
+Units that leave normal circulation (recalled, returned, ...) get a row in
+unit_exceptions; every other unit is active by absence.
+
+Printed serials are the number in Crockford base32 (8 characters, 40 bits)
+plus Crockford's mod 37 check symbol, e.g. 00000G7K-E, so a mistyped or
+misread serial is rejected instead of resolving to someone else's unit.
+"""
+
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.batch import Batch
+from app.models.product import Product
+from app.models.unit_serial import UnitException, UnitSerialRange
+from app.services.dpp_ids import CROCKFORD_ALPHABET
+
+SERIAL_DIGITS = 8
+MAX_SERIAL = 32 ** SERIAL_DIGITS - 1
+UNIT_STATUSES = ("active", "recalled", "returned", "destroyed", "lost")
+ALLOCATION_ATTEMPTS = 5
+
+_DECODE = {char: value for value, char in enumerate(CROCKFORD_ALPHABET)}
+_DECODE.update({char.lower(): value for char, value in list(_DECODE.items())})
+_DECODE.update({"O": 0, "o": 0, "I": 1, "i": 1, "L": 1, "l": 1})
+
+# Crockford's check symbols: the serial mod 37, written with the 32 digits plus five extra symbols
+CHECK_ALPHABET = CROCKFORD_ALPHABET + "*~$=U"
+_CHECK_DECODE = {**_DECODE, **{char: value for value, char in enumerate(CHECK_ALPHABET)}, "u": 36}
+
+
+def _check_symbol(serial: int) -> str:
+    # 37 is prime and larger than any digit, so any single wrong character and any adjacent swap change it
+    return CHECK_ALPHABET[serial % 37]
+
+
+def format_serial(serial: int) -> str:
+    digits = [(serial >> (5 * shift)) & 31 for shift in range(SERIAL_DIGITS - 1, -1, -1)]
+    return "".join(CROCKFORD_ALPHABET[d] for d in digits) + "-" + _check_symbol(serial)
+
+
+def parse_serial(value: str) -> Optional[int]:
+    """Serial number from its printed form (case-insensitive, hyphens optional), else None"""
+    if not isinstance(value, str):
+        return None
+    value = value.replace("-", "").replace(" ", "")
+    if len(value) != SERIAL_DIGITS + 1:
+        return None
+    digits = [_DECODE.get(char) for char in value[:-1]]
+    check = _CHECK_DECODE.get(value[-1])
+    if any(digit is None for digit in digits) or check is None:
+        return None
+    serial = 0
+    for digit in digits:
+        serial = (serial << 5) | digit
+    return serial if CHECK_ALPHABET[check] == _check_symbol(serial) else None
+
+
+class UnitSerialService:
+
+    @staticmethod
+    def batch_ranges(db: Session, batch_id: int) -> List[UnitSerialRange]:
+        return db.query(UnitSerialRange).filter(UnitSerialRange.batch_id == batch_id).order_by(
+            UnitSerialRange.first_unit
+        ).all()
+
+    @staticmethod
+    def allocate(db: Session, batch: Batch, count: int, first_unit: int) -> UnitSerialRange:
+        """Reserve the next `count` serials for a batch; concurrent allocations collide on start and retry"""
+        for _ in range(ALLOCATION_ATTEMPTS):
+            # Ranges never overlap, so the last one by start (an index seek) ends the sequence
+            last = db.execute(
+                select(UnitSerialRange.start, UnitSerialRange.count).order_by(UnitSerialRange.start.desc()).limit(1)
+            ).first()
+            start = last[0] + last[1] if last else 1
+            if start + count - 1 > MAX_SERIAL:
+                raise ValueError("Unit serial space exhausted")
+            unit_range = UnitSerialRange(
+                batch_id=batch.id, product_id=batch.product_id, start=start, count=count, first_unit=first_unit
+            )
+            try:
+                with db.begin_nested():
+                    db.add(unit_range)
+                return unit_range
+            except IntegrityError:
+                continue
+        raise RuntimeError("Could not allocate unit serials, try again")
+
+    @staticmethod
+    def ensure_allocated(db: Session, batch: Batch) -> List[UnitSerialRange]:
+        """
+        Serials for every unit of a batch, allocating only what is missing
+        If the batch quantity grew, the extra units get a new range; serials
+        already handed out are never reassigned, even if the quantity shrinks.
+        """
+        ranges = UnitSerialService.batch_ranges(db, batch.id)
+        allocated = sum(unit_range.count for unit_range in ranges)
+        if batch.quantity > allocated:
+            ranges.append(UnitSerialService.allocate(db, batch, batch.quantity - allocated, allocated + 1))
+        return ranges
+
+    @staticmethod
+    def serials(ranges: Iterable[UnitSerialRange], limit: Optional[int] = None):
+        """(serial, unit number) for the units of the given ranges, in batch order"""
+        emitted = 0
+        for unit_range in ranges:
+            for offset in range(unit_range.count):
+                if limit is not None and emitted >= limit:
+                    return
+                yield unit_range.start + offset, unit_range.first_unit + offset
+                emitted += 1
+
+    @staticmethod
+    def resolve(db: Session, serial: int) -> Optional[dict]:
+        """Unit, its batch and product, and its exception status; two primary-key/index seeks"""
+        row = db.execute(
+            select(
+                UnitSerialRange.id, UnitSerialRange.start, UnitSerialRange.count, UnitSerialRange.first_unit,
+                Batch.id, Batch.batch_code, Batch.quantity,
+                Product.id, Product.dpp_id, Product.name, Product.factory_id
+            ).join(Batch, Batch.id == UnitSerialRange.batch_id).join(
+                Product, Product.id == UnitSerialRange.product_id
+            ).where(UnitSerialRange.start <= serial).order_by(UnitSerialRange.start.desc()).limit(1)
+        ).first()
+        if row is None:
+            return None
+        range_id, start, count, first_unit, batch_id, batch_code, quantity, product_id, dpp_id, name, factory_id = row
+        if serial >= start + count:
+            return None
+
+        exception = db.get(UnitException, serial)
+        return {
+            "serial": format_serial(serial),
+            "range_id": range_id,
+            "unit_number": first_unit + serial - start,
+            "batch_id": batch_id,
+            "batch_code": batch_code,
+            "batch_quantity": quantity,
+            "product_id": product_id,
+            "dpp_id": dpp_id,
+            "product_name": name,
+            "factory_id": factory_id,
+            "status": exception.status if exception else "active",
+            "status_note": exception.note if exception else None,
+            "status_updated_at": exception.updated_at.isoformat() if exception and exception.updated_at else None
+        }
+
+    @staticmethod
+    def ranges_for(db: Session, serials: List[int]) -> Dict[int, tuple]:
+        """
+        Range (id, start, count, factory_id) of each serial, for many serials at once
+        Loads the ranges overlapping [min, max] in one query; unknown serials are left out.
+        """
+        if not serials:
+            return {}
+        low, high = min(serials), max(serials)
+        rows = db.execute(
+            select(UnitSerialRange.id, UnitSerialRange.start, UnitSerialRange.count, Product.factory_id).join(
+                Product, Product.id == UnitSerialRange.product_id
+            ).where(
+                UnitSerialRange.start <= high, UnitSerialRange.start + UnitSerialRange.count > low
+            ).order_by(UnitSerialRange.start)
+        ).all()
+        starts = [row[1] for row in rows]
+        found = {}
+        for serial in serials:
+            position = bisect_right(starts, serial) - 1
+            if position >= 0 and serial < rows[position][1] + rows[position][2]:
+                found[serial] = tuple(rows[position])
+        return found
+
+    @staticmethod
+    def set_status(db: Session, ranges: Dict[int, tuple], status: str, note: Optional[str], user_id: Optional[int]):
+        """Record (or, for "active", clear) the exception status of resolved serials"""
+        if status not in UNIT_STATUSES:
+            raise ValueError(f"Status must be one of: {', '.join(UNIT_STATUSES)}")
+        serials = list(ranges)
+        for start in range(0, len(serials), 1000):
+            db.execute(delete(UnitException).where(UnitException.serial.in_(serials[start:start + 1000])))
+        if status != "active" and serials:
+            db.execute(insert(UnitException), [
+                {"serial": serial, "range_id": ranges[serial][0], "status": status, "note": note, "updated_by": user_id}
+                for serial in serials
+            ])
+
+    @staticmethod
+    def exception_counts(db: Session, range_ids: List[int]) -> Dict[str, int]:
+        if not range_ids:
+            return {}
+        return dict(db.execute(
+            select(UnitException.status, func.count()).where(UnitException.range_id.in_(range_ids))
+            .group_by(UnitException.status)
+        ).all())
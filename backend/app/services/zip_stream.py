@@ -0,0 +1,38 @@
+from typing import Iterable, Iterator, Tuple
+import zipfile
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object collecting what ZipFile writes"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(files: Iterable[Tuple[str, bytes]], compression: int = zipfile.ZIP_STORED) -> Iterator[bytes]:
+    """
+    Build a ZIP archive on the fly, yielding bytes as each member is written
+    Only one member is held in memory at a time. The sink has no tell/seek,
+    so ZipFile writes data descriptors instead of patching local headers.
+    PDFs and PNGs are already compressed, hence ZIP_STORED by default.
+    """
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            yield sink.drain()
+
+    yield sink.drain()
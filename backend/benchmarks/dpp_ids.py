@@ -0,0 +1,59 @@
+"""
+QR codes for UUID vs compact DPP IDs
+
+    python -m benchmarks.dpp_ids                    # 500 IDs, the configured DPP_PAGE_BASE_URL
+    python -m benchmarks.dpp_ids --base-url https://dpp.example.com/p
+
+For each error correction level prints the QR version (modules per side),
+PNG size at 10 px/module and render time for the same products encoded
+with the hyphenated UUID and with the 26-character compact ID.
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from app.core.config import DPP_PAGE_BASE_URL
+from app.services import qr_engine
+from app.services.dpp_ids import canonical_dpp_id, compact_dpp_id, new_dpp_id
+
+
+def measure(payloads, error_correction: str):
+    versions, png_bytes = Counter(), 0
+    start = time.perf_counter()
+    for payload in payloads:
+        modules = qr_engine.qr_modules(payload, error_correction)
+        png_bytes += len(qr_engine.rasterize_png(modules, scale=10))
+        versions[(modules.shape[0] - 17) // 4] += 1
+    elapsed = time.perf_counter() - start
+    return versions, png_bytes / len(payloads), elapsed * 1000 / len(payloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare QR codes for UUID and compact DPP IDs")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--base-url", default=DPP_PAGE_BASE_URL)
+    args = parser.parse_args()
+
+    dpp_ids = [new_dpp_id() for _ in range(args.count)]
+    assert all(canonical_dpp_id(compact_dpp_id(dpp_id)) == dpp_id for dpp_id in dpp_ids)
+
+    cases = {
+        "uuid": [f"{args.base_url}/{dpp_id}" for dpp_id in dpp_ids],
+        "compact": [f"{args.base_url}/{compact_dpp_id(dpp_id)}" for dpp_id in dpp_ids],
+    }
+    print(f"{args.count} IDs, payload {len(cases['uuid'][0])} vs {len(cases['compact'][0])} characters "
+          f"(e.g. {cases['compact'][0]})")
+
+    for error_correction in ("L", "M", "Q", "H"):
+        print(f"\nLevel {error_correction}")
+        results = {name: measure(payloads, error_correction) for name, payloads in cases.items()}
+        for name, (versions, png_bytes, ms) in results.items():
+            version = ", ".join(f"v{v}" for v in sorted(versions))
+            print(f"  {name:<8} {version:<8} {png_bytes:7.0f} B/png  {ms:6.2f} ms/code")
+        (_, uuid_png, uuid_ms), (_, compact_png, compact_ms) = results["uuid"], results["compact"]
+        print(f"  compact: {1 - compact_png / uuid_png:.0%} smaller PNG, {1 - compact_ms / uuid_ms:.0%} faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Footprint recalculation over a synthetic catalogue
+
+    python -m benchmarks.footprint                  # 100k products, 20 factories
+    python -m benchmarks.footprint --products 250000 --factories 50
+
+Builds a throwaway SQLite database, then times a full recalculation (every
+estimate written), a repeat with unchanged factors (nothing written) and a
+single-factory recalculation.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (every mapper must be registered before the first query)
+from app.db.base import Base
+from app.models.factory import Factory
+from app.models.footprint import FootprintRollup, MaterialFootprintFactor
+from app.models.product import Product
+from app.models.product_attributes import ProductCertification, ProductMaterial
+from app.services.footprint import DEFAULT_CATEGORY_WEIGHTS_KG, DEFAULT_FACTORS, FootprintService
+from app.services.product_search import insert_product_attributes
+
+CHUNK = 5000
+
+
+def synthetic_products(count: int, factories: int):
+    materials = list(DEFAULT_FACTORS) + ["unlisted fibre"]
+    categories = list(DEFAULT_CATEGORY_WEIGHTS_KG) + ["accessories"]
+    for i in range(count):
+        first, second = random.sample(materials, 2)
+        share = random.choice([60, 80, 95, 100])
+        composition = [{"material": first, "percentage": share}]
+        if share < 100:
+            composition.append({"material": second, "percentage": 100 - share})
+        yield {
+            "sku": f"BENCH-{i}",
+            "name": f"Product {i}",
+            "category": random.choice(categories),
+            "origin_country": random.choice(["BD", "IN", "VN", "TR", "PT"]),
+            "factory_id": random.randint(1, factories),
+            "dpp_id": str(uuid.uuid4()),
+            "materials": composition,
+            "certifications": [],
+            "weight_kg": random.choice([None, round(random.uniform(0.1, 1.5), 2)]),
+            "carbon_footprint_kg": random.choice([None] * 9 + [round(random.uniform(1, 20), 1)]),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time footprint recalculation")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--factories", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "footprint.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine, tables=[
+        model.__table__ for model in
+        (Factory, Product, ProductMaterial, ProductCertification, MaterialFootprintFactor, FootprintRollup)
+    ])
+    db = sessionmaker(bind=engine)()
+
+    start = time.perf_counter()
+    products = list(synthetic_products(args.products, args.factories))
+    for offset in range(0, len(products), CHUNK):
+        db.execute(insert(Product), products[offset:offset + CHUNK])
+    ids = dict(db.query(Product.dpp_id, Product.id).all())
+    insert_product_attributes(db, [(ids[p["dpp_id"]], p["materials"], []) for p in products])
+    db.commit()
+    print(f"{args.products} products in {args.factories} factories, loaded in {time.perf_counter() - start:.1f}s")
+
+    for label, factory_id in (("full", None), ("unchanged", None), ("one factory", 1)):
+        result = FootprintService.recalculate(db, factory_id)
+        timings = "  ".join(f"{name[:-3]} {ms:7.1f}" for name, ms in result["timings"].items())
+        print(f"  {label:<12} {result['products']:>7} products  {result['updated']:>7} written  ms: {timings}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
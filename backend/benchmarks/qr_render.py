@@ -0,0 +1,100 @@
+"""
+QR rendering: NumPy engine vs the previous qrcode/PIL implementation
+
+    python -m benchmarks.qr_render                  # 500 codes per case
+    python -m benchmarks.qr_render --count 2000 --logo path/to/logo.png
+
+Every case first checks that both paths produce the same module matrix.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from io import BytesIO
+
+import numpy as np
+import qrcode
+from PIL import Image
+
+from app.services import qr_engine
+
+
+def legacy_generate_qr_code(data: str, logo_path: str = None) -> BytesIO:
+    """QRCodeService.generate_qr_code before the NumPy engine"""
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    if logo_path and os.path.exists(logo_path):
+        logo = Image.open(logo_path)
+        qr_width, qr_height = img.size
+        logo_size = qr_width // 5
+        logo = logo.resize((logo_size, logo_size), Image.LANCZOS)
+        img.paste(logo, ((qr_width - logo_size) // 2, (qr_height - logo_size) // 2))
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def legacy_modules(data: str, error_correction: str) -> np.ndarray:
+    qr = qrcode.QRCode(error_correction=qr_engine.ERROR_CORRECTION_LEVELS[error_correction], border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix())
+
+
+def timed(label: str, fn, payloads, baseline: float = None) -> float:
+    start = time.perf_counter()
+    fn(payloads)
+    elapsed = time.perf_counter() - start
+    per_minute = len(payloads) / elapsed * 60
+    speedup = f"  {baseline / elapsed:5.1f}x" if baseline else ""
+    print(f"  {label:<34} {elapsed * 1000 / len(payloads):7.2f} ms/code  {per_minute:>9,.0f} codes/min{speedup}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark QR rendering")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--logo", default=None, help="Logo image (a generated one is used by default)")
+    args = parser.parse_args()
+
+    logo_path = args.logo
+    if logo_path is None:
+        logo_path = os.path.join(tempfile.mkdtemp(), "logo.png")
+        Image.new("RGB", (600, 600), (22, 101, 52)).save(logo_path)
+
+    payloads = [f"https://skillchain.example/dpp/{uuid.uuid4()}" for _ in range(args.count)]
+
+    for error_correction in ("M", "H"):
+        mismatches = sum(
+            not np.array_equal(legacy_modules(p, error_correction), qr_engine.qr_modules(p, error_correction))
+            for p in payloads[:100]
+        )
+        print(f"Module matrices, level {error_correction}: {100 - mismatches}/100 identical")
+
+    print(f"\nQRCodeService.generate_qr_code ({args.count} codes, level H, 10 px/module)")
+    baseline = timed("qrcode + PIL", lambda ps: [legacy_generate_qr_code(p) for p in ps], payloads)
+    timed("numpy engine", lambda ps: [
+        qr_engine.rasterize_png(qr_engine.qr_modules(p, "H"), scale=10) for p in ps
+    ], payloads, baseline)
+
+    print("\nWith logo")
+    baseline = timed("qrcode + PIL", lambda ps: [legacy_generate_qr_code(p, logo_path) for p in ps], payloads)
+    timed("numpy engine", lambda ps: [
+        qr_engine.rasterize_png(qr_engine.qr_modules(p, "H"), scale=10, logo_path=logo_path) for p in ps
+    ], payloads, baseline)
+
+    print("\nBatch API, 512 px")
+    timed("render_many png", lambda ps: qr_engine.render_many(ps, 512, "png"), payloads)
+    timed("render_many svg", lambda ps: qr_engine.render_many(ps, 512, "svg"), payloads)
+    timed("matrix only", lambda ps: [qr_engine.qr_modules(p) for p in ps], payloads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Rebuild or check the materialized per-factory compliance summary (and its analytics rollups)
+
+    python rebuild_compliance_summary.py                 # rebuild all factories
+    python rebuild_compliance_summary.py --factory 3     # rebuild one factory
+    python rebuild_compliance_summary.py --check         # report drift, change nothing
+"""
+
+import argparse
+import sys
+from app.db.session import SessionLocal
+from app.db.init_db import init_db
+from app.services.compliance_summary import ComplianceSummaryService
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or check factory_compliance_summary")
+    parser.add_argument("--factory", type=int, default=None, help="Only this factory id")
+    parser.add_argument("--check", action="store_true", help="Only report mismatches")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+
+    try:
+        if args.check:
+            mismatches = ComplianceSummaryService.check_consistency(db, args.factory)
+            if not mismatches:
+                print("✅ Compliance summary is consistent with compliance events")
+                return
+            for mismatch in mismatches:
+                print(f"❌ factory {mismatch['factory_id']} {mismatch['field']}: "
+                      f"expected {mismatch['expected']}, stored {mismatch['actual']}")
+            sys.exit(1)
+
+        count = ComplianceSummaryService.rebuild(db, args.factory)
+        db.commit()
+        print(f"✅ Rebuilt {count} factory compliance summaries and their rollups")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Passport history: any version is a snapshot plus fewer than PRODUCT_SNAPSHOT_INTERVAL deltas"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401
+from app.db.base import Base
+from app.models.factory import Factory
+from app.models.product import Product
+from app.models.product_version import ProductVersion
+from app.services import product_versions
+from app.services.product_versions import ProductVersionService, product_document
+
+INTERVAL = 3
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(product_versions, "PRODUCT_SNAPSHOT_INTERVAL", INTERVAL)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def product(db):
+    """A product with versions 1..8, version n named "v<n>" and recorded at START + n hours"""
+    factory = Factory(name="F", location="BD")
+    db.add(factory)
+    db.flush()
+    product = Product(factory_id=factory.id, sku="S1", name="v1", dpp_id="DPP-1", materials=[{"material": "Cotton", "percentage": 100}])
+    db.add(product)
+    ProductVersionService.record(db, product, None)
+    for number in range(2, 9):
+        before = product_document(product)
+        product.name = f"v{number}"
+        product.materials = [{"material": "Cotton", "percentage": 100 - number}, {"material": "Elastane", "percentage": number}]
+        ProductVersionService.record(db, product, before)
+    for number in range(1, 9):
+        db.execute(update(ProductVersion).where(
+            ProductVersion.product_id == product.id, ProductVersion.version == number
+        ).values(created_at=START + timedelta(hours=number)))
+    db.commit()
+    return product
+
+
+def test_history_mixes_snapshots_and_deltas(db, product):
+    kinds = {row.version: row.kind for row in ProductVersionService.history(db, product.id)}
+    assert kinds == {1: "snapshot", 2: "delta", 3: "delta", 4: "snapshot", 5: "delta", 6: "delta", 7: "snapshot", 8: "delta"}
+
+
+@pytest.mark.parametrize("number", range(1, 9))
+def test_every_version_is_rebuilt(db, product, number):
+    row, document = ProductVersionService.document(db, product.id, version=number)
+    assert row.version == number
+    assert document["name"] == f"v{number}"
+    if number > 1:
+        assert document["materials"][1] == {"material": "Elastane", "percentage": number}
+
+
+@pytest.mark.parametrize("number", range(1, 9))
+def test_as_of_across_snapshot_boundaries(db, product, number):
+    row, document = ProductVersionService.document(db, product.id, as_of=START + timedelta(hours=number, minutes=30))
+    assert (row.version, document["name"]) == (number, f"v{number}")
+
+
+def test_as_of_before_the_first_version(db, product):
+    assert ProductVersionService.document(db, product.id, as_of=START) is None
+
+
+def test_unchanged_product_records_nothing(db, product):
+    assert ProductVersionService.record(db, product, product_document(product)) is None
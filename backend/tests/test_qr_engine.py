@@ -0,0 +1,81 @@
+"""
+qr_engine reimplements parts of the qrcode package on its internals, so its
+output is checked module-for-module against qrcode.QRCode (for the pinned
+qrcode version in requirements.txt); run from backend/ with python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+import qrcode
+
+from app.services import qr_engine
+
+LEVELS = list(qr_engine.ERROR_CORRECTION_LEVELS)
+
+
+def reference_modules(payload: str, error_correction: str, mask=None) -> np.ndarray:
+    qr = qrcode.QRCode(
+        error_correction=qr_engine.ERROR_CORRECTION_LEVELS[error_correction], border=0, mask_pattern=mask
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix())
+
+
+def payload_for_version(version: int, error_correction: str) -> str:
+    """The longest prefix of a run of DPP URLs that still fits in the given version"""
+    urls = "https://skillchain.example/dpp/DPP-7K3M9Q2X?s=" * 100
+
+    def fits(length: int) -> bool:
+        qr = qrcode.QRCode(error_correction=qr_engine.ERROR_CORRECTION_LEVELS[error_correction])
+        qr.add_data(urls[:length])
+        try:
+            return qr.best_fit() <= version
+        except (qrcode.exceptions.DataOverflowError, ValueError):
+            return False
+
+    low, high = 1, len(urls)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return urls[:low]
+
+
+@pytest.mark.parametrize("error_correction", LEVELS)
+@pytest.mark.parametrize("version", range(1, 41))
+def test_every_version_matches_qrcode(version, error_correction):
+    payload = payload_for_version(version, error_correction)
+    modules = qr_engine.qr_modules(payload, error_correction)
+    assert modules.shape == (version * 4 + 17,) * 2
+    assert np.array_equal(modules, reference_modules(payload, error_correction))
+
+
+@pytest.mark.parametrize("payload", [
+    "0123456789012345",                                    # numeric
+    "HTTPS://SKILLCHAIN.EXAMPLE/DPP/7K3M9Q2X",             # alphanumeric
+    "https://skillchain.example/dpp/DPP-7K3M9Q2X?s=abc",   # byte
+    "0123456789ABCDEFGHIJ0123456789abcdefghij0123456789",  # mixed segments
+    "Bangladesh ক্রেতা 🧵",                                  # non-ASCII
+])
+@pytest.mark.parametrize("error_correction", LEVELS)
+def test_data_modes_match_qrcode(payload, error_correction):
+    assert np.array_equal(qr_engine.qr_modules(payload, error_correction), reference_modules(payload, error_correction))
+
+
+@pytest.mark.parametrize("mask", range(8))
+def test_forced_masks_match_qrcode(mask):
+    payload = "https://skillchain.example/dpp/DPP-7K3M9Q2X"
+    assert np.array_equal(qr_engine.qr_modules(payload, "Q", mask=mask), reference_modules(payload, "Q", mask=mask))
+
+
+def test_png_smaller_than_the_symbol_is_rejected():
+    modules = qr_engine.qr_modules(payload_for_version(40, "L"), "L")
+    count = modules.shape[0] + 2 * qr_engine.QR_BORDER
+    with pytest.raises(qr_engine.QRSizeError):
+        qr_engine.rasterize_png(modules, size=128)
+    with pytest.raises(qr_engine.QRSizeError):
+        qr_engine.rasterize_png(modules, size=count - 1)
+    assert qr_engine.rasterize_png(modules, size=count).startswith(b"\x89PNG")
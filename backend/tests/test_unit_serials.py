@@ -0,0 +1,53 @@
+"""Printed unit serials: round trip and the mod 37 check symbol"""
+
+import random
+
+import pytest
+
+from app.services.dpp_ids import CROCKFORD_ALPHABET
+from app.services.unit_serials import MAX_SERIAL, SERIAL_DIGITS, format_serial, parse_serial
+
+SERIALS = [0, 1, 31, 32, 36, 37, 1024, MAX_SERIAL] + random.Random(46).sample(range(MAX_SERIAL), 200)
+
+
+@pytest.mark.parametrize("serial", SERIALS)
+def test_round_trip(serial):
+    printed = format_serial(serial)
+    assert len(printed) == SERIAL_DIGITS + 2 and printed[-2] == "-"
+    assert parse_serial(printed) == serial
+    assert parse_serial(printed.lower()) == serial
+    assert parse_serial(printed.replace("-", "")) == serial
+
+
+def test_crockford_aliases_are_accepted():
+    printed = format_serial(1)  # 00000001-1
+    assert parse_serial(printed.replace("0", "O").replace("1", "l")) == 1
+
+
+@pytest.mark.parametrize("serial", SERIALS)
+def test_single_character_errors_are_rejected(serial):
+    printed = format_serial(serial).replace("-", "")
+    for position, original in enumerate(printed):
+        for char in CROCKFORD_ALPHABET:
+            if char != original:
+                assert parse_serial(printed[:position] + char + printed[position + 1:]) is None
+
+
+@pytest.mark.parametrize("serial", SERIALS)
+def test_adjacent_swaps_are_rejected(serial):
+    printed = format_serial(serial).replace("-", "")
+    for position in range(SERIAL_DIGITS - 1):
+        swapped = printed[:position] + printed[position + 1] + printed[position] + printed[position + 2:]
+        if swapped != printed:
+            assert parse_serial(swapped) is None
+
+
+def test_zero_and_z_are_told_apart():
+    # With a mod 31 check, serials 0 and 31 (last digit 0 or Z) shared a check symbol
+    assert format_serial(0)[-1] != format_serial(31)[-1]
+    assert parse_serial("0000000Z-0") is None
+
+
+@pytest.mark.parametrize("value", [None, "", "0000000-0", "000000000-00", "0000000U-0", "000000#0-0"])
+def test_malformed_serials_are_rejected(value):
+    assert parse_serial(value) is None
@@ -1,30 +1,88 @@
 """
-Script to update demo_requests table to add password_hash column
+Script to add new columns to existing tables
 and update the database schema.
+New tables are created by init_db on startup; columns added to
+existing tables need an ALTER TABLE here.
 """
 
 from sqlalchemy import text
 from app.db.session import engine, SessionLocal
 from app.db.base import Base
-from app.models import factory, user, complience_event, product, batch, demo_request
+from app.models import factory, user, complience_event, product, batch, demo_request, content
+from app.services.dpp_ids import dpp_key
+from app.services.product_search import rebuild_product_attributes
+
+# (table, column, column DDL)
+NEW_COLUMNS = [
+    ("demo_requests", "password_hash", "VARCHAR"),
+    ("articles", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("products", "dpp_key", "BLOB"),
+    ("products", "weight_kg", "FLOAT"),
+    ("products", "estimated_carbon_kg", "FLOAT"),
+    ("products", "estimated_water_liters", "FLOAT"),
+    ("products", "product_image_variants", "JSON"),
+    ("articles", "featured_image_variants", "JSON"),
+    ("courses", "featured_image_variants", "JSON"),
+    ("factory_compliance_summary", "rollups_built", "BOOLEAN NOT NULL DEFAULT 0"),
+]
+
+# Indexes on existing tables; create_all only indexes tables it creates
+NEW_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_compliance_events_expiry ON compliance_events (expiry_date) "
+    "WHERE expiry_date IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_compliance_events_factory_expiry ON compliance_events (factory_id, expiry_date) "
+    "WHERE expiry_date IS NOT NULL",
+]
+
+def add_column_if_missing(db, table: str, column: str, ddl: str):
+    """Add a column to a table unless it already exists"""
+    result = db.execute(text(f"PRAGMA table_info({table})"))
+    columns = [row[1] for row in result]
+
+    if column not in columns:
+        print(f"Adding {column} column to {table} table...")
+        db.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        db.commit()
+        print("✅ Column added successfully!")
+    else:
+        print(f"✅ {table}.{column} column already exists")
+
+def backfill_dpp_keys(db, batch_size: int = 1000):
+    """Fill products.dpp_key from dpp_id so compact IDs resolve for existing products"""
+    db.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_products_dpp_key ON products (dpp_key)"))
+    rows = db.execute(text("SELECT id, dpp_id FROM products WHERE dpp_key IS NULL")).all()
+    updates = [{"id": row[0], "key": dpp_key(row[1])} for row in rows if dpp_key(row[1])]
+    for start in range(0, len(updates), batch_size):
+        db.execute(text("UPDATE products SET dpp_key = :key WHERE id = :id"), updates[start:start + batch_size])
+    db.commit()
+    print(f"✅ products.dpp_key filled for {len(updates)} products")
+
+def backfill_product_attributes(db):
+    """Fill product_materials/product_certifications for products created before they existed"""
+    missing = db.execute(text(
+        "SELECT COUNT(*) FROM products WHERE id NOT IN (SELECT product_id FROM product_materials) "
+        "AND id NOT IN (SELECT product_id FROM product_certifications)"
+    )).scalar()
+    if not missing:
+        print("✅ product_materials/product_certifications are populated")
+        return
+    count = rebuild_product_attributes(db)
+    db.commit()
+    print(f"✅ Product materials and certifications rebuilt for {count} products")
 
 def update_database():
-    """Add password_hash column to demo_requests table"""
+    """Add missing columns to existing tables"""
     db = SessionLocal()
-    
+
     try:
-        # Check if column exists
-        result = db.execute(text("PRAGMA table_info(demo_requests)"))
-        columns = [row[1] for row in result]
-        
-        if 'password_hash' not in columns:
-            print("Adding password_hash column to demo_requests table...")
-            db.execute(text("ALTER TABLE demo_requests ADD COLUMN password_hash VARCHAR"))
-            db.commit()
-            print("✅ Column added successfully!")
-        else:
-            print("✅ password_hash column already exists")
-            
+        for table, column, ddl in NEW_COLUMNS:
+            add_column_if_missing(db, table, column, ddl)
+        for statement in NEW_INDEXES:
+            db.execute(text(statement))
+        db.commit()
+        backfill_dpp_keys(db)
+        backfill_product_attributes(db)
+
     except Exception as e:
         print(f"❌ Error: {e}")
         db.rollback()
@@ -33,5 +91,6 @@ def update_database():
 
 if __name__ == "__main__":
     print("Updating database schema...")
+    Base.metadata.create_all(bind=engine)
     update_database()
     print("\nDatabase update complete!")